@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     # cors
     "corsheaders",
@@ -65,6 +66,7 @@ INSTALLED_APPS = [
     "users",
     "documents",
     "workflows",
+    "dashboard",
 
     # third-party for object-level permissions
     "guardian",
@@ -98,6 +100,9 @@ ANONYMOUS_USER_NAME = "AnonymousUser"
 
 # Cache settings (example using Redis). Configure per-environment and uncomment
 # only after installing and configuring Redis. This is a recommended snippet.
+# Run several workers with a shared cache: users/permission_cache.py keeps
+# permission sets for a day only there; with the default per-process LocMemCache
+# they expire after seconds so revocations reach every worker.
 # CACHES = {
 #     "default": {
 #         "BACKEND": "django_redis.cache.RedisCache",
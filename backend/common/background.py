@@ -0,0 +1,73 @@
+"""
+Small background thread pools for work queued in the database and run after commit.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+
+class WorkerPool:
+    """
+    A ThreadPoolExecutor started on first use, sized by the `workers_setting`
+    setting. Tasks run with their own DB connection, closed when they finish.
+    """
+
+    def __init__(self, workers_setting, thread_name_prefix):
+        self.workers_setting = workers_setting
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, self.workers_setting, DEFAULT_WORKERS),
+                    thread_name_prefix=self.thread_name_prefix,
+                )
+            return self._executor
+
+    def _run(self, func, args):
+        try:
+            func(*args)
+        finally:
+            # Worker threads own their DB connection
+            connection.close()
+
+    def submit(self, func, *args):
+        self._get_executor().submit(self._run, func, args)
+
+
+class DrainPool(WorkerPool):
+    """
+    A WorkerPool running one `drain` callable that processes whatever is due.
+    Wake-ups arriving before a scheduled drain starts are coalesced into it.
+    """
+
+    def __init__(self, drain, workers_setting, thread_name_prefix):
+        super().__init__(workers_setting, thread_name_prefix)
+        self.drain = drain
+        self._scheduled = False
+
+    def _drain(self):
+        with self._lock:
+            # Wake-ups from here on schedule another drain
+            self._scheduled = False
+        try:
+            self.drain()
+        except Exception:
+            logger.exception("Background drain %s failed", self.thread_name_prefix)
+
+    def wake(self):
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.submit(self._drain)
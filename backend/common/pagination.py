@@ -0,0 +1,115 @@
+"""
+Shared keyset (cursor) pagination for list endpoints.
+"""
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset pagination on (cursor_field, id), newest first, for a datetime
+    `cursor_field` set by subclasses.
+
+    Each page is fetched with `WHERE (cursor_field, id) < (cursor)` instead of an
+    OFFSET, so deep pages cost the same as the first one and rows inserted while
+    paging do not shift results. Back it with an index on (cursor_field, id).
+
+    Opt-in: pagination only applies when the client sends `cursor` or `page_size`;
+    otherwise paginate_queryset() returns None and callers keep the legacy
+    unpaginated list.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    cursor_field = None
+    invalid_cursor_message = "Invalid cursor"
+
+    @property
+    def ordering(self):
+        return (f"-{self.cursor_field}", "-id")
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, value, pk):
+        # The "u" key dates from the updated_at-only paginator; kept so issued cursors stay valid
+        raw = parse.urlencode({"u": value.isoformat(), "i": pk})
+        return b64encode(raw.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(raw, keep_blank_values=True)
+            value = parse_datetime(tokens["u"][0])
+            pk = int(tokens["i"][0])
+        except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.next_cursor = None
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            field = self.cursor_field
+            queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}))
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(queryset[: page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, self.cursor_field), last.pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_pagination_info(self):
+        return {"next": self.get_next_link(), "next_cursor": self.next_cursor}
+
+    def get_paginated_response(self, data):
+        return Response({**self.get_pagination_info(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "next_cursor": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
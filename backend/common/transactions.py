@@ -0,0 +1,21 @@
+"""
+Shared helpers for work deferred until the current transaction commits.
+"""
+from functools import partial
+
+from django.db import transaction
+
+
+def _run_atomic(func, args):
+    with transaction.atomic():
+        func(*args)
+
+
+def atomic_on_commit(func, *args):
+    """
+    Call func(*args) in a short transaction of its own once the current
+    transaction commits (right away outside one). Dropped with the transaction
+    or savepoint it was registered in if that rolls back; errors are logged by
+    Django rather than raised to the committing code.
+    """
+    transaction.on_commit(partial(_run_atomic, func, args), robust=True)
@@ -0,0 +1,69 @@
+"""
+Typeahead (autocomplete) matching for pickers.
+
+Each app declares the values it matches as {name: expression} (e.g.
+documents.models.DOCUMENT_MATCH_FIELDS, users.models.USER_MATCH_FIELDS).
+Values are compared upper-cased and each one has a pg_trgm GIN index on that
+exact expression, which serves both kinds of match:
+  prefix   UPPER(value) LIKE 'TEXT%'
+  fuzzy    UPPER(value) %> 'TEXT' (word similarity over the threshold set by
+           pg_trgm.word_similarity_threshold, 0.6 by default)
+Prefix matches come first, then by best word similarity, and only the top
+`limit` rows are returned, so pickers never load whole tables.
+
+On other databases (local development) matching falls back to unranked
+prefix/substring matching on the same values.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import BooleanField, Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+
+def trigram_enabled():
+    return connection.vendor == "postgresql"
+
+
+def typeahead(queryset, fields, text, limit=DEFAULT_LIMIT):
+    """
+    Top `limit` rows of `queryset` whose `fields` ({name: indexed expression}) start
+    with or fuzzily match `text`, annotated with `prefix` (bool) and `score`
+    (best word similarity, None without PostgreSQL).
+    """
+    needle = (text or "").strip().upper()
+    if not needle:
+        return queryset.annotate(
+            prefix=Value(False, output_field=BooleanField()), score=Value(None, output_field=FloatField())
+        ).none()
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    aliases = {f"_match_{name}": expression for name, expression in fields.items()}
+    queryset = queryset.alias(**aliases)
+    prefix = Q()
+    for alias in aliases:
+        prefix |= Q(**{f"{alias}__startswith": needle})
+    is_prefix = Case(When(prefix, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+    if not trigram_enabled():
+        contains = Q()
+        for alias in aliases:
+            contains |= Q(**{f"{alias}__contains": needle})
+        return (
+            queryset.filter(contains)
+            .annotate(prefix=is_prefix, score=Value(None, output_field=FloatField()))
+            .order_by("-prefix", "pk")[:limit]
+        )
+
+    fuzzy = Q()
+    for alias in aliases:
+        fuzzy |= Q(**{f"{alias}__trigram_word_similar": needle})
+    similarities = [TrigramWordSimilarity(Value(needle), F(alias)) for alias in aliases]
+    score = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    return (
+        queryset.filter(prefix | fuzzy)
+        .annotate(prefix=is_prefix, score=score)
+        .order_by("-prefix", "-score", "pk")[:limit]
+    )
@@ -0,0 +1,150 @@
+"""
+Precomputed dashboard counters.
+
+Each counter counts the rows of one model matching a fixed filter. The
+current value lives in DashboardCounter and is adjusted by signals (see
+signals.py), so reading it is a single indexed lookup instead of a COUNT over
+the table. Every change also records the counter's value for the day in
+DashboardSnapshot; trends compare the current value with the last value
+recorded on an earlier day.
+
+Deltas are applied after the change commits, in a short transaction of their
+own, rather than inside it: every upload would otherwise hold the 'documents'
+counter row lock until its own commit and serialize on it. The trade-off is
+that a process dying between the commit and the bump loses that delta, and
+readers may briefly see the old value.
+
+A counter without a row is seeded from the table on first use. Run
+`manage.py rebuild_dashboard_counters` to repair drift, e.g. after a crash or
+bulk changes made outside the ORM (queryset.update(), raw SQL, loaddata).
+"""
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from common.transactions import atomic_on_commit
+
+from .models import DashboardCounter, DashboardSnapshot
+
+# counter name -> (model label, filter)
+COUNTERS = {
+    'documents': ('documents.Document', {}),
+    'users': ('users.User', {}),
+    'departements': ('users.Departement', {}),
+    'workflows': ('workflows.Workflow', {}),
+    'validators': ('users.User', {'is_staff': True}),
+}
+
+
+def counters_for(model):
+    """
+    {counter name: filter} of the counters that count `model`.
+    """
+    label = model._meta.label
+    return {name: filters for name, (counted, filters) in COUNTERS.items() if counted == label}
+
+
+def live_count(name):
+    label, filters = COUNTERS[name]
+    return apps.get_model(label)._default_manager.filter(**filters).count()
+
+
+def _record_snapshot(names):
+    """
+    Store the current value of `names` as today's snapshot.
+    """
+    today = timezone.localdate()
+    DashboardSnapshot.objects.bulk_create(
+        [
+            DashboardSnapshot(day=today, name=name, value=value)
+            for name, value in DashboardCounter.objects.filter(name__in=names).values_list('name', 'value')
+        ],
+        update_conflicts=True,
+        unique_fields=['name', 'day'],
+        update_fields=['value'],
+    )
+
+
+def _seed(name):
+    """
+    Create the counter from the table unless another process already did.
+    """
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(name=name, value=live_count(name))
+        return True
+    except IntegrityError:
+        return False
+
+
+def bump(changes):
+    """
+    Apply {counter name: delta} in the current transaction and record today's snapshot.
+    Signals call it through bump_after_commit, after the change has committed.
+    """
+    # Fixed order, so concurrent bumps lock the counter rows in the same order
+    changed = sorted(name for name, delta in changes.items() if delta)
+    for name in changed:
+        delta = changes[name]
+        if DashboardCounter.objects.filter(name=name).update(value=F('value') + delta):
+            continue
+        # Seeding counts the table after the change, so the delta is already included
+        if not _seed(name):
+            DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+    if changed:
+        _record_snapshot(changed)
+
+
+def bump_after_commit(changes):
+    """
+    Apply {counter name: delta} once the current transaction commits (see atomic_on_commit).
+    """
+    changes = {name: delta for name, delta in changes.items() if delta}
+    if changes:
+        atomic_on_commit(bump, changes)
+
+
+def read_counters(names):
+    """
+    {name: (current value, value on the last earlier day or None)} in one query;
+    missing counters are seeded from their table.
+    """
+    previous = (
+        DashboardSnapshot.objects.filter(name=OuterRef('name'), day__lt=timezone.localdate())
+        .order_by('-day')
+        .values('value')[:1]
+    )
+    rows = {
+        name: (value, prev)
+        for name, value, prev in DashboardCounter.objects.filter(name__in=names)
+        .annotate(previous=Subquery(previous))
+        .values_list('name', 'value', 'previous')
+    }
+    missing = [name for name in names if name not in rows]
+    if missing:
+        for name in missing:
+            _seed(name)
+        _record_snapshot(missing)
+        rows.update(
+            (name, (value, None))
+            for name, value in DashboardCounter.objects.filter(name__in=missing).values_list('name', 'value')
+        )
+    return rows
+
+
+def rebuild_counters():
+    """
+    Recompute every counter from its table and record today's snapshot.
+    Returns the new values.
+    """
+    values = {name: live_count(name) for name in COUNTERS}
+    with transaction.atomic():
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(name=name, value=value) for name, value in values.items()],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['value', 'updated_at'],
+        )
+        _record_snapshot(list(values))
+    return values
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the dashboard counters from the tables and records today's snapshot. "
+        "Run it after bulk changes made outside the ORM."
+    )
+
+    def handle(self, *args, **options):
+        counters = rebuild_counters()
+        summary = ", ".join(f"{name}={value}" for name, value in counters.items())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(counters)} dashboard counters ({summary})."))
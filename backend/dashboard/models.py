@@ -1,3 +1,33 @@
 from django.db import models
 
-# Create your models here.
+
+class DashboardCounter(models.Model):
+    """
+    Current value of a dashboard counter (see dashboard/counters.py),
+    kept up to date by signals.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Value of a dashboard counter at the end of a day. Rows are written as the
+    counter changes, so days without changes have no row.
+    """
+    day = models.DateField()
+    name = models.CharField(max_length=64)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name', '-day']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'day'], name='dashboard_snapshot_name_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.name} = {self.value}"
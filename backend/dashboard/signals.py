@@ -0,0 +1,72 @@
+"""
+Keep the dashboard counters (see counters.py) in step with creates, deletes
+and, for filtered counters, updates that move a row in or out of the filter,
+and drop the cached dashboard widgets when the rows behind them change.
+
+Counter deltas are applied after the change commits (see bump_after_commit),
+so writers never hold the shared counter rows' locks for the length of their
+own transaction.
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .counters import COUNTERS, bump_after_commit, counters_for
+from .views import invalidate_dashboard_cache
+
+# Models behind the cached widgets (by status/departement, workflows by state)
+CACHED_MODELS = ['documents.Document', 'workflows.Workflow']
+
+
+def _matches(instance, filters):
+    # __dict__ lookups: never load deferred fields from a signal
+    fields = instance.__dict__
+    if not all(field in fields for field in filters):
+        return None
+    return all(fields[field] == value for field, value in filters.items())
+
+
+def _membership(instance):
+    return {name: _matches(instance, filters) for name, filters in counters_for(type(instance)).items()}
+
+
+def remember_membership(sender, instance, **kwargs):
+    instance._dashboard_membership = _membership(instance)
+
+
+def count_save(sender, instance, created, **kwargs):
+    new = _membership(instance)
+    old = getattr(instance, '_dashboard_membership', {})
+    instance._dashboard_membership = new
+    changes = {}
+    for name, member in new.items():
+        if member is None:
+            continue
+        if created:
+            changes[name] = 1 if member else 0
+        elif old.get(name) is not None and old[name] != member:
+            changes[name] = 1 if member else -1
+    bump_after_commit(changes)
+
+
+def count_delete(sender, instance, **kwargs):
+    bump_after_commit({name: -1 for name, member in _membership(instance).items() if member})
+
+
+def invalidate_widgets(sender, **kwargs):
+    # After commit, so a concurrent request cannot cache the old rows again
+    transaction.on_commit(invalidate_dashboard_cache)
+
+
+def connect():
+    for label in {label for label, _ in COUNTERS.values()}:
+        model = apps.get_model(label)
+        uid = f'dashboard-counters:{label}'
+        post_init.connect(remember_membership, sender=model, dispatch_uid=uid)
+        post_save.connect(count_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(count_delete, sender=model, dispatch_uid=uid)
+    for label in CACHED_MODELS:
+        model = apps.get_model(label)
+        uid = f'dashboard-cache:{label}'
+        post_save.connect(invalidate_widgets, sender=model, dispatch_uid=uid)
+        post_delete.connect(invalidate_widgets, sender=model, dispatch_uid=uid)
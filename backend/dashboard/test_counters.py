@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from documents.models import Document, DocumentNature, Folder
+from users.models import Departement, Role, User
+from workflows.models import Task, Workflow
+
+from .counters import read_counters
+from .models import DashboardCounter, DashboardSnapshot
+
+
+class DashboardCountersTest(TestCase):
+    def setUp(self):
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        role = Role.objects.create(role_name="admin", role_color="blue")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dep = Departement.objects.create(dep_name="qa", dep_color="#000")
+            self.admin = User.objects.create_superuser(
+                username="admin", password="pass", email="admin@example.com", role=role, departement=self.dep
+            )
+        self.folder = Folder.objects.create(fol_name="QA", fol_path="QA")
+
+    def _document(self, code):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._uncommitted_document(code)
+
+    def _uncommitted_document(self, code):
+        return Document.objects.create(
+            doc_title=code, doc_type="PDF", doc_format="pdf", doc_owner=self.admin,
+            doc_departement=self.dep, doc_code=code, doc_nature=self.nature, doc_nature_order=1,
+            parent_folder=self.folder,
+        )
+
+    def _value(self, name):
+        return DashboardCounter.objects.get(name=name).value
+
+    def test_signals_keep_counters_and_today_snapshot(self):
+        first = self._document("FI-DASH-1")
+        self._document("FI-DASH-2")
+        self.assertEqual(self._value("documents"), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._value("documents"), 1)
+        snapshot = DashboardSnapshot.objects.get(name="documents", day=timezone.localdate())
+        self.assertEqual(snapshot.value, 1)
+
+    def test_filtered_counter_follows_updates(self):
+        self.assertEqual(read_counters(["validators"])["validators"][0], 1)
+        self.admin.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.save()
+        self.assertEqual(self._value("validators"), 0)
+        # Saves that do not move the row in or out of the filter change nothing
+        self.admin.first_name = "Ada"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.save()
+        self.assertEqual(self._value("validators"), 0)
+        self.assertEqual(self._value("users"), 1)
+
+    def test_deltas_are_applied_after_commit_only(self):
+        self._document("FI-DASH-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self._uncommitted_document("FI-DASH-2")
+                self._uncommitted_document("FI-DASH-3")
+                try:
+                    with transaction.atomic():
+                        self._uncommitted_document("FI-DASH-4")
+                        raise IntegrityError
+                except IntegrityError:
+                    pass
+                # Nothing touches the counter row inside the writer's transaction
+                self.assertEqual(self._value("documents"), 1)
+        # The rolled-back savepoint's delta was dropped with it
+        self.assertEqual(self._value("documents"), 3)
+
+    def test_missing_counter_is_seeded_from_table(self):
+        self._document("FI-DASH-1")
+        DashboardCounter.objects.all().delete()
+        DashboardSnapshot.objects.all().delete()
+
+        self.assertEqual(read_counters(["documents"]), {"documents": (1, None)})
+        self._document("FI-DASH-2")
+        self.assertEqual(self._value("documents"), 2)
+
+    def test_dashboard_trend_uses_earlier_snapshot(self):
+        for i in range(3):
+            self._document(f"FI-DASH-{i}")
+        DashboardSnapshot.objects.create(day=timezone.localdate() - timedelta(days=3), name="documents", value=1)
+        DashboardSnapshot.objects.create(day=timezone.localdate() - timedelta(days=1), name="documents", value=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            workflow = Workflow.objects.create(nom="W", description="", document=Document.objects.first(), author=self.admin)
+        now = timezone.now()
+        task = dict(task_workflow=workflow, task_name="t", task_priorite="normal",
+                    task_assigned_to=self.admin, is_visible=True)
+        Task.objects.create(task_stage="review", task_date_echeance=now - timedelta(days=1), **task)
+        Task.objects.create(task_stage="approval", task_date_echeance=now + timedelta(days=1),
+                            task_status="completed", **task)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.assertNumQueries(2):
+            data = client.get("/api/dashboard/").json()["data"]
+
+        self.assertEqual(data["totalDocuments"], 3)
+        self.assertEqual(data["documentTrend"], {"percentage": 50.0, "direction": "up"})
+        self.assertEqual(data["totalWorkflows"], 1)
+        self.assertIsNone(data["workflowTrend"])
+        self.assertEqual((data["total_tasks"], data["pending_tasks"], data["overdue_tasks"]), (2, 1, 1))
+
+    def test_rebuild_command(self):
+        self._document("FI-DASH-1")
+        Document.objects.filter(doc_code="FI-DASH-1").update(doc_title="bulk")
+        DashboardCounter.objects.filter(name="documents").update(value=42)
+
+        out = StringIO()
+        call_command("rebuild_dashboard_counters", stdout=out)
+        self.assertIn("documents=1", out.getvalue())
+        self.assertEqual(self._value("documents"), 1)
+        self.assertEqual(self._value("validators"), 1)
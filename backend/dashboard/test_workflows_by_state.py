@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from documents.models import Document, DocumentNature, Folder
+from users.models import Departement, Role, User
+from workflows.models import Workflow
+
+from .views import DashboardView, WORKFLOWS_PER_STATE, invalidate_dashboard_cache
+
+
+class WorkflowsByStateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        dep = Departement.objects.create(dep_name="qa", dep_color="#000")
+        role = Role.objects.create(role_name="admin", role_color="blue")
+        self.admin = User.objects.create_superuser(
+            username="admin", password="pass", email="admin@example.com", role=role, departement=dep
+        )
+        self.document = Document.objects.create(
+            doc_title="Procedure", doc_type="PDF", doc_format="pdf", doc_owner=self.admin,
+            doc_departement=dep, doc_code="FI-STATE-1", doc_nature=nature, doc_nature_order=1,
+            parent_folder=Folder.objects.create(fol_name="QA", fol_path="QA"),
+        )
+
+    def _workflow(self, status, nom="W"):
+        workflow = Workflow.objects.create(nom=nom, description="", document=self.document, author=self.admin)
+        Workflow.objects.filter(pk=workflow.pk).update(status=status)
+        return workflow
+
+    def test_single_query_with_counts_and_top_rows(self):
+        for i in range(WORKFLOWS_PER_STATE + 2):
+            self._workflow("draft", nom=f"D{i}")
+        self._workflow("pending_approval")
+        self._workflow("approved")
+        self._workflow("rejected")
+
+        with self.assertNumQueries(1):
+            states = DashboardView.get_workflows_by_state(use_cache=False)
+
+        by_label = {state["etat"]: state for state in states}
+        self.assertEqual([state["etat"] for state in states], ["Élaboration", "Vérification", "Approbation", "Diffusion"])
+        self.assertEqual(by_label["Élaboration"]["count"], WORKFLOWS_PER_STATE + 2)
+        self.assertEqual(len(by_label["Élaboration"]["workflows"]), WORKFLOWS_PER_STATE)
+        self.assertEqual(by_label["Élaboration"]["workflows"][0]["nom"], f"D{WORKFLOWS_PER_STATE + 1}")
+        self.assertEqual(by_label["Approbation"]["count"], 2)
+        self.assertEqual(by_label["Vérification"], {"etat": "Vérification", "count": 0, "workflows": []})
+        self.assertEqual(
+            by_label["Approbation"]["workflows"][0]["document"], {"id": self.document.id, "title": "Procedure"}
+        )
+
+    def test_cache_is_invalidated_on_commit(self):
+        self._workflow("draft")
+        self.assertEqual(DashboardView.get_workflows_by_state()[0]["count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Workflow.objects.create(nom="W2", description="", document=self.document, author=self.admin)
+            # Not before commit
+            with self.assertNumQueries(0):
+                self.assertEqual(DashboardView.get_workflows_by_state()[0]["count"], 1)
+        self.assertIn(invalidate_dashboard_cache, callbacks)
+        with self.assertNumQueries(1):
+            self.assertEqual(DashboardView.get_workflows_by_state()[0]["count"], 2)
@@ -1,4 +1,3 @@
-from datetime import datetime, timedelta
 from django.core.cache import cache
 from typing import List, Dict, Any, Optional
 import logging
@@ -7,20 +6,30 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from django.db.models import Count, F
+from django.db.models import Case, CharField, Count, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 
 # Ensure you have these imports for your models
 from documents.models import Document
-from users.models import User, Departement
 from workflows.models import Workflow, Task
 
+from .counters import read_counters
+
 logger = logging.getLogger(__name__)
 
 CACHE_TIMEOUT = 60
 
-# Trend period: compare "current" vs "snapshot taken ~24h ago"
-TREND_PERIOD_SECONDS = 60 * 60 * 24  # 24h
+DONE_TASK_STATUSES = ['completed', 'rejected']
+
+# Frontend 'etat' label -> DB workflow statuses, in display order
+WORKFLOW_STATES = {
+    'Élaboration': ['draft'],
+    'Vérification': ['in_review'],
+    'Approbation': ['pending_approval', 'approved'],
+    'Diffusion': ['published'],
+}
+WORKFLOWS_PER_STATE = 5
 
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
@@ -41,39 +50,35 @@ class DashboardView(APIView):
         # We filter by:
         # A) task_assigned_to = current_user (Your tasks)
         # B) is_visible = True (Only tasks that have been "unlocked" by the workflow)
-        base_qs = Task.objects.filter(
+        tasks = Task.objects.filter(
             task_assigned_to=current_user, 
             is_visible=True
+        ).aggregate(
+            total_tasks=Count("id"),
+            # Count total ACTIVE tasks (Pending + In Progress)
+            # We exclude 'completed' and 'rejected' to show what is still to be done.
+            pending_tasks=Count("id", filter=~Q(task_status__in=DONE_TASK_STATUSES)),
+            # Count Overdue tasks (Visible + Past Deadline + Not Done)
+            overdue_tasks=Count(
+                "id",
+                filter=Q(task_date_echeance__lt=timezone.now()) & ~Q(task_status__in=DONE_TASK_STATUSES),
+            ),
         )
 
-        # Count total ACTIVE tasks (Pending + In Progress)
-        # We exclude 'completed' and 'rejected' to show what is still to be done.
-        pending_tasks = base_qs.exclude(
-            task_status__in=['completed', 'rejected']
-        ).count()
-        
-        # Count Overdue tasks (Visible + Past Deadline + Not Done)
-        overdue_tasks = base_qs.filter(
-            task_date_echeance__lt=timezone.now()
-        ).exclude(
-            task_status__in=['completed', 'rejected']
-        ).count()
-
-        total_tasks = base_qs.count()
-
         # ---------------------------------------------------------
         # 2. Get other stats (Documents, Workflows, etc.)
         # ---------------------------------------------------------
-        # Using use_cache=True for better performance
-        doc_count_payload = self.get_documents_count(use_cache=True)
-        wf_count_payload = self.get_workflows_count(use_cache=True)
+        # Precomputed counters (see dashboard/counters.py)
+        counts = self.get_counts("documents", "workflows")
+        doc_count_payload = counts["documents"]
+        wf_count_payload = counts["workflows"]
 
         return Response({
             "data": {
                 # Task Stats
-                "pending_tasks": pending_tasks,
-                "overdue_tasks": overdue_tasks,
-                "total_tasks": total_tasks,
+                "pending_tasks": tasks["pending_tasks"],
+                "overdue_tasks": tasks["overdue_tasks"],
+                "total_tasks": tasks["total_tasks"],
                 
                 # Document Stats
                 "totalDocuments": doc_count_payload.get("count", 0),
@@ -87,61 +92,18 @@ class DashboardView(APIView):
         }, status=status.HTTP_200_OK)
 
     # -----------------------------
-    # Trend helpers
+    # Counts (with trend)
     # -----------------------------
     @staticmethod
-    def _prev_count_key(base_key: str) -> str:
-        return f"{base_key}:previous_count"
-
-    @staticmethod
-    def _prev_ts_key(base_key: str) -> str:
-        return f"{base_key}:previous_ts"
-
-    @staticmethod
-    def _now_ts() -> int:
-        return int(datetime.utcnow().timestamp())
-
-    @staticmethod
-    def _maybe_rotate_previous(base_key: str, current_count: int) -> None:
-        """
-        Maintain a 'previous_count' snapshot roughly once per TREND_PERIOD_SECONDS.
-        """
-        prev_ts = cache.get(DashboardView._prev_ts_key(base_key))
-        prev_count = cache.get(DashboardView._prev_count_key(base_key))
-
-        now_ts = DashboardView._now_ts()
-
-        if prev_ts is None or prev_count is None:
-            cache.set(DashboardView._prev_count_key(base_key), current_count, TREND_PERIOD_SECONDS)
-            cache.set(DashboardView._prev_ts_key(base_key), now_ts, TREND_PERIOD_SECONDS)
-            return
-
-        age = now_ts - int(prev_ts)
-        if age >= TREND_PERIOD_SECONDS:
-            cache.set(DashboardView._prev_count_key(base_key), current_count, TREND_PERIOD_SECONDS)
-            cache.set(DashboardView._prev_ts_key(base_key), now_ts, TREND_PERIOD_SECONDS)
-
-    @staticmethod
-    def _build_trend_payload(base_key: str, current_count: int) -> Dict[str, Any]:
+    def _trend_payload(current_count: int, prev_count: Optional[int]) -> Dict[str, Any]:
         """
-        Return trend payload structure.
+        Return trend payload structure: current count vs the last count recorded on an earlier day.
         """
-        DashboardView._maybe_rotate_previous(base_key, current_count)
-        prev_count = cache.get(DashboardView._prev_count_key(base_key))
-        
-        if prev_count is None:
-            return {"count": current_count, "previous_count": None, "trend": None}
-
-        try:
-            prev_count_int = int(prev_count)
-        except (TypeError, ValueError):
-            return {"count": current_count, "previous_count": None, "trend": None}
-
-        if prev_count_int <= 0:
-            return {"count": current_count, "previous_count": prev_count_int, "trend": None}
+        if prev_count is None or prev_count <= 0:
+            return {"count": current_count, "previous_count": prev_count, "trend": None}
 
-        change = current_count - prev_count_int
-        percentage = round((change / prev_count_int) * 100.0, 1)
+        change = current_count - prev_count
+        percentage = round((change / prev_count) * 100.0, 1)
 
         trend = {
             "percentage": abs(percentage),
@@ -150,72 +112,33 @@ class DashboardView(APIView):
 
         return {
             "count": current_count,
-            "previous_count": prev_count_int,
+            "previous_count": prev_count,
             "trend": trend,
         }
 
-    # -----------------------------
-    # Counts (with trend)
-    # -----------------------------
     @staticmethod
-    def get_documents_count(
-        use_cache: bool = True, timeout: int = CACHE_TIMEOUT
-    ) -> Dict[str, Any]:
-        cache_key = "dashboard_documents_count"
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None: return cached
-            
-        count = Document.objects.count()
-        payload = DashboardView._build_trend_payload(cache_key, count)
-        
-        if use_cache: cache.set(cache_key, payload, timeout)
-        return payload
+    def get_counts(*names: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Trend payloads of several dashboard counters, read in one query.
+        """
+        counters = read_counters(names)
+        return {name: DashboardView._trend_payload(*counters[name]) for name in names}
 
     @staticmethod
-    def get_users_count(
-        use_cache: bool = True, timeout: int = CACHE_TIMEOUT
-    ) -> Dict[str, Any]:
-        cache_key = "dashboard_users_count"
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None: return cached
-            
-        count = User.objects.count()
-        payload = DashboardView._build_trend_payload(cache_key, count)
-        
-        if use_cache: cache.set(cache_key, payload, timeout)
-        return payload
+    def get_documents_count() -> Dict[str, Any]:
+        return DashboardView.get_counts("documents")["documents"]
 
     @staticmethod
-    def get_departements_count(
-        use_cache: bool = True, timeout: int = CACHE_TIMEOUT
-    ) -> Dict[str, Any]:
-        cache_key = "dashboard_departements_count"
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None: return cached
-            
-        count = Departement.objects.count()
-        payload = DashboardView._build_trend_payload(cache_key, count)
-        
-        if use_cache: cache.set(cache_key, payload, timeout)
-        return payload
+    def get_users_count() -> Dict[str, Any]:
+        return DashboardView.get_counts("users")["users"]
 
     @staticmethod
-    def get_workflows_count(
-        use_cache: bool = True, timeout: int = CACHE_TIMEOUT
-    ) -> Dict[str, Any]:
-        cache_key = "dashboard_workflows_count"
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None: return cached
-            
-        count = Workflow.objects.count()
-        payload = DashboardView._build_trend_payload(cache_key, count)
-        
-        if use_cache: cache.set(cache_key, payload, timeout)
-        return payload
+    def get_departements_count() -> Dict[str, Any]:
+        return DashboardView.get_counts("departements")["departements"]
+
+    @staticmethod
+    def get_workflows_count() -> Dict[str, Any]:
+        return DashboardView.get_counts("workflows")["workflows"]
 
     # -----------------------------
     # Other widgets
@@ -287,79 +210,65 @@ class DashboardView(APIView):
         return results
 
     @staticmethod
-    def get_workflows_by_state() -> List[Dict[str, Any]]:
+    def get_workflows_by_state(
+        use_cache: bool = True, timeout: int = CACHE_TIMEOUT
+    ) -> List[Dict[str, Any]]:
         """
         Maps DB 'status' to Frontend 'etat' labels.
+        Counts and the most recently updated workflows of every state come from
+        a single windowed query.
         """
-        STATUS_MAP = {
-            'draft': 'Élaboration',
-            'in_review': 'Vérification',
-            'pending_approval': 'Approbation',
-            'approved': 'Approbation',
-            'published': 'Diffusion',
-        }
-        
-        db_stats = Workflow.objects.values("status").annotate(count=Count("id"))
-        counts_lookup = {item['status']: item['count'] for item in db_stats}
-        frontend_states = ['Élaboration', 'Vérification', 'Approbation', 'Diffusion']
-        results = []
-
-        for label in frontend_states:
-            matching_db_statuses = [k for k, v in STATUS_MAP.items() if v == label]
-            total_count = sum(counts_lookup.get(s, 0) for s in matching_db_statuses)
-            
-            workflows = (
-                Workflow.objects.filter(status__in=matching_db_statuses)
-                .select_related("document")
-                .order_by("-updated_at")[:5]
-            )
+        if use_cache:
+            cached = cache.get("dashboard_workflows_by_state")
+            if cached is not None: return cached
 
-            workflows_data = []
-            for wf in workflows:
-                workflows_data.append({
-                    "id": wf.id,
-                    "nom": wf.nom,
-                    "etat": label,
-                    "status": wf.status,
-                    "document": {
-                        "id": wf.document.id if wf.document else None,
-                        "title": wf.document.doc_title if wf.document else "Sans titre",
-                    }
-                })
+        etat = Case(
+            *[When(status__in=statuses, then=Value(label)) for label, statuses in WORKFLOW_STATES.items()],
+            output_field=CharField(),
+        )
+        rows = (
+            Workflow.objects.filter(status__in=[s for statuses in WORKFLOW_STATES.values() for s in statuses])
+            .annotate(etat=etat)
+            .annotate(
+                rank=Window(RowNumber(), partition_by=[F("etat")], order_by=[F("updated_at").desc(), F("id").desc()]),
+                state_count=Window(Count("id"), partition_by=[F("etat")]),
+            )
+            .filter(rank__lte=WORKFLOWS_PER_STATE)
+            .order_by("rank")
+            .values("id", "nom", "status", "etat", "state_count", "document_id", "document__doc_title")
+        )
 
-            results.append({
-                "etat": label,
-                "count": total_count,
-                "workflows": workflows_data,
+        results = {label: {"etat": label, "count": 0, "workflows": []} for label in WORKFLOW_STATES}
+        for row in rows:
+            state = results[row["etat"]]
+            state["count"] = row["state_count"]
+            state["workflows"].append({
+                "id": row["id"],
+                "nom": row["nom"],
+                "etat": row["etat"],
+                "status": row["status"],
+                "document": {
+                    "id": row["document_id"],
+                    "title": row["document__doc_title"] if row["document_id"] else "Sans titre",
+                }
             })
-        return results
+        data = list(results.values())
+
+        if use_cache: cache.set("dashboard_workflows_by_state", data, timeout)
+        return data
 
     @staticmethod
-    def get_validators_count(use_cache: bool = True, timeout: int = CACHE_TIMEOUT) -> int:
-        if use_cache:
-            cached = cache.get("dashboard_validators_count")
-            if cached is not None: return cached
-            
-        count = User.objects.filter(is_staff=True).count()
-        
-        if use_cache: cache.set("dashboard_validators_count", count, timeout)
-        return count
+    def get_validators_count() -> int:
+        return read_counters(["validators"])["validators"][0]
 
 
 def invalidate_dashboard_cache():
     """
-    Helper to invalidate dashboard-related caches + trend snapshots.
+    Helper to invalidate dashboard-related caches.
+    Counts are precomputed (see dashboard/counters.py) and not cached.
     """
     cache.delete_many([
-        "dashboard_documents_count", 
-        "dashboard_users_count", 
-        "dashboard_departements_count", 
-        "dashboard_workflows_count",
-        "dashboard_documents_count:previous_count", "dashboard_documents_count:previous_ts",
-        "dashboard_users_count:previous_count", "dashboard_users_count:previous_ts",
-        "dashboard_departements_count:previous_count", "dashboard_departements_count:previous_ts",
-        "dashboard_workflows_count:previous_count", "dashboard_workflows_count:previous_ts",
         "dashboard_documents_by_status_count", 
         "dashboard_documents_by_departement_count",
-        "dashboard_validators_count",
+        "dashboard_workflows_by_state",
     ])
\ No newline at end of file
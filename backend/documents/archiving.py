@@ -0,0 +1,159 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import Document, DocumentArchive, Folder
+
+logger = logging.getLogger(__name__)
+
+NEXT_EXPIRY_CACHE_KEY = "documents:next_archive_expiry"
+NEXT_EXPIRY_CACHE_TIMEOUT = 60
+_NO_EXPIRY = "none"
+
+DEFAULT_BATCH_SIZE = 500
+
+
+# ------------------------ Read-path guard ------------------------
+
+def next_archive_expiry():
+    """
+    Earliest `archived_until` among archived folders/documents (None if nothing
+    expires). Cached briefly so read paths pay a cache hit, not two queries.
+    """
+    cached = cache.get(NEXT_EXPIRY_CACHE_KEY)
+    if cached is not None:
+        return None if cached == _NO_EXPIRY else cached
+
+    folder_min = Folder.objects.filter(is_archived=True).aggregate(v=Min("archived_until"))["v"]
+    doc_min = Document.objects.filter(is_archived=True).aggregate(v=Min("archived_until"))["v"]
+    candidates = [v for v in (folder_min, doc_min) if v is not None]
+    expiry = min(candidates) if candidates else None
+
+    cache.set(NEXT_EXPIRY_CACHE_KEY, expiry or _NO_EXPIRY, NEXT_EXPIRY_CACHE_TIMEOUT)
+    return expiry
+
+
+def invalidate_next_archive_expiry():
+    cache.delete(NEXT_EXPIRY_CACHE_KEY)
+
+
+def archives_due(now=None):
+    """
+    True when at least one archive has passed its retention date and is waiting
+    for the sweeper.
+    """
+    expiry = next_archive_expiry()
+    return expiry is not None and expiry <= (now or timezone.now())
+
+
+def live_q(now=None):
+    """
+    Filter for rows that should be visible as live. Expired archives the sweeper
+    has not processed yet are treated as restored, without writing anything.
+    """
+    now = now or timezone.now()
+    q = Q(is_archived=False)
+    if archives_due(now):
+        q |= Q(is_archived=True, archived_until__lte=now)
+    return q
+
+
+def archived_q(now=None):
+    """
+    Counterpart of live_q(): archived rows whose retention is still running.
+    """
+    now = now or timezone.now()
+    q = Q(is_archived=True)
+    if archives_due(now):
+        q &= Q(archived_until__isnull=True) | Q(archived_until__gt=now)
+    return q
+
+
+# ------------------------ Sweeper ------------------------
+
+def _restore_documents(doc_ids, now):
+    restored = Document.objects.filter(id__in=doc_ids, is_archived=True).update(
+        is_archived=False,
+        archived_at=None,
+        archived_until=None,
+        archived_by=None,
+        archive_note="",
+    )
+    records = DocumentArchive.objects.filter(
+        document_id__in=doc_ids,
+        status=DocumentArchive.STATUS_ACTIVE,
+    ).update(
+        status=DocumentArchive.STATUS_RESTORED,
+        restored_at=now,
+    )
+    return restored, records
+
+
+def restore_expired_archives(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Restore every Folder/Document whose `archived_until` has passed, in batches
+    of `batch_size` rows per transaction. Documents inside an expired folder are
+    restored with it. Rows locked by a concurrent sweeper are skipped.
+
+    Returns a summary dict with row counts and the elapsed time.
+    """
+    now = now or timezone.now()
+    started = time.monotonic()
+    result = {"folders": 0, "documents": 0, "archive_records": 0}
+
+    # 1. Expired folders (cascade to the documents they contain)
+    while True:
+        with transaction.atomic():
+            folder_ids = list(
+                Folder.objects.select_for_update(skip_locked=True)
+                .filter(is_archived=True, archived_until__lte=now)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not folder_ids:
+                break
+
+            result["folders"] += Folder.objects.filter(id__in=folder_ids).update(
+                is_archived=False,
+                archived_at=None,
+                archived_until=None,
+                archived_by=None,
+                archived_note="",
+            )
+            doc_ids = list(
+                Document.objects.filter(parent_folder_id__in=folder_ids, is_archived=True).values_list("id", flat=True)
+            )
+            if doc_ids:
+                docs, records = _restore_documents(doc_ids, now)
+                result["documents"] += docs
+                result["archive_records"] += records
+
+    # 2. Expired documents
+    while True:
+        with transaction.atomic():
+            doc_ids = list(
+                Document.objects.select_for_update(skip_locked=True)
+                .filter(is_archived=True, archived_until__lte=now)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not doc_ids:
+                break
+
+            docs, records = _restore_documents(doc_ids, now)
+            result["documents"] += docs
+            result["archive_records"] += records
+
+    invalidate_next_archive_expiry()
+
+    result["duration_seconds"] = round(time.monotonic() - started, 3)
+    logger.info(
+        "Archive sweep restored %s folders, %s documents (%s archive records) in %.3fs",
+        result["folders"],
+        result["documents"],
+        result["archive_records"],
+        result["duration_seconds"],
+    )
+    return result
@@ -0,0 +1,180 @@
+"""
+Content-addressed blob layer.
+
+File contents are stored once per SHA-256 under documents/blobs/. Document
+versions (and the live document) reference a Blob; every reference holds one
+count in `Blob.ref_count`, and the object is deleted when the last reference
+is released. Storing bytes that already exist only bumps the counter.
+"""
+import hashlib
+import logging
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, ProtectedError
+
+from .models import Blob
+from .object_store import READ_BLOCK_SIZE, copy_object, sha256_of
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "documents/blobs"
+
+
+def blob_key(sha256, filename=""):
+    # The extension is kept so the object is served with the right content type
+    ext = os.path.splitext(filename or "")[1].lower()
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256}{ext}"
+
+
+def hash_file(f):
+    """
+    (sha256, size) of a file-like object, read in blocks; the file is rewound.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    f.seek(0)
+    blocks = f.chunks() if hasattr(f, "chunks") else iter(lambda: f.read(READ_BLOCK_SIZE), b"")
+    for block in blocks:
+        hasher.update(block)
+        size += len(block)
+    f.seek(0)
+    return hasher.hexdigest(), size
+
+
+def _acquire_existing(sha256):
+    """
+    Take a reference on the blob with this digest, or return None.
+    """
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None:
+            return None
+        Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+        blob.ref_count += 1
+        return blob
+
+
+def _register(sha256, key, size):
+    """
+    Create the Blob row holding one reference. If another request registered
+    the same digest first, reference that one instead. Returns (blob, created).
+    """
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(sha256=sha256, key=key, size=size, ref_count=1), True
+    except IntegrityError:
+        return _acquire_existing(sha256), False
+
+
+def store_file(f, storage=None):
+    """
+    Blob for the contents of an uploaded/in-memory file. Uploads only when the
+    digest is new. The caller owns one reference on the result.
+    """
+    storage = storage or default_storage
+    sha256, size = hash_file(f)
+    blob = _acquire_existing(sha256)
+    if blob is not None:
+        return blob
+
+    key = blob_key(sha256, getattr(f, "name", ""))
+    reused = storage.exists(key)
+    if not reused:
+        key = storage.save(key, f)
+    blob, created = _register(sha256, key, size)
+    if not created and key != blob.key:
+        storage.delete(key)
+    elif created and reused and not storage.exists(key):
+        # Removed meanwhile by the release of an earlier blob with this digest
+        f.seek(0)
+        storage.save(key, f)
+    return blob
+
+
+def store_object(key, sha256=None, size=None, adopt=False, storage=None):
+    """
+    Blob for an object that is already in the bucket.
+
+    adopt=True hands the object itself over to the blob layer (e.g. a finished
+    chunked upload): it becomes the blob, or is deleted if the digest exists.
+    Otherwise the object is left alone and copied server-side.
+    """
+    storage = storage or default_storage
+    sha256 = sha256 or sha256_of(key, storage)
+    blob = _acquire_existing(sha256)
+    if blob is not None:
+        if adopt and key != blob.key:
+            storage.delete(key)
+        return blob
+
+    size = storage.size(key) if size is None else size
+    target = key if adopt else blob_key(sha256, key)
+    if not adopt:
+        copy_object(key, target, storage=storage)
+    blob, created = _register(sha256, target, size)
+    if not created and target != blob.key:
+        storage.delete(target)
+    return blob
+
+
+def acquire(blob):
+    """
+    Take an extra reference on an existing blob (e.g. a metadata-only version).
+    """
+    Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+
+
+def attach_to_version(version, blob):
+    """
+    Point `version` at `blob` (the caller hands over the reference it holds).
+    """
+    version.blob = blob
+    version.version_path.name = blob.key
+    version.save(update_fields=["blob", "version_path"])
+
+
+def set_live_blob(document, blob):
+    """
+    Record `blob` as the document's live contents, moving the reference over.
+    """
+    if document.blob_id == blob.id:
+        return
+    previous = document.blob_id
+    acquire(blob)
+    document.blob = blob
+    document.save(update_fields=["blob"])
+    if previous:
+        release(previous)
+
+
+def release(blob_id, storage=None):
+    """
+    Drop one reference; the row and its object go away with the last one.
+    """
+    storage = storage or default_storage
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - 1)
+            return
+        try:
+            blob.delete()
+        except ProtectedError:
+            # The counter drifted; trust the actual references
+            refs = blob.versions.count() + blob.documents.count()
+            logger.warning("Blob %s still has %s references; ref_count corrected", blob.sha256, refs)
+            Blob.objects.filter(pk=blob.pk).update(ref_count=refs)
+            return
+        transaction.on_commit(lambda: _delete_unreferenced(blob.key, storage))
+
+
+def _delete_unreferenced(key, storage):
+    # Blob keys are derived from the digest, so the same content stored again
+    # since the release (a new row) reuses the key: keep the object then
+    if Blob.objects.filter(key=key).exists():
+        return
+    storage.delete(key)
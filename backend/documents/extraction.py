@@ -0,0 +1,384 @@
+"""
+Background text extraction feeding the search index.
+
+Uploads, file updates and OnlyOffice saves call enqueue_extraction(), which
+only records a pending DocumentText row; after commit a small pool
+(TEXT_EXTRACTION_WORKERS threads) drains the pending rows in batches, so a
+request never waits for a parser. Each file is streamed from storage and
+parsed with pure-Python readers:
+  txt, csv     streamed line by line
+  docx, xlsx   the XML parts of the zip container, read incrementally
+  pdf          pypdf (documents are left UNSUPPORTED when it is not installed)
+The text (capped at TEXT_EXTRACTION_MAX_CHARS) and its tsvector are stored
+on DocumentText and merged into Document.search_vector (see search.py).
+
+`manage.py extract_document_text` queues documents that were never
+extracted, retries failed rows and recovers rows left running by a crash.
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from common.background import DrainPool
+
+from .models import Document, DocumentText
+from .search import fts_enabled, search_config, update_search_vectors
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=15)
+DEFAULT_MAX_CHARS = 200_000
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# Zip/PDF parsing needs a seekable file; it is spooled to disk past this size
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+S_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+_pool = DrainPool(lambda: process_batches(), "TEXT_EXTRACTION_WORKERS", "text-extraction")
+
+
+class UnsupportedFile(Exception):
+    pass
+
+
+def max_chars():
+    return getattr(settings, "TEXT_EXTRACTION_MAX_CHARS", DEFAULT_MAX_CHARS)
+
+
+def max_bytes():
+    return getattr(settings, "TEXT_EXTRACTION_MAX_BYTES", DEFAULT_MAX_BYTES)
+
+
+# ------------------------ Parsers ------------------------
+
+class TextCollector:
+    """
+    Accumulates text up to `limit` characters; `full` tells parsers to stop.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.full = False
+
+    def add(self, text):
+        if self.full or not text:
+            return
+        text = text.strip()
+        if not text:
+            return
+        room = self.limit - self.size
+        if len(text) >= room:
+            text = text[:room]
+            self.full = True
+        self.parts.append(text)
+        self.size += len(text) + 1
+
+    def text(self):
+        return "\n".join(self.parts)
+
+
+def _text_lines(stream):
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def extract_txt(stream, out):
+    for line in _text_lines(stream):
+        out.add(line)
+        if out.full:
+            return
+
+
+def extract_csv(stream, out):
+    for row in csv.reader(_text_lines(stream)):
+        out.add(" ".join(cell for cell in row if cell))
+        if out.full:
+            return
+
+
+def _iter_xml_text(archive, name, text_tag, break_tag):
+    """
+    Yield the text of `text_tag` elements of one zip member, joined per `break_tag`.
+    """
+    parts = []
+    with archive.open(name) as member:
+        for event, element in ElementTree.iterparse(member, events=("end",)):
+            if element.tag == text_tag and element.text:
+                parts.append(element.text)
+            elif element.tag == break_tag:
+                if parts:
+                    yield "".join(parts)
+                    parts = []
+                element.clear()
+    if parts:
+        yield "".join(parts)
+
+
+def extract_docx(stream, out):
+    with zipfile.ZipFile(stream) as archive:
+        names = set(archive.namelist())
+        if "word/document.xml" not in names:
+            raise UnsupportedFile("not a Word document")
+        parts = ["word/document.xml"] + sorted(
+            n for n in names if n.startswith(("word/header", "word/footer")) and n.endswith(".xml")
+        )
+        for name in parts:
+            for paragraph in _iter_xml_text(archive, name, f"{W_NS}t", f"{W_NS}p"):
+                out.add(paragraph)
+                if out.full:
+                    return
+
+
+def extract_xlsx(stream, out):
+    with zipfile.ZipFile(stream) as archive:
+        names = set(archive.namelist())
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            shared = list(_iter_xml_text(archive, "xl/sharedStrings.xml", f"{S_NS}t", f"{S_NS}si"))
+        sheets = sorted(n for n in names if n.startswith("xl/worksheets/sheet") and n.endswith(".xml"))
+        if not sheets:
+            raise UnsupportedFile("not an Excel workbook")
+        for name in sheets:
+            with archive.open(name) as member:
+                row = []
+                for event, element in ElementTree.iterparse(member, events=("end",)):
+                    if element.tag == f"{S_NS}c":
+                        kind = element.get("t")
+                        if kind == "inlineStr":
+                            row.append("".join(element.itertext()))
+                        else:
+                            value = element.findtext(f"{S_NS}v")
+                            if value is not None:
+                                if kind == "s":
+                                    index = int(value)
+                                    value = shared[index] if index < len(shared) else ""
+                                row.append(value)
+                        element.clear()
+                    elif element.tag == f"{S_NS}row":
+                        out.add(" ".join(row))
+                        row = []
+                        element.clear()
+                        if out.full:
+                            return
+
+
+def extract_pdf(stream, out):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFile("pypdf is not installed")
+    reader = PdfReader(stream)
+    for page in reader.pages:
+        out.add(page.extract_text() or "")
+        if out.full:
+            return
+
+
+# format -> (parser, needs a seekable file)
+EXTRACTORS = {
+    "txt": (extract_txt, False),
+    "csv": (extract_csv, False),
+    "docx": (extract_docx, True),
+    "xlsx": (extract_xlsx, True),
+    "pdf": (extract_pdf, True),
+}
+
+
+def file_format(document):
+    ext = os.path.splitext(document.doc_path.name or "")[1].lstrip(".").lower()
+    return ext or (document.doc_format or "").lower()
+
+
+def extract_text(name, fmt, storage=None):
+    """
+    Stream `name` from storage and return (text, truncated).
+    Raises UnsupportedFile for formats without a parser.
+    """
+    if fmt not in EXTRACTORS:
+        raise UnsupportedFile(f"no text extractor for {fmt or 'unknown'} files")
+    parser, seekable = EXTRACTORS[fmt]
+    storage = storage or default_storage
+    out = TextCollector(max_chars())
+    with storage.open(name, "rb") as f:
+        if not seekable:
+            parser(f, out)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+                copied = 0
+                for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                    copied += len(chunk)
+                    if copied > max_bytes():
+                        raise UnsupportedFile("file too large for text extraction")
+                    spool.write(chunk)
+                spool.seek(0)
+                parser(spool, out)
+    return out.text(), out.full
+
+
+# ------------------------ Queue ------------------------
+
+def _source(document):
+    """
+    Identity of the live file: its content blob when known, else its storage key.
+    """
+    if document.blob_id:
+        return f"blob:{document.blob_id}"
+    return f"path:{document.doc_path.name}" if document.doc_path.name else ""
+
+
+def enqueue_extraction(document):
+    """
+    Queue text extraction of the document's live file, run after commit.
+    Files already extracted (same source) are not queued again.
+    """
+    source = _source(document)
+    if not source:
+        return None
+    row, created = DocumentText.objects.get_or_create(document_id=document.pk, defaults={"source": source})
+    if not created:
+        if row.source == source and row.status != DocumentText.STATUS_FAILED:
+            return row
+        DocumentText.objects.filter(pk=row.pk).update(
+            source=source, status=DocumentText.STATUS_PENDING, attempts=0, error="", updated_at=timezone.now()
+        )
+    transaction.on_commit(wake)
+    return row
+
+
+def queue_missing(batch_size=500):
+    """
+    Queue every document that has a file but no DocumentText row. Returns the number queued.
+    """
+    queued = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Document.objects.filter(extracted_text__isnull=True, id__gt=last_id)
+            .exclude(doc_path="")
+            .order_by("id")
+            .values_list("id", "blob_id", "doc_path")[:batch_size]
+        )
+        if not rows:
+            return queued
+        last_id = rows[-1][0]
+        DocumentText.objects.bulk_create(
+            [
+                DocumentText(document_id=pk, source=f"blob:{blob_id}" if blob_id else f"path:{path}")
+                for pk, blob_id, path in rows
+            ],
+            ignore_conflicts=True,
+        )
+        queued += len(rows)
+
+
+def wake():
+    """
+    Schedule a background drain; wake-ups arriving before it starts are coalesced.
+    """
+    _pool.wake()
+
+
+# ------------------------ Processing ------------------------
+
+def _claim(batch_size):
+    """
+    PENDING -> RUNNING for up to `batch_size` rows, in one locked SELECT and one
+    UPDATE; rows another worker holds are skipped.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            DocumentText.objects.filter(status=DocumentText.STATUS_PENDING)
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("document")
+            .order_by("updated_at")[:batch_size]
+        )
+        DocumentText.objects.filter(pk__in=[row.pk for row in rows]).update(
+            status=DocumentText.STATUS_RUNNING, updated_at=now
+        )
+    for row in rows:
+        row.status = DocumentText.STATUS_RUNNING
+        row.updated_at = now
+    return rows
+
+
+def _finish(row, **values):
+    """
+    Store the outcome unless the document got a new file meanwhile. Returns True if stored.
+    """
+    return bool(
+        DocumentText.objects.filter(pk=row.pk, status=DocumentText.STATUS_RUNNING, source=row.source).update(
+            updated_at=timezone.now(), **values
+        )
+    )
+
+
+def extract_row(row):
+    """
+    Extract one claimed row. Returns True when the document's search vector needs refreshing.
+    """
+    document = row.document
+    try:
+        if document.doc_size and document.doc_size > max_bytes():
+            raise UnsupportedFile("file too large for text extraction")
+        text, truncated = extract_text(document.doc_path.name, file_format(document))
+    except UnsupportedFile as e:
+        return _finish(row, status=DocumentText.STATUS_UNSUPPORTED, error=str(e), content="",
+                       truncated=False, content_vector=None)
+    except Exception as e:
+        logger.exception("Text extraction failed for document %s", document.pk)
+        _finish(row, status=DocumentText.STATUS_FAILED, attempts=row.attempts + 1, error=str(e)[:2000])
+        return False
+
+    stored = _finish(row, status=DocumentText.STATUS_DONE, error="", content=text, truncated=truncated)
+    if stored and fts_enabled():
+        DocumentText.objects.filter(pk=row.pk).update(
+            content_vector=SearchVector("content", config=search_config())
+        )
+    return stored
+
+
+def process_batches(batch_size=BATCH_SIZE):
+    """
+    Extract pending rows batch by batch until none is left; each batch refreshes
+    its documents' search vectors with one UPDATE. Returns the number processed.
+    """
+    processed = 0
+    while True:
+        rows = _claim(batch_size)
+        if not rows:
+            return processed
+        changed = [row.pk for row in rows if extract_row(row)]
+        if changed:
+            update_search_vectors(Document.objects.filter(pk__in=changed))
+        processed += len(rows)
+
+
+def process_pending(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, stale_after=STALE_AFTER):
+    """
+    Requeue failed (under `max_attempts`) and stuck rows, then extract everything pending.
+    Returns the number of rows processed.
+    """
+    DocumentText.objects.filter(
+        status=DocumentText.STATUS_RUNNING, updated_at__lt=timezone.now() - stale_after
+    ).update(status=DocumentText.STATUS_PENDING)
+    DocumentText.objects.filter(
+        status=DocumentText.STATUS_FAILED, attempts__lt=max_attempts
+    ).update(status=DocumentText.STATUS_PENDING)
+    return process_batches(batch_size)
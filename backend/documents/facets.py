@@ -0,0 +1,141 @@
+"""
+Facet filters and counts for the document listing.
+
+Facets: doc_departement, site, document_type (ids, `null` for none),
+doc_status_type, doc_format (values) and is_archived (true/false). A filter
+is `?<facet>=a,b` (any of the values); filters on different facets combine
+with AND.
+
+Counts are disjunctive: each facet is counted over the rows matching the
+filters on the *other* facets, so picking a department still shows how many
+documents every other department has. All facets come from one query: a
+UNION ALL of one GROUP BY per facet, each a conditional COUNT (FILTER on
+PostgreSQL) over the same base queryset.
+"""
+from django.db.models import CharField, Count, F, Q, Value
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+# facet -> (column, label, kind)
+FACETS = {
+    "doc_departement": ("doc_departement_id", "doc_departement__dep_name", "id"),
+    "site": ("site_id", "site__name", "id"),
+    "document_type": ("document_type_id", "document_type__name", "id"),
+    "doc_status_type": ("doc_status_type", None, "str"),
+    "doc_format": ("doc_format", None, "str"),
+    "is_archived": ("is_archived", None, "bool"),
+}
+
+NULL_TOKEN = "null"
+_TRUE = {"true", "1", "t"}
+_FALSE = {"false", "0", "f"}
+
+
+def _parse(facet, raw):
+    kind = FACETS[facet][2]
+    if kind == "id":
+        try:
+            return int(raw)
+        except ValueError:
+            raise ValidationError({facet: f"Invalid id: {raw!r}."})
+    if kind == "bool":
+        if raw.lower() in _TRUE:
+            return True
+        if raw.lower() in _FALSE:
+            return False
+        raise ValidationError({facet: "Use true or false."})
+    return raw
+
+
+def parse_facet_filters(params):
+    """
+    {facet: Q} for the facets present in `params`. Raises ValidationError on bad values.
+    """
+    filters = {}
+    for facet, (column, _, kind) in FACETS.items():
+        raw = params.get(facet)
+        if raw is None:
+            continue
+        q = Q()
+        for value in (v.strip() for v in raw.split(",")):
+            if not value:
+                continue
+            if value.lower() == NULL_TOKEN and kind == "id":
+                q |= Q(**{f"{column}__isnull": True})
+            else:
+                q |= Q(**{column: _parse(facet, value)})
+        if q:
+            filters[facet] = q
+    return filters
+
+
+def requested_facets(params):
+    """
+    Facet names asked for with ?facets=a,b (or ?facets=all). Empty when absent.
+    """
+    raw = (params.get("facets") or "").strip()
+    if not raw:
+        return []
+    names = [n.strip() for n in raw.split(",") if n.strip()]
+    if "all" in names:
+        return list(FACETS)
+    unknown = sorted(set(names) - set(FACETS))
+    if unknown:
+        raise ValidationError({"facets": f"Unknown facets: {', '.join(unknown)}."})
+    return [name for name in FACETS if name in names]
+
+
+def apply_facet_filters(queryset, filters):
+    for q in filters.values():
+        queryset = queryset.filter(q)
+    return queryset
+
+
+def _decode(facet, value):
+    if value is None:
+        return None
+    kind = FACETS[facet][2]
+    if kind == "id":
+        return int(value)
+    if kind == "bool":
+        return value.lower() in _TRUE
+    return value
+
+
+def _counts_query(queryset, filters, facets):
+    branches = []
+    for facet in facets:
+        column, label, _ = FACETS[facet]
+        others = Q()
+        for other, q in filters.items():
+            if other != facet:
+                others &= q
+        branches.append(
+            queryset.order_by()
+            .annotate(
+                facet=Value(facet, output_field=CharField()),
+                value=Cast(column, CharField()),
+                label=Cast(F(label) if label else F(column), CharField()),
+            )
+            .values("facet", "value", "label")
+            .annotate(count=Count("pk", filter=others if others else None))
+        )
+    return branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+
+
+def facet_counts(queryset, filters, facets=None):
+    """
+    {facet: [{"value": ..., "label": ..., "count": n}, ...]} over `queryset`,
+    most frequent first, each facet counted under the other facets' `filters`.
+    Values without any matching row are left out. Runs one query.
+    """
+    facets = list(facets or FACETS)
+    counts = {facet: [] for facet in facets}
+    for row in _counts_query(queryset, filters, facets):
+        if row["count"]:
+            value = _decode(row["facet"], row["value"])
+            label = row["label"] if FACETS[row["facet"]][1] else value
+            counts[row["facet"]].append({"value": value, "label": label, "count": row["count"]})
+    for values in counts.values():
+        values.sort(key=lambda item: (-item["count"], str(item["label"])))
+    return counts
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.blobs import store_object
+from documents.models import DocumentVersion
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves existing document versions onto the content-addressed blob layer. "
+        "Identical files end up sharing one object; the per-version copies are removed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200, help="Versions per batch (default 200).")
+        parser.add_argument("--keep-old", action="store_true", help="Do not delete the old per-version objects.")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        converted = failed = 0
+        last_id = 0
+
+        while True:
+            versions = list(
+                DocumentVersion.objects.filter(blob__isnull=True, id__gt=last_id)
+                .exclude(version_path="")
+                .order_by("id")[:batch_size]
+            )
+            if not versions:
+                break
+            last_id = versions[-1].id
+
+            for version in versions:
+                old_key = version.version_path.name
+                try:
+                    with transaction.atomic():
+                        blob = store_object(old_key)
+                        version.blob = blob
+                        version.version_path.name = blob.key
+                        version.save(update_fields=["blob", "version_path"])
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Version {version.id} ({old_key}): {e}")
+                    continue
+
+                converted += 1
+                still_used = DocumentVersion.objects.filter(version_path=old_key).exists()
+                if not options["keep_old"] and not still_used and old_key != blob.key:
+                    version.version_path.storage.delete(old_key)
+
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} versions to blobs ({failed} failed)."))
@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from documents.uploads import DEFAULT_EXPIRY_BATCH_SIZE, expire_stale_uploads, expiry_hours
+
+
+class Command(BaseCommand):
+    help = (
+        "Aborts chunked uploads left unfinished, discarding their multipart uploads and parts. "
+        "Run it from cron, or with --interval as a long-running scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=None,
+            help="Expire sessions idle for this many hours (default DOCUMENT_UPLOAD_EXPIRY_HOURS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_EXPIRY_BATCH_SIZE,
+            help=f"Sessions aborted per transaction (default {DEFAULT_EXPIRY_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat the sweep every N seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        hours = options["hours"] if options["hours"] is not None else expiry_hours()
+        batch_size = max(1, options["batch_size"])
+        interval = options["interval"]
+
+        while True:
+            result = expire_stale_uploads(older_than=timedelta(hours=hours), batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"Expired {result['expired']} upload sessions in {result['duration_seconds']:.3f}s."
+            ))
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from documents.extraction import BATCH_SIZE, MAX_ATTEMPTS, process_pending, queue_missing
+
+
+class Command(BaseCommand):
+    help = (
+        "Extracts the text of document files for search: queues documents never extracted, "
+        "retries failed extractions and recovers ones left running by a crash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Files extracted per batch.")
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Give up on a file after this many failures.")
+        parser.add_argument("--queue-only", action="store_true", help="Only queue documents; the next upload or run extracts them.")
+
+    def handle(self, *args, **options):
+        queued = queue_missing()
+        self.stdout.write(f"Queued {queued} documents.")
+        if options["queue_only"]:
+            return
+        processed = process_pending(batch_size=max(1, options["batch_size"]), max_attempts=options["max_attempts"])
+        self.stdout.write(self.style.SUCCESS(f"Extracted {processed} documents."))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.onlyoffice import MAX_ATTEMPTS, process_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued OnlyOffice saves, retries failed ones and recovers jobs left running by a crashed worker. "
+        "Run it from cron, or with --interval as a long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f"Give up on a job after this many attempts (default {MAX_ATTEMPTS}).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat every N seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = process_pending(max_attempts=options["max_attempts"])
+            self.stdout.write(self.style.SUCCESS(f"Processed {count} OnlyOffice save jobs."))
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
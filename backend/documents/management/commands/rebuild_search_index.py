@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from documents.search import DEFAULT_BATCH_SIZE, fts_enabled, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the full-text search vectors of documents in batches. "
+        "Run it once after deploying search, and after bulk changes made with queryset.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Documents per UPDATE.")
+        parser.add_argument("--missing", action="store_true", help="Only index documents without a vector.")
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write(self.style.WARNING("Full-text search requires PostgreSQL; nothing to do."))
+            return
+        indexed = rebuild_search_index(batch_size=max(1, options["batch_size"]), only_missing=options["missing"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} documents."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.archiving import DEFAULT_BATCH_SIZE, restore_expired_archives
+
+
+class Command(BaseCommand):
+    help = (
+        "Restores folders and documents whose archive retention ('archived_until') has passed. "
+        "Run it from cron, or with --interval as a long-running scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Rows restored per transaction (default {DEFAULT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat the sweep every N seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        interval = options["interval"]
+
+        while True:
+            result = restore_expired_archives(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"Restored {result['folders']} folders, {result['documents']} documents "
+                f"({result['archive_records']} archive records) in {result['duration_seconds']:.3f}s."
+            ))
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from documents.sequences import sync_sequences
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills the document numbering sequences (type/nature orders and doc_code numbers) "
+        "from the existing documents. Sequences never move backwards; safe to rerun."
+    )
+
+    def handle(self, *args, **options):
+        sequences = sync_sequences()
+        for key, value in sorted(sequences.items()):
+            self.stdout.write(f"{key}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Synchronized {len(sequences)} document sequences."))
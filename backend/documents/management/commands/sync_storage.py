@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from documents.reconcile import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS, reconcile_storage
+
+
+class Command(BaseCommand):
+    help = "Removes folders and documents whose objects no longer exist in storage (ghost rows)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report ghost rows.")
+        parser.add_argument("--resume", action="store_true", help="Continue an interrupted run.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Rows checked/deleted per transaction (default {DEFAULT_CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_MAX_WORKERS,
+            help=f"Concurrent storage checks (default {DEFAULT_MAX_WORKERS}).",
+        )
+
+    def handle(self, *args, **options):
+        result = reconcile_storage(
+            dry_run=options["dry_run"],
+            resume=options["resume"],
+            chunk_size=max(1, options["chunk_size"]),
+            max_workers=max(1, options["workers"]),
+        )
+
+        if result["status"] == "aborted_empty_listing":
+            self.stdout.write(self.style.ERROR("Bucket listing returned no keys; nothing was deleted."))
+            return
+
+        if result["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(result['ghost_folders'])} ghost folders, {len(result['ghost_documents'])} ghost documents "
+                f"({result['listed_keys']} keys listed in {result['duration_seconds']:.3f}s)."
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['deleted_folders']} folders, {result['deleted_documents']} documents "
+            f"({result['listed_keys']} keys listed in {result['duration_seconds']:.3f}s)."
+        ))
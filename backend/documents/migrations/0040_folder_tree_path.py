@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_tree_paths(apps, schema_editor):
+    Folder = apps.get_model('documents', 'Folder')
+    rows = list(Folder.objects.values_list('id', 'parent_folder_id'))
+    children = {}
+    for folder_id, parent_id in rows:
+        children.setdefault(parent_id, []).append(folder_id)
+
+    updates = []
+    stack = [(folder_id, '/', 0) for folder_id in children.get(None, [])]
+    while stack:
+        folder_id, parent_path, depth = stack.pop()
+        path = f"{parent_path}{folder_id}/"
+        updates.append(Folder(id=folder_id, tree_path=path, depth=depth))
+        stack.extend((child_id, path, depth + 1) for child_id in children.get(folder_id, []))
+
+    Folder.objects.bulk_update(updates, ['tree_path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0039_documentcode_document_document_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='tree_path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(backfill_tree_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['tree_path'], name='documents_folder_tree_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+def _folder_part(fol_index, fol_order):
+    if fol_order is not None:
+        formatted_order = f"0{fol_order}" if fol_order < 10 else str(fol_order)
+        return f"{fol_index}-{formatted_order}"
+    return fol_index
+
+
+def backfill_path_index(apps, schema_editor):
+    Folder = apps.get_model('documents', 'Folder')
+    Document = apps.get_model('documents', 'Document')
+    DocumentType = apps.get_model('documents', 'DocumentType')
+    DocumentNature = apps.get_model('documents', 'DocumentNature')
+
+    # Folders: parents first (depth order), each derived from its parent's value.
+    folder_index = {}
+    updates = []
+    for folder in Folder.objects.order_by('depth', 'id').only('id', 'parent_folder_id', 'fol_index', 'fol_order'):
+        part = _folder_part(folder.fol_index, folder.fol_order)
+        parent_index = folder_index.get(folder.parent_folder_id, '')
+        folder.path_index = f"{parent_index}-{part}" if parent_index else part
+        folder_index[folder.id] = folder.path_index
+        updates.append(folder)
+    Folder.objects.bulk_update(updates, ['path_index'], batch_size=500)
+
+    type_codes = dict(DocumentType.objects.values_list('id', 'code'))
+    nature_codes = dict(DocumentNature.objects.values_list('id', 'code'))
+
+    updates = []
+    docs = Document.objects.only(
+        'id', 'parent_folder_id', 'document_type_id', 'document_type_order', 'doc_nature_id', 'doc_nature_order'
+    )
+    for doc in docs.iterator(chunk_size=2000):
+        if doc.document_type_id and doc.document_type_order is not None:
+            doc_part = f"{type_codes.get(doc.document_type_id, '')}-{doc.document_type_order}"
+        elif doc.doc_nature_order is not None:
+            order = doc.doc_nature_order
+            formatted_order = f"0{order}" if order < 10 else str(order)
+            doc_part = f"{nature_codes.get(doc.doc_nature_id, '')}-{formatted_order}"
+        else:
+            doc_part = nature_codes.get(doc.doc_nature_id, '')
+        folder_part = folder_index.get(doc.parent_folder_id, '')
+        doc.path_index = f"{folder_part}-{doc_part}" if folder_part else doc_part
+        updates.append(doc)
+        if len(updates) >= 2000:
+            Document.objects.bulk_update(updates, ['path_index'])
+            updates = []
+    if updates:
+        Document.objects.bulk_update(updates, ['path_index'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0040_folder_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='path_index',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=600),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='path_index',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=512),
+        ),
+        migrations.RunPython(backfill_path_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0041_path_index'),
+        ('users', '0006_site_alter_departement_dep_name_departement_site_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['-updated_at', '-id'], name='documents_doc_updated_id_idx'),
+        ),
+    ]
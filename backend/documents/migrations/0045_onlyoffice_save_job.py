@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0044_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OnlyOfficeSaveJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_key', models.CharField(max_length=255)),
+                ('download_url', models.URLField(max_length=2048)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('DONE', 'DONE'), ('FAILED', 'FAILED')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='onlyoffice_save_jobs', to='documents.document')),
+                ('version', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documents.documentversion')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='documents_o_status_15c50f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('document', 'doc_key'), name='unique_onlyoffice_save_per_key')],
+            },
+        ),
+    ]
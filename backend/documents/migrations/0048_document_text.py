@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:33
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0047_document_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='extracted_text', serialize=False, to='documents.document')),
+                ('source', models.CharField(max_length=1100)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('DONE', 'DONE'), ('FAILED', 'FAILED'), ('UNSUPPORTED', 'UNSUPPORTED')], default='PENDING', max_length=12)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('content', models.TextField(blank=True, default='')),
+                ('truncated', models.BooleanField(default=False)),
+                ('content_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='documents_d_status_476509_idx')],
+            },
+        ),
+    ]
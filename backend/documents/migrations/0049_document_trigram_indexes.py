@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:37
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0048_document_text'),
+        ('users', '0008_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('doc_title'), name='gin_trgm_ops'), name='documents_doc_title_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('doc_code'), name='gin_trgm_ops'), name='documents_doc_code_trgm'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0049_document_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageSyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phase', models.CharField(choices=[('folders', 'folders'), ('documents', 'documents')], default='folders', max_length=16)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('deleted_folders', models.PositiveIntegerField(default=0)),
+                ('deleted_documents', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,5 +1,11 @@
+import uuid
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr, Upper
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.core.files.storage import default_storage
 
@@ -40,6 +46,16 @@ class DocumentCode(models.Model):
         return f"{self.code} - {self.name}"
 
 
+def folder_index_part(fol_index, fol_order):
+    """
+    Format a single folder segment of a path index: "<index>-<order:02>" or "<index>".
+    """
+    if fol_order is not None:
+        formatted_order = f"0{fol_order}" if fol_order < 10 else str(fol_order)
+        return f"{fol_index}-{formatted_order}"
+    return fol_index
+
+
 class Folder(models.Model):
     """
     Represents a folder in the document management system.
@@ -60,6 +76,14 @@ class Folder(models.Model):
         related_name="subfolders",
     )
 
+    # Materialized path of ancestor ids including self (e.g. "/1/5/12/").
+    # Maintained in save(); lets a whole subtree be loaded with one prefix query.
+    tree_path = models.CharField(max_length=1024, blank=True, default="", editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
+    # Denormalized index string (e.g. "PR-01-IT-03"), maintained in save().
+    path_index = models.CharField(max_length=512, blank=True, default="", editable=False, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
@@ -90,11 +114,125 @@ class Folder(models.Model):
         indexes = [
             models.Index(fields=["is_archived"]),
             models.Index(fields=["archived_until"]),
+            models.Index(
+                fields=["tree_path"],
+                name="documents_folder_tree_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
         ]
 
     def __str__(self):
         return self.fol_name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what we were loaded with so save() can detect moves/re-indexing.
+        instance._loaded_parent_id = instance.__dict__.get("parent_folder_id")
+        instance._loaded_index_state = (instance.__dict__.get("fol_index"), instance.__dict__.get("fol_order"))
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        parent_may_change = update_fields is None or "parent_folder" in update_fields
+        moved = self._state.adding or (
+            parent_may_change
+            and getattr(self, "_loaded_parent_id", None) != self.parent_folder_id
+        )
+        reindexed = moved or getattr(self, "_loaded_index_state", None) != (self.fol_index, self.fol_order)
+
+        super().save(*args, **kwargs)
+
+        if moved or not self.tree_path:
+            self._sync_tree_path()
+        if reindexed or not self.path_index:
+            self._sync_path_index()
+        self._loaded_parent_id = self.parent_folder_id
+        self._loaded_index_state = (self.fol_index, self.fol_order)
+
+    def _sync_tree_path(self):
+        """
+        Recompute tree_path/depth from the parent and rewrite the prefix of every
+        descendant with a single UPDATE (no per-folder recursion).
+        """
+        if self.parent_folder_id:
+            parent_path, parent_depth = (
+                Folder.objects.filter(pk=self.parent_folder_id)
+                .values_list("tree_path", "depth")
+                .get()
+            )
+            new_path = f"{parent_path or '/'}{self.pk}/"
+            new_depth = parent_depth + 1
+        else:
+            new_path = f"/{self.pk}/"
+            new_depth = 0
+
+        # Read the stored path rather than trusting this instance: an ancestor may
+        # have moved since it was loaded.
+        old_path, old_depth = (
+            Folder.objects.filter(pk=self.pk).values_list("tree_path", "depth").get()
+        )
+        if old_path == new_path and old_depth == new_depth:
+            self.tree_path, self.depth = new_path, new_depth
+            return
+
+        Folder.objects.filter(pk=self.pk).update(tree_path=new_path, depth=new_depth)
+        if old_path:
+            Folder.objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+                tree_path=Concat(Value(new_path), Substr("tree_path", len(old_path) + 1)),
+                depth=F("depth") + (new_depth - old_depth),
+            )
+        self.tree_path, self.depth = new_path, new_depth
+
+    def _sync_path_index(self):
+        """
+        Recompute the stored path_index and swap the old prefix for the new one on
+        every descendant folder and document (two UPDATEs, whatever the subtree size).
+        """
+        parent_index = ""
+        if self.parent_folder_id:
+            parent_index = (
+                Folder.objects.filter(pk=self.parent_folder_id).values_list("path_index", flat=True).get()
+            )
+        part = self.get_path_index_part()
+        new_index = f"{parent_index}-{part}" if parent_index else part
+
+        old_index = Folder.objects.filter(pk=self.pk).values_list("path_index", flat=True).get()
+        self.path_index = new_index
+        if old_index == new_index:
+            return
+
+        Folder.objects.filter(pk=self.pk).update(path_index=new_index)
+        if not old_index or not self.tree_path:
+            return
+
+        prefix = f"{old_index}-"
+        rewrite = Concat(Value(f"{new_index}-"), Substr("path_index", len(prefix) + 1))
+        Folder.objects.filter(
+            tree_path__startswith=self.tree_path, path_index__startswith=prefix
+        ).exclude(pk=self.pk).update(path_index=rewrite)
+        Document.objects.filter(
+            parent_folder__tree_path__startswith=self.tree_path, path_index__startswith=prefix
+        ).update(path_index=rewrite)
+
+    def get_descendants(self, include_self=True):
+        """
+        All folders below this one (optionally including itself), in one query.
+        """
+        if not self.tree_path:
+            # An empty prefix would match every folder; without a path only the folder itself is known
+            return Folder.objects.filter(pk=self.pk) if include_self and self.pk else Folder.objects.none()
+        qs = Folder.objects.filter(tree_path__startswith=self.tree_path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+
+    def get_path_index_part(self):
+        """
+        This folder's own segment of the path index (e.g. "PR-03" or "GD").
+        """
+        return folder_index_part(self.fol_index, self.fol_order)
+
     def get_full_path(self):
         parts = [self.fol_name]
         parent = self.parent_folder
@@ -136,6 +274,10 @@ class DocumentNature(models.Model):
         return f"{self.code} - {self.name}"
 
 
+# Values matched by the document typeahead (common/typeahead.py), each with a trigram index in Document.Meta
+DOCUMENT_MATCH_FIELDS = {"doc_title": Upper("doc_title"), "doc_code": Upper("doc_code")}
+
+
 class Document(models.Model):
     """
     Represents a document in the system (current/latest file + metadata).
@@ -161,6 +303,14 @@ class Document(models.Model):
 
     # IMPORTANT: keep upload_to="" because you explicitly set keys in views with doc_path.save(key,...)
     doc_path = models.FileField(upload_to="", max_length=2048)
+    # Content-addressed copy of the live bytes (see documents.blobs)
+    blob = models.ForeignKey(
+        "Blob",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="documents",
+    )
 
     doc_type = models.CharField(max_length=50)  # e.g., PDF, Word Document
     doc_format = models.CharField(max_length=20)  # e.g., pdf, docx, xlsx
@@ -194,6 +344,9 @@ class Document(models.Model):
     parent_document = models.ForeignKey("self", null=True, blank=True, on_delete=models.CASCADE)
     parent_folder = models.ForeignKey(Folder, on_delete=models.CASCADE)
 
+    # Denormalized get_path_index() result, maintained in save() and by Folder re-indexing.
+    path_index = models.CharField(max_length=600, blank=True, default="", editable=False, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     document_code = models.ForeignKey(
@@ -217,42 +370,85 @@ class Document(models.Model):
     )
     archive_note = models.TextField(blank=True, default="")  # helpful for UI/search
 
+    # Full-text search document, maintained by documents/search.py (not by save()).
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         permissions = [
             ("can_create_cross_department", "Can create documents in any department"),
         ]
         indexes = [
+            GinIndex(fields=["search_vector"], name="documents_doc_search_gin"),
+            # Typeahead: prefix and fuzzy matching on upper-cased values (common/typeahead.py)
+            GinIndex(OpClass(DOCUMENT_MATCH_FIELDS["doc_title"], name="gin_trgm_ops"), name="documents_doc_title_trgm"),
+            GinIndex(OpClass(DOCUMENT_MATCH_FIELDS["doc_code"], name="gin_trgm_ops"), name="documents_doc_code_trgm"),
             models.Index(fields=["is_archived"]),
             models.Index(fields=["archived_until"]),
             models.Index(fields=["mlean_document_id"]),
             models.Index(fields=["mlean_paper_standard_id"]),
             models.Index(fields=["mlean_standard_id"]),
+            # Keyset pagination order for document listings
+            models.Index(fields=["-updated_at", "-id"], name="documents_doc_updated_id_idx"),
         ]
 
+    # Fields whose change requires path_index to be recomputed.
+    PATH_INDEX_FIELDS = (
+        "parent_folder_id",
+        "document_type_id",
+        "document_type_order",
+        "doc_nature_id",
+        "doc_nature_order",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_index_state = instance._path_index_state()
+        return instance
+
+    def _path_index_state(self):
+        return tuple(self.__dict__.get(name) for name in self.PATH_INDEX_FIELDS)
+
+    def save(self, *args, **kwargs):
+        if (
+            self._state.adding
+            or not self.path_index
+            or getattr(self, "_loaded_index_state", None) != self._path_index_state()
+        ):
+            self.path_index = self.compute_path_index()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "path_index" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "path_index"]
+
+        super().save(*args, **kwargs)
+        self._loaded_index_state = self._path_index_state()
+
     def get_path_index(self):
+        """
+        Returns the stored path_index, computing it if the row predates the column.
+        """
+        return self.path_index or self.compute_path_index()
+
+    def compute_path_index(self):
         """
         Returns the path_index based on the parent folder's hierarchy.
         Logic updated to prefer DocumentType code if available, otherwise falls back to doc_nature.
         """
 
-        def build_folder_part(folder):
-            if folder.fol_order is not None:
-                formatted_order = f"0{folder.fol_order}" if folder.fol_order < 10 else str(folder.fol_order)
-                return f"{folder.fol_index}-{formatted_order}"
-            return folder.fol_index
-
         def folder_path_index(folder):
+            if folder.path_index:
+                return folder.path_index
             parts = []
             cur = folder
             while cur:
-                parts.insert(0, build_folder_part(cur))
+                parts.insert(0, cur.get_path_index_part())
                 cur = cur.parent_folder
             return "-".join(parts)
 
-        folder_part = folder_path_index(self.parent_folder) if self.parent_folder else ""
+        folder_part = folder_path_index(self.parent_folder) if self.parent_folder_id else ""
 
         # Use DocumentType logic if available
-        if self.document_type and self.document_type_order is not None:
+        if self.document_type_id and self.document_type_order is not None:
              formatted_order = str(self.document_type_order)
              # Optional: pad with zero if needed, e.g. f"{self.document_type_order:02d}"
              doc_part = f"{self.document_type.code}-{formatted_order}"
@@ -299,6 +495,14 @@ class DocumentVersion(models.Model):
     # NOTE: upload_to already includes "documents/versions/".
     # Save ONLY the relative part (e.g. "17/v2_file.pdf") to avoid double prefix.
     version_path = models.FileField(upload_to="documents/versions/", max_length=2048)
+    # When set, version_path is the shared blob key (see documents.blobs)
+    blob = models.ForeignKey(
+        "Blob",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="versions",
+    )
 
     version_comment = models.TextField(blank=True, default="")
 
@@ -315,8 +519,12 @@ class DocumentVersion(models.Model):
         ]
 
     def delete(self, *args, **kwargs):
-        if self.version_path:
-            self.version_path.delete(save=False)
+        # Blob-backed files are released by the post_delete signal: the object
+        # is only removed once no version/document references it any more.
+        if self.version_path and not self.blob_id:
+            shared = DocumentVersion.objects.filter(version_path=self.version_path.name).exclude(pk=self.pk)
+            if not shared.exists():
+                self.version_path.delete(save=False)
         super().delete(*args, **kwargs)
 
     def __str__(self):
@@ -370,4 +578,195 @@ class DocumentArchive(models.Model):
         ]
 
     def __str__(self):
-        return f"Archive({self.document_id}) {self.status}"
\ No newline at end of file
+        return f"Archive({self.document_id}) {self.status}"
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked upload. Chunks are streamed into a multipart upload on
+    the object store; `bytes_received` is the offset the client resumes from.
+    """
+    STATUS_ACTIVE = "ACTIVE"
+    STATUS_COMPLETE = "COMPLETE"
+    STATUS_ABORTED = "ABORTED"
+
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, "ACTIVE"),
+        (STATUS_COMPLETE, "COMPLETE"),
+        (STATUS_ABORTED, "ABORTED"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+    )
+
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+
+    # Object key the parts are assembled into
+    key = models.CharField(max_length=1024)
+    storage_upload_id = models.CharField(max_length=255, blank=True, default="")
+    parts = models.JSONField(default=list, blank=True)  # [{"part_number", "etag", "size"}]
+    bytes_received = models.BigIntegerField(default=0)
+
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.filename}) {self.bytes_received}/{self.total_size}"
+
+
+class Blob(models.Model):
+    """
+    Content-addressed file contents, keyed by SHA-256.
+
+    Versions and live documents holding identical bytes share one Blob;
+    `ref_count` is the number of rows pointing at it.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    key = models.CharField(max_length=1024)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Blob {self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class OnlyOfficeSaveJob(models.Model):
+    """
+    A pending OnlyOffice "document ready for saving" callback. One row per
+    (document, editor key) so repeated callbacks are saved once.
+    """
+    STATUS_PENDING = "PENDING"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "PENDING"),
+        (STATUS_RUNNING, "RUNNING"),
+        (STATUS_DONE, "DONE"),
+        (STATUS_FAILED, "FAILED"),
+    ]
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="onlyoffice_save_jobs")
+    doc_key = models.CharField(max_length=255)
+    download_url = models.URLField(max_length=2048)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    version = models.ForeignKey(
+        DocumentVersion,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "doc_key"], name="unique_onlyoffice_save_per_key"),
+        ]
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"OnlyOffice save {self.document_id}/{self.doc_key} {self.status}"
+
+
+class DocumentSequence(models.Model):
+    """
+    Last number handed out for a document numbering scope (see documents/sequences.py):
+    "type:<id>", "nature:<id>", "code:<category>-<nature>" or "parent:<parent code>".
+    """
+    key = models.CharField(max_length=64, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} = {self.last_value}"
+
+
+class DocumentText(models.Model):
+    """
+    Text extracted from a document's live file (see documents/extraction.py).
+    `source` identifies the file the text came from; a new file re-queues extraction.
+    """
+    STATUS_PENDING = "PENDING"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUS_UNSUPPORTED = "UNSUPPORTED"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "PENDING"),
+        (STATUS_RUNNING, "RUNNING"),
+        (STATUS_DONE, "DONE"),
+        (STATUS_FAILED, "FAILED"),
+        (STATUS_UNSUPPORTED, "UNSUPPORTED"),
+    ]
+
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name="extracted_text")
+    source = models.CharField(max_length=1100)
+
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    content = models.TextField(blank=True, default="")
+    truncated = models.BooleanField(default=False)
+    # Tokens of `content`, computed once per extraction and merged into Document.search_vector
+    content_vector = SearchVectorField(null=True, editable=False)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"Text of document {self.document_id} {self.status}"
+
+
+class StorageSyncCheckpoint(models.Model):
+    """
+    Progress of a `manage.py sync_storage` run, so `--resume` works from any
+    process (see documents/reconcile.py). A single row, removed when a run finishes.
+    """
+    PHASE_FOLDERS = "folders"
+    PHASE_DOCUMENTS = "documents"
+
+    PHASE_CHOICES = [
+        (PHASE_FOLDERS, "folders"),
+        (PHASE_DOCUMENTS, "documents"),
+    ]
+
+    phase = models.CharField(max_length=16, choices=PHASE_CHOICES, default=PHASE_FOLDERS)
+    last_id = models.BigIntegerField(default=0)
+    deleted_folders = models.PositiveIntegerField(default=0)
+    deleted_documents = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"sync_storage at {self.phase} #{self.last_id}"
@@ -0,0 +1,80 @@
+"""
+Folder subtree moves (rename / re-parent).
+
+Objects are copied server-side (MinIO CopyObject) on a worker pool, DB paths
+are rewritten with two set-based UPDATEs, and the old keys are removed once
+the transaction commits. Nothing is streamed through Django.
+"""
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+from .models import Document, Folder
+from .object_store import DEFAULT_COPY_WORKERS, copy_objects, delete_objects, iter_keys
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(path):
+    return (path or "").strip().strip("/").replace("\\", "/")
+
+
+def _swap_prefix(field, old_prefix, new_prefix):
+    # new_prefix + field[len(old_prefix):] -- only the leading prefix is replaced
+    return Concat(Value(new_prefix), Substr(field, len(old_prefix) + 1))
+
+
+def move_folder_subtree(folder, old_prefix, new_prefix, max_workers=DEFAULT_COPY_WORKERS, storage=None):
+    """
+    Move every object under `old_prefix` to `new_prefix` and rewrite the
+    fol_path/doc_path of `folder`'s subtree accordingly. `folder.fol_path`
+    itself is expected to be updated by the caller.
+
+    Documents whose object could not be copied keep their old path (the
+    original object is left in place), so no row ends up pointing at nothing.
+    """
+    old_prefix, new_prefix = _normalize(old_prefix), _normalize(new_prefix)
+    result = {"objects_copied": 0, "objects_failed": 0, "folders": 0, "documents": 0}
+    if not old_prefix or not new_prefix or old_prefix == new_prefix:
+        return result
+
+    started = time.monotonic()
+    old_dir, new_dir = f"{old_prefix}/", f"{new_prefix}/"
+
+    # 1. Server-side copy of the whole prefix (documents and .keep markers)
+    pairs = [(key, new_dir + key[len(old_dir):]) for key in iter_keys(old_prefix, storage=storage)]
+    copied, failed = copy_objects(pairs, max_workers=max_workers, storage=storage)
+    failed_keys = [src for src, _ in failed]
+
+    # 2. Bulk path rewrite for the subtree
+    subtree_ids = list(folder.get_descendants().values_list("id", flat=True))
+    with transaction.atomic():
+        result["folders"] = (
+            Folder.objects.filter(id__in=subtree_ids, fol_path__startswith=old_dir)
+            .update(fol_path=_swap_prefix("fol_path", old_dir, new_dir))
+        )
+        result["documents"] = (
+            Document.objects.filter(parent_folder_id__in=subtree_ids, doc_path__startswith=old_dir)
+            .exclude(doc_path__in=failed_keys)
+            .update(doc_path=_swap_prefix("doc_path", old_dir, new_dir))
+        )
+        # 3. Drop the originals only once the new paths are committed
+        old_keys = [src for src, _ in copied]
+        transaction.on_commit(lambda: delete_objects(old_keys, max_workers=max_workers, storage=storage))
+
+    result["objects_copied"] = len(copied)
+    result["objects_failed"] = len(failed)
+    logger.info(
+        "Moved %s -> %s: %s objects copied (%s failed), %s folders, %s documents in %.3fs",
+        old_prefix,
+        new_prefix,
+        result["objects_copied"],
+        result["objects_failed"],
+        result["folders"],
+        result["documents"],
+        time.monotonic() - started,
+    )
+    return result
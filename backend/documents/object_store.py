@@ -0,0 +1,197 @@
+"""
+Low-level helpers for talking to the object store behind `default_storage`.
+
+When the storage is MinIO (minio_storage), these use the MinIO client directly
+so we can list a whole prefix in one paginated call. Any other Django storage
+falls back to the generic Storage API so the callers keep working in tests and
+local development.
+"""
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COPY_WORKERS = 16
+READ_BLOCK_SIZE = 1024 * 1024
+STREAM_PART_SIZE = 8 * 1024 * 1024
+
+
+def minio_client(storage=None):
+    """
+    Return (client, bucket_name) when `storage` is backed by MinIO, else (None, None).
+    """
+    storage = storage or default_storage
+    client = getattr(storage, "client", None)
+    bucket = getattr(storage, "bucket_name", None)
+    if client is None or not bucket:
+        return None, None
+    return client, bucket
+
+
+def iter_keys(prefix="", storage=None):
+    """
+    Yield every object key under `prefix` (recursively).
+
+    MinIO: a single ListObjectsV2 walk; the client follows continuation tokens,
+    so this is one round trip per 1000 keys rather than one per object.
+    """
+    storage = storage or default_storage
+    prefix = (prefix or "").strip("/")
+    client, bucket = minio_client(storage)
+
+    if client is not None:
+        list_prefix = f"{prefix}/" if prefix else ""
+        for obj in client.list_objects(bucket, prefix=list_prefix, recursive=True):
+            if not obj.is_dir:
+                yield obj.object_name
+        return
+
+    # Generic storage API fallback (local/in-memory storages)
+    stack = [prefix]
+    while stack:
+        path = stack.pop()
+        try:
+            dirs, files = storage.listdir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for name in files:
+            yield posixpath.join(path, name) if path else name
+        for name in dirs:
+            stack.append(posixpath.join(path, name) if path else name)
+
+
+def directory_prefixes(keys):
+    """
+    All "directories" implied by a set of keys: "a/b/c.pdf" -> {"a", "a/b"}.
+    """
+    dirs = set()
+    for key in keys:
+        parent = posixpath.dirname(key)
+        while parent and parent not in dirs:
+            dirs.add(parent)
+            parent = posixpath.dirname(parent)
+    return dirs
+
+
+def copy_object(src, dst, storage=None):
+    """
+    Copy one object. On MinIO this is a server-side CopyObject: the bytes never
+    leave the object store.
+    """
+    storage = storage or default_storage
+    client, bucket = minio_client(storage)
+    if client is not None:
+        from minio.commonconfig import CopySource
+
+        client.copy_object(bucket, dst, CopySource(bucket, src))
+        return
+
+    # Match CopyObject semantics: overwrite instead of picking a new name
+    if storage.exists(dst):
+        storage.delete(dst)
+    with storage.open(src) as f:
+        storage.save(dst, f)
+
+
+def copy_objects(pairs, max_workers=DEFAULT_COPY_WORKERS, storage=None):
+    """
+    Copy [(src, dst), ...] on a bounded thread pool.
+
+    Returns (copied, failed) lists of (src, dst); failures are logged, not raised.
+    """
+    storage = storage or default_storage
+    pairs = [(src, dst) for src, dst in pairs if src and dst and src != dst]
+
+    def run(pair):
+        try:
+            copy_object(*pair, storage=storage)
+            return pair, True
+        except Exception:
+            logger.exception("Copy failed: %s -> %s", *pair)
+            return pair, False
+
+    copied, failed = [], []
+    if not pairs:
+        return copied, failed
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for pair, ok in pool.map(run, pairs):
+            (copied if ok else failed).append(pair)
+    return copied, failed
+
+
+def delete_objects(keys, max_workers=DEFAULT_COPY_WORKERS, storage=None):
+    """
+    Delete keys; MinIO uses multi-object DeleteObjects (1000 keys per request).
+    """
+    storage = storage or default_storage
+    keys = [k for k in keys if k]
+    if not keys:
+        return
+    client, bucket = minio_client(storage)
+    if client is not None:
+        from minio.deleteobjects import DeleteObject
+
+        errors = client.remove_objects(bucket, (DeleteObject(k) for k in keys))
+        for error in errors:  # the iterator is lazy: consuming it performs the deletes
+            logger.error("Delete failed for %s: %s", error.name, error.message)
+        return
+
+    def run(key):
+        try:
+            storage.delete(key)
+        except Exception:
+            logger.exception("Delete failed: %s", key)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(run, keys))
+
+
+def sha256_of(key, storage=None):
+    """
+    SHA-256 of a stored object, read in fixed-size blocks.
+    """
+    storage = storage or default_storage
+    hasher = hashlib.sha256()
+    with storage.open(key) as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class HashingReader:
+    """
+    Wraps a readable stream and computes its SHA-256 and size as it is read.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.hasher.update(data)
+            self.size += len(data)
+        return data
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+
+def put_stream(key, stream, storage=None):
+    """
+    Write a stream of unknown length to `key` without buffering it whole.
+    MinIO uploads it as a multipart upload, STREAM_PART_SIZE at a time.
+    """
+    storage = storage or default_storage
+    client, bucket = minio_client(storage)
+    if client is not None:
+        client.put_object(bucket, key, stream, length=-1, part_size=STREAM_PART_SIZE)
+        return key
+    return storage.save(key, File(stream, name=posixpath.basename(key)))
@@ -0,0 +1,195 @@
+"""
+Asynchronous OnlyOffice save pipeline.
+
+The callback view only records an OnlyOfficeSaveJob and answers {"error": 0};
+the edited file is downloaded on a small background pool and streamed straight
+into storage (never held in memory), then turned into a new version.
+Callbacks repeating the same (document, key) map to the same job, so the file
+is saved once. `manage.py process_onlyoffice_saves` retries failed or stuck jobs.
+"""
+import logging
+import os
+from datetime import timedelta
+
+import requests
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from common.background import WorkerPool
+
+from .blobs import acquire, attach_to_version, set_live_blob, store_object
+from .extraction import enqueue_extraction
+from .models import Document, DocumentVersion, OnlyOfficeSaveJob
+from .object_store import HashingReader, copy_object, put_stream
+
+logger = logging.getLogger(__name__)
+
+STAGING_PREFIX = "documents/versions/onlyoffice"
+DOWNLOAD_TIMEOUT = 30
+MAX_ATTEMPTS = 5
+STALE_AFTER = timedelta(minutes=15)
+
+_pool = WorkerPool("ONLYOFFICE_SAVE_WORKERS", "onlyoffice-save")
+
+
+def _submit(job_id):
+    _pool.submit(run_save_job, job_id)
+
+
+def enqueue_save(document_id, doc_key, download_url):
+    """
+    Record a save request and schedule it after commit. Returns (job, created);
+    a repeated callback for the same key returns the existing job.
+    """
+    doc_key = doc_key or download_url
+    try:
+        with transaction.atomic():
+            job, created = OnlyOfficeSaveJob.objects.get_or_create(
+                document_id=document_id,
+                doc_key=doc_key[:255],
+                defaults={"download_url": download_url},
+            )
+    except IntegrityError:
+        return OnlyOfficeSaveJob.objects.get(document_id=document_id, doc_key=doc_key[:255]), False
+
+    if not created and job.status != OnlyOfficeSaveJob.STATUS_FAILED:
+        return job, False
+
+    if not created:
+        # A new callback for a failed save: retry with the fresh URL
+        OnlyOfficeSaveJob.objects.filter(pk=job.pk).update(
+            status=OnlyOfficeSaveJob.STATUS_PENDING, download_url=download_url, error=""
+        )
+    transaction.on_commit(lambda: _submit(job.pk))
+    return job, created
+
+
+def _claim(job_id):
+    """
+    PENDING -> RUNNING; only one worker wins.
+    """
+    claimed = OnlyOfficeSaveJob.objects.filter(pk=job_id, status=OnlyOfficeSaveJob.STATUS_PENDING).update(
+        status=OnlyOfficeSaveJob.STATUS_RUNNING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    return OnlyOfficeSaveJob.objects.select_related("document").get(pk=job_id)
+
+
+def _save_version(document, staged_key, sha256, size, live_name):
+    """
+    Same bookkeeping the synchronous callback used to do: keep an initial v1,
+    add an "ONLYOFFICE edit" version and refresh the live file.
+    """
+    last_v = document.versions.order_by("-version_number").first()
+    if last_v is None and document.doc_path.name:
+        initial = DocumentVersion.objects.create(
+            document=document,
+            version_number=1,
+            change_type="AUDITABLE",
+            version_comment="Initial version",
+        )
+        try:
+            if document.blob_id:
+                acquire(document.blob)
+                attach_to_version(initial, document.blob)
+            else:
+                attach_to_version(initial, store_object(document.doc_path.name))
+        except Exception:
+            logger.exception("OnlyOffice save: could not keep initial content of %s", document.pk)
+        last_v = initial
+
+    next_version = (last_v.version_number + 1) if last_v else 1
+    version = DocumentVersion.objects.create(
+        document=document,
+        version_number=next_version,
+        change_type="AUDITABLE",
+        version_comment="ONLYOFFICE edit",
+    )
+    blob = store_object(staged_key, sha256=sha256, size=size, adopt=True)
+    attach_to_version(version, blob)
+
+    fol_path = (getattr(document.parent_folder, "fol_path", "") or "").strip().strip("/")
+    live_key = f"{fol_path}/{live_name}" if fol_path else live_name
+    copy_object(blob.key, live_key)
+    document.doc_path.name = live_key
+    document.doc_size = blob.size
+    document.save()
+    set_live_blob(document, blob)
+    enqueue_extraction(document)
+    return version
+
+
+def _discard_staged(key):
+    try:
+        default_storage.delete(key)
+    except Exception:
+        logger.exception("OnlyOffice save: could not delete staged object %s", key)
+
+
+def run_save_job(job_id):
+    # Staged object not yet owned by a blob; removed if the job fails
+    staged = None
+    try:
+        job = _claim(job_id)
+        if job is None:
+            return
+        OnlyOfficeSaveJob.objects.filter(pk=job.pk).update(attempts=job.attempts + 1)
+
+        document = job.document
+        if document.is_archived:
+            logger.warning("OnlyOffice save: document %s is archived; ignoring save.", document.pk)
+            OnlyOfficeSaveJob.objects.filter(pk=job.pk).update(status=OnlyOfficeSaveJob.STATUS_DONE)
+            return
+
+        live_name = os.path.basename(document.doc_path.name or "") or f"document_{document.id}.bin"
+        staged_key = f"{STAGING_PREFIX}/{job.pk}/{live_name}"
+
+        # Stream the download into storage, hashing on the way
+        with requests.get(job.download_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+            if r.status_code != 200:
+                raise RuntimeError(f"download status {r.status_code}")
+            r.raw.decode_content = True
+            reader = HashingReader(r.raw)
+            # Set before streaming: also covers a partially written object
+            staged = staged_key
+            staged_key = put_stream(staged_key, reader)
+            staged = staged_key
+
+        with transaction.atomic():
+            document = Document.objects.select_for_update().get(pk=document.pk)
+            version = _save_version(document, staged_key, reader.sha256, reader.size, live_name)
+            OnlyOfficeSaveJob.objects.filter(pk=job.pk).update(
+                status=OnlyOfficeSaveJob.STATUS_DONE, version=version, error=""
+            )
+        # Committed: the staged object is now the version's blob (or was deleted as a duplicate)
+        staged = None
+        logger.info("OnlyOffice save: stored version %s for document %s", version.version_number, document.pk)
+
+    except Exception as exc:
+        logger.exception("OnlyOffice save job %s failed", job_id)
+        OnlyOfficeSaveJob.objects.filter(pk=job_id).update(status=OnlyOfficeSaveJob.STATUS_FAILED, error=str(exc))
+        if staged:
+            _discard_staged(staged)
+
+
+def process_pending(max_attempts=MAX_ATTEMPTS, stale_after=STALE_AFTER):
+    """
+    Run queued, failed (under `max_attempts`) and stuck jobs synchronously.
+    Returns the number of jobs processed.
+    """
+    stale = timezone.now() - stale_after
+    OnlyOfficeSaveJob.objects.filter(
+        status=OnlyOfficeSaveJob.STATUS_RUNNING, updated_at__lt=stale
+    ).update(status=OnlyOfficeSaveJob.STATUS_PENDING)
+    OnlyOfficeSaveJob.objects.filter(
+        status=OnlyOfficeSaveJob.STATUS_FAILED, attempts__lt=max_attempts
+    ).update(status=OnlyOfficeSaveJob.STATUS_PENDING)
+
+    job_ids = list(
+        OnlyOfficeSaveJob.objects.filter(status=OnlyOfficeSaveJob.STATUS_PENDING).values_list("id", flat=True)
+    )
+    for job_id in job_ids:
+        run_save_job(job_id)
+    return len(job_ids)
@@ -0,0 +1,8 @@
+from common.pagination import KeysetCursorPagination
+
+
+class UpdatedAtCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination on (updated_at, id), newest first; see KeysetCursorPagination.
+    """
+    cursor_field = "updated_at"
@@ -0,0 +1,164 @@
+"""
+Storage reconciliation: remove Folder/Document rows whose objects no longer
+exist in the bucket ("ghosts").
+
+The bucket is listed once; DB paths are diffed against the key set in memory.
+Only the rows that look missing are re-checked with exists() (on a bounded
+thread pool), so objects uploaded after the listing started are not deleted.
+Deletion happens in id-ordered chunks, each committed together with a
+checkpoint row (StorageSyncCheckpoint), so an interrupted run can be resumed
+from any process.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Document, Folder, StorageSyncCheckpoint
+from .object_store import directory_prefixes, iter_keys
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ID = 1
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_WORKERS = 8
+
+
+def _normalize(path):
+    return (path or "").strip().strip("/").replace("\\", "/")
+
+
+def _still_missing(candidates, check, max_workers):
+    """
+    Re-check `candidates` [(id, key)] concurrently; keep ids whose object is
+    still absent. Errors count as "exists" so we never delete on a storage error.
+    """
+    def probe(item):
+        row_id, key = item
+        if not key:
+            return row_id, True
+        try:
+            return row_id, not check(key)
+        except Exception:
+            logger.exception("Storage check failed for %s; keeping row %s", key, row_id)
+            return row_id, False
+
+    if not candidates:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return [row_id for row_id, missing in pool.map(probe, candidates) if missing]
+
+
+def _chunks(queryset, after_id, chunk_size):
+    while True:
+        rows = list(queryset.filter(id__gt=after_id).order_by("id")[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def reconcile_storage(
+    dry_run=False,
+    resume=False,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_workers=DEFAULT_MAX_WORKERS,
+    storage=None,
+):
+    """
+    Delete Folder/Document rows with no backing object in storage.
+
+    dry_run  -- report ghosts without deleting anything
+    resume   -- continue from the checkpoint of an interrupted run
+
+    Returns a summary dict (ghost ids are included for dry runs).
+    """
+    storage = storage or default_storage
+    started = time.monotonic()
+
+    checkpoint = StorageSyncCheckpoint.objects.filter(pk=CHECKPOINT_ID).first() if resume and not dry_run else None
+    progress = {
+        "phase": checkpoint.phase if checkpoint else StorageSyncCheckpoint.PHASE_FOLDERS,
+        "last_id": checkpoint.last_id if checkpoint else 0,
+        "deleted_folders": checkpoint.deleted_folders if checkpoint else 0,
+        "deleted_documents": checkpoint.deleted_documents if checkpoint else 0,
+    }
+
+    keys = set(iter_keys(storage=storage))
+    dirs = directory_prefixes(keys)
+    result = {
+        "dry_run": dry_run,
+        "listed_keys": len(keys),
+        "ghost_folders": [],
+        "ghost_documents": [],
+    }
+
+    if not keys and (Folder.objects.exists() or Document.objects.exists()):
+        # An empty listing almost always means a misconfigured bucket; refuse to wipe the DB.
+        logger.error("Storage reconciliation aborted: bucket listing returned no keys")
+        result.update(status="aborted_empty_listing", deleted_folders=0, deleted_documents=0)
+        return result
+
+    def save_progress(phase, last_id):
+        progress.update(phase=phase, last_id=last_id)
+        if not dry_run:
+            # Called inside the chunk's transaction, so the checkpoint commits with its deletions
+            StorageSyncCheckpoint.objects.update_or_create(pk=CHECKPOINT_ID, defaults=progress)
+
+    # 1. Folders: present if any key lives under "<fol_path>/" (e.g. its .keep marker)
+    if progress["phase"] == StorageSyncCheckpoint.PHASE_FOLDERS:
+        folders = Folder.objects.exclude(fol_path="").values_list("id", "fol_path")
+        for rows in _chunks(folders, progress["last_id"], chunk_size):
+            candidates = [(fid, _normalize(path)) for fid, path in rows if _normalize(path) not in dirs]
+            ghosts = _still_missing(
+                [(fid, f"{path}/.keep") for fid, path in candidates], storage.exists, max_workers
+            )
+            with transaction.atomic():
+                if ghosts:
+                    result["ghost_folders"].extend(ghosts)
+                    if not dry_run:
+                        Folder.objects.filter(id__in=ghosts).delete()
+                        progress["deleted_folders"] += len(ghosts)
+                save_progress(StorageSyncCheckpoint.PHASE_FOLDERS, rows[-1][0])
+        save_progress(StorageSyncCheckpoint.PHASE_DOCUMENTS, 0)
+
+    # 2. Documents: present if doc_path is an exact key
+    documents = Document.objects.values_list("id", "doc_path")
+    for rows in _chunks(documents, progress["last_id"], chunk_size):
+        candidates = [(did, _normalize(path)) for did, path in rows if _normalize(path) not in keys]
+        ghosts = _still_missing(candidates, storage.exists, max_workers)
+        with transaction.atomic():
+            if ghosts:
+                result["ghost_documents"].extend(ghosts)
+                if not dry_run:
+                    # Queryset delete: the objects are already gone, nothing to remove from storage
+                    Document.objects.filter(id__in=ghosts).delete()
+                    progress["deleted_documents"] += len(ghosts)
+            save_progress(StorageSyncCheckpoint.PHASE_DOCUMENTS, rows[-1][0])
+
+    if not dry_run:
+        StorageSyncCheckpoint.objects.filter(pk=CHECKPOINT_ID).delete()
+
+    result.update(
+        status="dry_run" if dry_run else "synced",
+        deleted_folders=0 if dry_run else progress["deleted_folders"],
+        deleted_documents=0 if dry_run else progress["deleted_documents"],
+        duration_seconds=round(time.monotonic() - started, 3),
+    )
+    if not dry_run:
+        # Ids are only useful for previews; keep real-run payloads small
+        result.pop("ghost_folders")
+        result.pop("ghost_documents")
+
+    logger.info(
+        "Storage reconciliation (%s): %s keys listed, %s folders / %s documents removed in %.3fs",
+        result["status"],
+        result["listed_keys"],
+        result["deleted_folders"],
+        result["deleted_documents"],
+        result["duration_seconds"],
+    )
+    return result
@@ -0,0 +1,164 @@
+"""
+Full-text search over document metadata (PostgreSQL).
+
+Document.search_vector holds a weighted tsvector built from
+  A: doc_title, doc_code
+  B: department name, document type name
+  C: doc_description
+  D: archive_note, text extracted from the file (see extraction.py)
+and is searched through a GIN index. Vectors are recomputed in SQL, in one
+UPDATE per batch, whenever a document's searched fields change and when a
+department or document type is renamed (see signals.py). Run
+`manage.py rebuild_search_index` once after deploying, and after bulk
+changes made with queryset.update().
+
+On other databases (local development) search falls back to unranked
+case-insensitive matching on the same fields.
+"""
+from html import escape
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, SearchVectorCombinable, SearchVectorField,
+)
+from django.db import connection
+from django.db.models import F, FloatField, Func, OuterRef, Q, Subquery, Value
+
+from .models import Document
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Document fields the vector is built from; saves touching none of them keep the vector
+SEARCH_FIELDS = (
+    "doc_title", "doc_code", "doc_description", "archive_note", "doc_departement", "document_type",
+)
+# Related names included in the vector
+RELATED_SEARCH_FIELDS = ("doc_departement__dep_name", "document_type__name")
+
+# ts_headline does not escape the text, so matches are delimited with private-use
+# sentinels and only turned into <mark> tags after the text is HTML-escaped
+MARK_START, MARK_STOP = "\ue000", "\ue001"
+HEADLINE_OPTIONS = {"start_sel": MARK_START, "stop_sel": MARK_STOP, "max_fragments": 2, "max_words": 20, "min_words": 5}
+
+
+def search_config():
+    return getattr(settings, "DOCUMENT_SEARCH_CONFIG", "simple")
+
+
+def fts_enabled():
+    return connection.vendor == "postgresql"
+
+
+class StoredVector(SearchVectorCombinable, Func):
+    """
+    An already computed tsvector column (empty when NULL), combinable with SearchVector.
+    """
+    template = "COALESCE(%(expressions)s, ''::tsvector)"
+    output_field = SearchVectorField()
+    config = None
+
+
+def document_vector():
+    config = search_config()
+    return (
+        SearchVector("doc_title", "doc_code", weight="A", config=config)
+        + SearchVector(*RELATED_SEARCH_FIELDS, weight="B", config=config)
+        + SearchVector("doc_description", weight="C", config=config)
+        + SearchVector("archive_note", weight="D", config=config)
+        + StoredVector("extracted_text__content_vector")
+    )
+
+
+# -----------------------
+# Index maintenance
+# -----------------------
+def update_search_vectors(queryset):
+    """
+    Recompute the vectors of the documents in `queryset` with one UPDATE.
+    Returns the number of rows updated.
+    """
+    if not fts_enabled():
+        return 0
+    vector = Document.objects.filter(pk=OuterRef("pk")).annotate(v=document_vector()).values("v")[:1]
+    return Document.objects.filter(pk__in=queryset.values("pk")).update(search_vector=Subquery(vector))
+
+
+def rebuild_search_index(batch_size=DEFAULT_BATCH_SIZE, only_missing=False):
+    """
+    Recompute vectors in id-ordered batches. Returns the number of documents indexed.
+    """
+    if not fts_enabled():
+        return 0
+    queryset = Document.objects.all()
+    if only_missing:
+        queryset = queryset.filter(search_vector__isnull=True)
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return indexed
+        last_id = ids[-1]
+        indexed += update_search_vectors(Document.objects.filter(id__in=ids))
+
+
+# -----------------------
+# Querying
+# -----------------------
+def _query(text):
+    return SearchQuery(text, search_type="websearch", config=search_config())
+
+
+def search_documents(queryset, text):
+    """
+    Restrict `queryset` to documents matching `text` (websearch syntax: quotes,
+    OR, -exclusion), best matches first, with a `rank` annotation (None
+    without PostgreSQL).
+    """
+    text = (text or "").strip()
+    if not text:
+        return queryset.none()
+
+    if not fts_enabled():
+        match = Q()
+        for field in ("doc_title", "doc_code", "doc_description", "archive_note", *RELATED_SEARCH_FIELDS,
+                      "extracted_text__content"):
+            match |= Q(**{f"{field}__icontains": text})
+        return queryset.filter(match).annotate(rank=Value(None, output_field=FloatField())).order_by("-updated_at", "-id")
+
+    query = _query(text)
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-id")
+    )
+
+
+def _marked(headline):
+    """
+    HTML-escaped `headline` with the sentinel-delimited matches wrapped in <mark>.
+    """
+    if headline is None:
+        return None
+    return escape(headline).replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>")
+
+
+def highlights(document_ids, text):
+    """
+    {document id: {"doc_title": ..., "doc_description": ...}} as HTML: the
+    text escaped, matched terms wrapped in <mark>. Computed in one query for a
+    page of results only, as ts_headline re-parses the text. Empty without
+    PostgreSQL.
+    """
+    if not fts_enabled() or not document_ids:
+        return {}
+    query = _query(text)
+    config = search_config()
+    rows = Document.objects.filter(pk__in=document_ids).annotate(
+        title_highlight=SearchHeadline("doc_title", query, config=config, **HEADLINE_OPTIONS),
+        description_highlight=SearchHeadline("doc_description", query, config=config, **HEADLINE_OPTIONS),
+    ).values_list("pk", "title_highlight", "description_highlight")
+    return {
+        pk: {"doc_title": _marked(title), "doc_description": _marked(description)}
+        for pk, title, description in rows
+    }
@@ -0,0 +1,151 @@
+"""
+Document numbering.
+
+Each numbering scope (a document type, a nature, a category/nature code
+prefix or a parent document code) has one DocumentSequence row holding the
+last number handed out. Allocating increments that row with a single UPDATE,
+which locks it until the surrounding transaction ends, so concurrent uploads
+queue on one row instead of scanning the documents table and racing on the
+doc_code unique constraint. Numbers of rolled-back transactions are reused;
+numbers of deleted documents are not.
+
+A scope without a row is seeded from the existing documents on first use;
+`manage.py sync_document_sequences` (re)computes every scope, e.g. after
+documents were imported with explicit numbers.
+"""
+import re
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import Document, DocumentSequence
+
+# Scopes numbered inside doc_code: (key kind, pattern capturing (prefix, number))
+CODE_SCOPES = (
+    ("code", re.compile(r"^([A-Z]{2}-[A-Z]{2})-(\d{2})(?:-\d{2})?$")),
+    ("parent", re.compile(r"^([A-Z]{2}-[A-Z]{2}-\d{2})-(\d{2})$")),
+)
+
+
+def type_key(document_type):
+    return f"type:{document_type.pk}"
+
+
+def nature_key(nature):
+    return f"nature:{nature.pk}"
+
+
+def code_key(category_code, nature_code):
+    return f"code:{category_code}-{nature_code}"
+
+
+def parent_key(parent_code):
+    return f"parent:{parent_code}"
+
+
+# -----------------------
+# Seeding from documents
+# -----------------------
+def _max_order(field, **filters):
+    return Document.objects.filter(**filters).aggregate(m=Max(field))["m"] or 0
+
+
+def _max_code_number(kind, prefix):
+    """
+    Highest number in the doc_codes of the `kind` scope `prefix`.
+    Only used to seed a scope, once.
+    """
+    pattern = dict(CODE_SCOPES)[kind]
+    numbers = [0]
+    for code in Document.objects.filter(doc_code__startswith=prefix).values_list("doc_code", flat=True).iterator():
+        match = pattern.match(code)
+        if match and match.group(1) == prefix:
+            numbers.append(int(match.group(2)))
+    return max(numbers)
+
+
+def current_max(key):
+    """
+    Highest number already used in the scope `key`, from the documents table.
+    """
+    kind, _, value = key.partition(":")
+    if kind == "type":
+        return _max_order("document_type_order", document_type_id=int(value))
+    if kind == "nature":
+        return _max_order("doc_nature_order", doc_nature_id=int(value))
+    if kind in dict(CODE_SCOPES):
+        return _max_code_number(kind, value)
+    raise ValueError(f"Unknown sequence key {key!r}")
+
+
+def _seed(key):
+    try:
+        with transaction.atomic():
+            DocumentSequence.objects.create(key=key, last_value=current_max(key))
+    except IntegrityError:
+        # Seeded concurrently
+        pass
+
+
+# -----------------------
+# Public API
+# -----------------------
+def allocate(key):
+    """
+    Reserve and return the next number of the scope `key`.
+    The sequence row stays locked until the caller's transaction ends.
+    """
+    with transaction.atomic(savepoint=False):
+        if not DocumentSequence.objects.filter(key=key).update(last_value=F("last_value") + 1):
+            _seed(key)
+            DocumentSequence.objects.filter(key=key).update(last_value=F("last_value") + 1)
+        return DocumentSequence.objects.values_list("last_value", flat=True).get(key=key)
+
+
+def peek(key):
+    """
+    Next number of the scope `key`, without reserving it.
+    """
+    value = DocumentSequence.objects.filter(key=key).values_list("last_value", flat=True).first()
+    return (current_max(key) if value is None else value) + 1
+
+
+def sync_sequences():
+    """
+    Recompute every scope from the documents table. Sequences never move
+    backwards, so numbers already handed out are not reused.
+    Returns {key: last value} of the scopes found in the documents.
+    """
+    found = defaultdict(int)
+    for type_id, order in (
+        Document.objects.filter(document_type__isnull=False)
+        .values_list("document_type_id").annotate(m=Max("document_type_order"))
+    ):
+        found[f"type:{type_id}"] = order or 0
+    for nature_id, order in Document.objects.values_list("doc_nature_id").annotate(m=Max("doc_nature_order")):
+        found[f"nature:{nature_id}"] = order or 0
+    for code in Document.objects.values_list("doc_code", flat=True).iterator():
+        for kind, pattern in CODE_SCOPES:
+            match = pattern.match(code)
+            if match:
+                key = f"{kind}:{match.group(1)}"
+                found[key] = max(found[key], int(match.group(2)))
+
+    with transaction.atomic():
+        existing = {
+            sequence.key: sequence
+            for sequence in DocumentSequence.objects.select_for_update().filter(key__in=list(found))
+        }
+        missing = []
+        for key, value in found.items():
+            sequence = existing.get(key)
+            if sequence is None:
+                missing.append(DocumentSequence(key=key, last_value=value))
+            elif sequence.last_value < value:
+                sequence.last_value = value
+                sequence.save(update_fields=["last_value"])
+            else:
+                found[key] = sequence.last_value
+        DocumentSequence.objects.bulk_create(missing, ignore_conflicts=True)
+    return dict(found)
@@ -1,3 +1,4 @@
+from django.db.models import Max, Prefetch
 from django.utils import timezone
 from rest_framework import serializers
 
@@ -66,6 +67,8 @@ class DocumentVersionSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentVersion
         fields = "__all__"
+        # Blob references are counted; only documents/blobs.py may move them
+        read_only_fields = ("blob",)
 
     def get_download_url(self, obj):
         try:
@@ -117,18 +120,66 @@ class DocumentSerializer(serializers.ModelSerializer):
             return None
 
     def get_versions(self, obj):
-        qs = obj.versions.order_by("-version_number", "-version_date")
+        # Prefetched (already ordered) versions avoid one query per row
+        if "versions" in getattr(obj, "_prefetched_objects_cache", {}):
+            qs = obj.versions.all()
+        else:
+            qs = obj.versions.order_by("-version_number", "-version_date")
         return DocumentVersionSerializer(qs, many=True).data
 
     def get_latest_version(self, obj):
-        # Efficiently get the highest version number
+        # Use the Max() annotation from DocumentListSerializer.prepare_queryset when present
+        if hasattr(obj, "latest_version_number"):
+            return obj.latest_version_number or 1
         last_v = obj.versions.order_by("-version_number").first()
         return last_v.version_number if last_v else 1
 
     class Meta:
         model = Document
-        fields = "__all__"
-        read_only_fields = ("doc_path", "doc_owner", "doc_code", "document_type_order")
+        exclude = ("search_vector",)
+        read_only_fields = ("doc_path", "doc_owner", "doc_code", "document_type_order", "blob")
+
+
+class DocumentListSerializer(DocumentSerializer):
+    """
+    DocumentSerializer for list endpoints (READ only).
+    Use with prepare_queryset() so a listing costs a constant number of queries
+    regardless of row count. `versions` is only rendered when the serializer
+    context has include_versions=True; a `fields` set in the context restricts
+    the output to those fields (sparse fieldsets, "id" is always kept).
+    """
+
+    @staticmethod
+    def prepare_queryset(queryset, include_versions=False):
+        queryset = queryset.select_related(
+            "doc_owner",
+            "archived_by",
+            "document_code",
+            "site",
+            "document_type",
+            "doc_departement",
+        ).defer("search_vector").annotate(latest_version_number=Max("versions__version_number"))
+
+        if include_versions:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "versions",
+                    queryset=DocumentVersion.objects.order_by("-version_number", "-version_date"),
+                )
+            )
+        return queryset
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get("include_versions", False):
+            fields.pop("versions", None)
+
+        requested = self.context.get("fields")
+        if requested:
+            for name in list(fields):
+                if name != "id" and name not in requested:
+                    fields.pop(name)
+        return fields
 
 
 class DocumentCreateUpdateSerializer(serializers.ModelSerializer):
@@ -140,8 +191,8 @@ class DocumentCreateUpdateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Document
-        fields = "__all__"
-        read_only_fields = ("doc_owner", "doc_code", "document_type_order")
+        exclude = ("search_vector",)
+        read_only_fields = ("doc_owner", "doc_code", "document_type_order", "blob")
 
     def validate_doc_code(self, value):
         # Only validate if doc_code provided (PUT/PATCH may omit it)
@@ -255,6 +306,7 @@ class FolderSerializer(serializers.ModelSerializer):
             "fol_path",
             "fol_index",
             "fol_order",
+            "path_index",
             "parent_folder",
             "created_by",
             "created_at",
@@ -267,6 +319,7 @@ class FolderSerializer(serializers.ModelSerializer):
             "archived_note",
         ]
         read_only_fields = (
+            "path_index",
             "created_by",
             "created_at",
             "updated_at",
@@ -299,6 +352,8 @@ class FolderSerializer(serializers.ModelSerializer):
         return data
 
     def _is_descendant(self, parent, instance):
+        if parent.tree_path and instance.tree_path:
+            return parent.tree_path.startswith(instance.tree_path)
         while parent:
             if parent == instance:
                 return True
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from users.models import Departement
+
+from .blobs import release
+from .models import Document, DocumentType, DocumentVersion
+from .search import SEARCH_FIELDS, update_search_vectors
+
+# update_fields may name a foreign key by field name or attname
+SEARCHED_FIELD_NAMES = set(SEARCH_FIELDS) | {
+    Document._meta.get_field(name).attname for name in SEARCH_FIELDS
+}
+_NAME_FIELDS = {Departement: "dep_name", DocumentType: "name"}
+
+
+@receiver(post_delete, sender=DocumentVersion)
+@receiver(post_delete, sender=Document)
+def release_blob_reference(sender, instance, **kwargs):
+    # Also runs for cascaded deletes (document -> versions)
+    if instance.blob_id:
+        release(instance.blob_id)
+
+
+# ------------------------ Search index ------------------------
+
+@receiver(post_save, sender=Document)
+def index_document(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & SEARCHED_FIELD_NAMES:
+        return
+    update_search_vectors(Document.objects.filter(pk=instance.pk))
+
+
+@receiver(post_init, sender=Departement)
+@receiver(post_init, sender=DocumentType)
+def remember_indexed_name(sender, instance, **kwargs):
+    # __dict__ lookup: never load a deferred field from a signal
+    instance._indexed_name = instance.__dict__.get(_NAME_FIELDS[sender])
+
+
+@receiver(post_save, sender=Departement)
+@receiver(post_save, sender=DocumentType)
+def reindex_renamed(sender, instance, created, **kwargs):
+    name = instance.__dict__.get(_NAME_FIELDS[sender])
+    previous, instance._indexed_name = getattr(instance, "_indexed_name", None), name
+    if created or name == previous:
+        return
+    lookup = "doc_departement" if sender is Departement else "document_type"
+    update_search_vectors(Document.objects.filter(**{lookup: instance}))
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .archiving import restore_expired_archives
+from .models import Document, DocumentArchive, DocumentNature, Folder
+from .views import _folder_is_archived_anywhere
+
+
+class ArchiveSweeperTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        role = Role.objects.create(role_name="tester", role_color="blue")
+        dep = Departement.objects.create(dep_name="eng", dep_color="#000")
+        self.user = User.objects.create_user(
+            username="sweeper", password="pass", role=role, departement=dep, is_staff=True
+        )
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        past = timezone.now() - timedelta(hours=1)
+
+        self.folder = Folder.objects.create(
+            fol_name="Expired", is_archived=True, archived_until=past
+        )
+        self.live_folder = Folder.objects.create(fol_name="Live")
+        self.docs = [
+            Document.objects.create(
+                doc_title=f"Doc {i}",
+                doc_path=f"x/doc{i}.pdf",
+                doc_type="PDF",
+                doc_format="pdf",
+                doc_owner=self.user,
+                doc_departement=dep,
+                doc_code=f"FI-{i}",
+                doc_nature=nature,
+                parent_folder=folder,
+                is_archived=True,
+                archived_until=past,
+            )
+            for i, folder in enumerate([self.folder, self.live_folder, self.live_folder])
+        ]
+        for doc in self.docs:
+            DocumentArchive.objects.create(document=doc, retention_until=past)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_reads_show_expired_archives_without_writing(self):
+        resp = self.client.get("/api/documents/")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 3)
+        self.assertEqual(Document.objects.filter(is_archived=True).count(), 3)
+
+    def test_sweeper_restores_in_batches(self):
+        result = restore_expired_archives(batch_size=1)
+
+        self.assertEqual(result["folders"], 1)
+        self.assertEqual(result["documents"], 3)
+        self.assertEqual(result["archive_records"], 3)
+        self.assertIn("duration_seconds", result)
+        self.assertFalse(Document.objects.filter(is_archived=True).exists())
+        self.assertFalse(Folder.objects.filter(is_archived=True).exists())
+
+    def test_expired_archives_count_as_live_in_object_checks(self):
+        reader = User.objects.create_user(
+            username="reader", password="pass", role=self.user.role, departement=self.user.departement
+        )
+        self.client.force_authenticate(user=reader)
+        expired = self.docs[1]
+        Document.objects.filter(pk=expired.pk).update(doc_status_type="PUBLIC")
+        self.assertEqual(self.client.get(f"/api/documents/{expired.pk}/").status_code, 200)
+
+        Document.objects.filter(pk=expired.pk).update(archived_until=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.client.get(f"/api/documents/{expired.pk}/").status_code, 404)
+
+        child = Folder.objects.create(fol_name="Child", parent_folder=self.folder)
+        self.assertFalse(_folder_is_archived_anywhere(child))
+        Folder.objects.filter(pk=self.folder.pk).update(archived_until=None)
+        self.assertTrue(_folder_is_archived_anywhere(child))
@@ -0,0 +1,104 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .blobs import acquire, release, store_file
+from .models import Blob, Document, DocumentNature, DocumentVersion, Folder
+from .testing import IN_MEMORY_STORAGES
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class BlobRefCountTest(TestCase):
+    def setUp(self):
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        self.dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        self.owner = User.objects.create_user(
+            username="blobber", password="pass", role=Role.objects.create(role_name="blob", role_color="blue"),
+            departement=self.dep,
+        )
+        self.folder = Folder.objects.create(fol_name="Blobs", fol_path="Blobs")
+
+    def _document(self, order):
+        return Document.objects.create(
+            doc_title=f"Doc {order}",
+            doc_path=f"Blobs/doc{order}.pdf",
+            doc_type="PDF",
+            doc_format="pdf",
+            doc_owner=self.owner,
+            doc_departement=self.dep,
+            doc_code=f"FI-{order}",
+            doc_nature=self.nature,
+            doc_nature_order=order,
+            parent_folder=self.folder,
+        )
+
+    def _version(self, document, number, content):
+        blob = store_file(ContentFile(content, name="scan.pdf"))
+        return DocumentVersion.objects.create(
+            document=document, version_number=number, blob=blob, version_path=blob.key
+        )
+
+    def test_identical_content_is_stored_once(self):
+        first = self._version(self._document(1), 1, b"same bytes")
+        second = self._version(self._document(2), 1, b"same bytes")
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertTrue(first.blob.key.endswith(".pdf"))
+
+    def test_delete_only_removes_unreferenced_blobs(self):
+        document = self._document(1)
+        v1 = self._version(document, 1, b"shared")
+        v2 = DocumentVersion.objects.create(document=document, version_number=2, blob=v1.blob, version_path=v1.blob.key)
+        acquire(v1.blob)
+        key = v1.blob.key
+
+        with self.captureOnCommitCallbacks(execute=True):
+            v2.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(default_storage.exists(key))
+
+        # Cascaded delete of the document releases the last reference
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(key))
+
+    def test_release_keeps_an_object_stored_again_meanwhile(self):
+        blob = store_file(ContentFile(b"reused", name="scan.pdf"))
+        with self.captureOnCommitCallbacks() as callbacks:
+            release(blob.id)
+            # Same content stored again before the release commits: same key
+            again = store_file(ContentFile(b"reused", name="scan.pdf"))
+        self.assertNotEqual(again.id, blob.id)
+        self.assertEqual(again.key, blob.key)
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(default_storage.exists(again.key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release(again.id)
+        self.assertFalse(default_storage.exists(again.key))
+
+    def test_api_cannot_repoint_blob(self):
+        document = self._document(1)
+        version = self._version(document, 1, b"mine")
+        other = self._version(self._document(2), 1, b"theirs")
+        Document.objects.filter(pk=document.pk).update(blob=version.blob)
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+
+        resp = client.patch(f"/api/document-versions/{version.pk}/", {"blob": other.blob_id}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        resp = client.patch(f"/api/documents/{document.pk}/", {"blob": other.blob_id}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+
+        mine = version.blob_id
+        version.refresh_from_db()
+        document.refresh_from_db()
+        self.assertEqual((version.blob_id, document.blob_id), (mine, mine))
+        self.assertEqual(Blob.objects.get(pk=other.blob_id).ref_count, 1)
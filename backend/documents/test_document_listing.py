@@ -0,0 +1,163 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, Site, User
+
+from .archiving import next_archive_expiry
+from .models import Document, DocumentNature, DocumentVersion, Folder
+
+
+class DocumentListingTestBase(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name="tester", role_color="blue")
+        self.dep = Departement.objects.create(dep_name="eng", dep_color="#000")
+        self.user = User.objects.create_user(
+            username="lister", password="pass", role=role, departement=self.dep, is_staff=True
+        )
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        self.folder = Folder.objects.create(fol_name="Lists", fol_path="Lists")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.counter = 0
+        # Warm the archive-expiry guard so it does not skew query counts
+        cache.clear()
+        next_archive_expiry()
+
+    def _add_documents(self, count):
+        for _ in range(count):
+            self.counter += 1
+            doc = Document.objects.create(
+                doc_title=f"Doc {self.counter}",
+                doc_path=f"Lists/doc{self.counter}.pdf",
+                doc_type="PDF",
+                doc_format="pdf",
+                doc_owner=self.user,
+                doc_departement=self.dep,
+                doc_code=f"FI-{self.counter}",
+                doc_nature=self.nature,
+                doc_nature_order=self.counter,
+                parent_folder=self.folder,
+            )
+            for number in (1, 2):
+                DocumentVersion.objects.create(
+                    document=doc, version_number=number, version_path=f"{doc.id}/v{number}.pdf"
+                )
+
+    def _list(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json(), len(ctx.captured_queries)
+
+
+class DocumentListingQueriesTest(DocumentListingTestBase):
+    def test_query_count_is_constant(self):
+        url = f"/api/documents/by-folder/{self.folder.id}/"
+        self._add_documents(2)
+        _, small = self._list(url)
+
+        self._add_documents(20)
+        data, large = self._list(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(data["documents"]), 22)
+
+    def test_versions_and_latest_version(self):
+        self._add_documents(1)
+        data, _ = self._list(f"/api/documents/by-folder/{self.folder.id}/")
+
+        row = data["documents"][0]
+        self.assertEqual(row["latest_version"], 2)
+        self.assertEqual([v["version_number"] for v in row["versions"]], [2, 1])
+
+
+class DocumentListingPaginationTest(DocumentListingTestBase):
+    def test_cursor_walks_every_row_once(self):
+        self._add_documents(7)
+        # Force ties on updated_at so the id tie-breaker is exercised
+        Document.objects.filter(id__in=list(Document.objects.values_list("id", flat=True)[:4])).update(
+            updated_at=Document.objects.first().updated_at
+        )
+
+        seen = []
+        url = "/api/documents/?page_size=3"
+        while url:
+            data, _ = self._list(url)
+            seen.extend(row["id"] for row in data["results"])
+            url = data["next"]
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(set(seen), set(Document.objects.values_list("id", flat=True)))
+
+    def test_sparse_fields_and_expand(self):
+        self._add_documents(1)
+
+        data, _ = self._list("/api/documents/?fields=doc_title,latest_version")
+        self.assertEqual(set(data[0]), {"id", "doc_title", "latest_version"})
+
+        data, _ = self._list("/api/documents/?fields=doc_title&expand=versions")
+        self.assertEqual(set(data[0]), {"id", "doc_title", "versions"})
+        self.assertEqual(len(data[0]["versions"]), 2)
+
+    def test_ordering_is_rejected_with_pagination(self):
+        self._add_documents(1)
+        resp = self.client.get("/api/documents/?ordering=path_index&page_size=5")
+        self.assertEqual(resp.status_code, 400)
+        data, _ = self._list("/api/documents/?ordering=-path_index")
+        self.assertEqual(len(data), 1)
+
+    def test_legacy_listing_is_unpaginated(self):
+        self._add_documents(2)
+        data, _ = self._list("/api/documents/")
+        self.assertIsInstance(data, list)
+        self.assertIn("versions", data[0])
+
+
+class DocumentListingFacetsTest(DocumentListingTestBase):
+    def setUp(self):
+        super().setUp()
+        self.site = Site.objects.create(name="Plant A")
+        self._add_documents(4)
+        docs = list(Document.objects.order_by("id"))
+        Document.objects.filter(pk__in=[docs[0].pk, docs[1].pk]).update(site=self.site)
+        Document.objects.filter(pk=docs[2].pk).update(doc_format="docx")
+        Document.objects.filter(pk=docs[3].pk).update(is_archived=True)
+
+    def _facets(self, data, name):
+        return {item["value"]: item["count"] for item in data["facets"][name]}
+
+    def test_counts_come_from_one_query_and_exclude_own_filter(self):
+        data, queries = self._list(f"/api/documents/?facets=all&page_size=10&site={self.site.id}")
+        # One query for the page, one for every facet
+        self.assertEqual(queries, 2)
+        self.assertEqual(len(data["documents"]), 2)
+        # Site counts ignore the site filter; the others respect it (and the live default)
+        self.assertEqual(self._facets(data, "site"), {self.site.id: 2, None: 1})
+        self.assertEqual(data["facets"]["site"][0]["label"], "Plant A")
+        self.assertEqual(self._facets(data, "doc_format"), {"pdf": 2})
+        self.assertEqual(self._facets(data, "is_archived"), {False: 2})
+
+    def test_filters_combine(self):
+        data, _ = self._list("/api/documents/?doc_format=pdf,docx&site=null&facets=doc_format,is_archived")
+        self.assertEqual([row["doc_format"] for row in data["documents"]], ["docx"])
+        self.assertEqual(self._facets(data, "doc_format"), {"docx": 1})
+        self.assertEqual(self._facets(data, "is_archived"), {False: 1, True: 1})
+
+        data, _ = self._list("/api/documents/?is_archived=true")
+        self.assertEqual(len(data), 1)
+
+    def test_counts_follow_path_index_filter(self):
+        docs = list(Document.objects.order_by("id"))
+        Document.objects.filter(pk__in=[docs[0].pk, docs[2].pk]).update(path_index="ZZ-1")
+
+        data, _ = self._list("/api/documents/?path_index=ZZ&facets=doc_format,site")
+        self.assertEqual(sorted(row["id"] for row in data["documents"]), [docs[0].pk, docs[2].pk])
+        self.assertEqual(self._facets(data, "doc_format"), {"pdf": 1, "docx": 1})
+        self.assertEqual(self._facets(data, "site"), {self.site.id: 1, None: 1})
+
+    def test_invalid_facets(self):
+        self.assertEqual(self.client.get("/api/documents/?facets=owner").status_code, 400)
+        self.assertEqual(self.client.get("/api/documents/?site=abc").status_code, 400)
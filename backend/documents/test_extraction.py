@@ -0,0 +1,129 @@
+import io
+import zipfile
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from users.models import Departement, Role, User
+
+from .extraction import _claim, _finish, enqueue_extraction, extract_text, process_pending
+from .models import Document, DocumentNature, DocumentText, Folder
+from .search import search_documents
+from .testing import IN_MEMORY_STORAGES
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+
+
+def _zip(parts):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return buffer.getvalue()
+
+
+def _docx(*paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{p[:4]}</w:t></w:r><w:r><w:t>{p[4:]}</w:t></w:r></w:p>" for p in paragraphs)
+    return _zip({"word/document.xml": f"<w:document {W}><w:body>{body}</w:body></w:document>"})
+
+
+def _xlsx():
+    return _zip({
+        "xl/sharedStrings.xml": f"<sst {S}><si><t>Pressure</t></si><si><t>Boiler</t></si></sst>",
+        "xl/worksheets/sheet1.xml": (
+            f"<worksheet {S}><sheetData>"
+            '<row r="1"><c r="A1" t="s"><v>1</v></c><c r="B1" t="s"><v>0</v></c></row>'
+            '<row r="2"><c r="A2"><v>42</v></c><c r="B2" t="inlineStr"><is><t>bar</t></is></c></row>'
+            "</sheetData></worksheet>"
+        ),
+    })
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class TextExtractorsTest(TestCase):
+    def _extract(self, name, content, fmt):
+        default_storage.save(name, io.BytesIO(content))
+        return extract_text(name, fmt)
+
+    def test_formats(self):
+        self.assertEqual(self._extract("t/a.txt", b"first line\n\nsecond line\n", "txt"), ("first line\nsecond line", False))
+        self.assertEqual(self._extract("t/a.csv", b"code,title\nFI-1,\"Boiler, main\"\n", "csv"), ("code title\nFI-1 Boiler, main", False))
+        self.assertEqual(self._extract("t/a.docx", _docx("Valve seals", "Check monthly"), "docx"), ("Valve seals\nCheck monthly", False))
+        self.assertEqual(self._extract("t/a.xlsx", _xlsx(), "xlsx"), ("Boiler Pressure\n42 bar", False))
+
+    @override_settings(TEXT_EXTRACTION_MAX_CHARS=10)
+    def test_truncates(self):
+        self.assertEqual(self._extract("t/b.txt", b"0123456789abcdef\nmore\n", "txt"), ("0123456789", True))
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class ExtractionQueueTest(TestCase):
+    def setUp(self):
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        self.owner = User.objects.create_user(
+            username="owner", password="pass", role=Role.objects.create(role_name="ed", role_color="blue"),
+            departement=dep,
+        )
+        self.folder = Folder.objects.create(fol_name="Docs", fol_path="Docs")
+        self.defaults = dict(doc_owner=self.owner, doc_departement=dep, doc_nature=nature, parent_folder=self.folder)
+
+    def _document(self, code, name, content):
+        path = default_storage.save(f"Docs/{name}", io.BytesIO(content))
+        return Document.objects.create(
+            doc_title=code, doc_code=code, doc_path=path, doc_format=name.rsplit(".", 1)[-1], **self.defaults
+        )
+
+    @mock.patch("documents.extraction.wake")
+    def test_enqueue_runs_after_commit_and_once_per_file(self, wake):
+        document = self._document("FI-1", "seals.docx", _docx("Valve seals"))
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_extraction(document)
+        wake.assert_called_once_with()
+
+        self.assertEqual(process_pending(), 1)
+        text = DocumentText.objects.get(document=document)
+        self.assertEqual((text.status, text.content), (DocumentText.STATUS_DONE, "Valve seals"))
+        self.assertEqual(list(search_documents(Document.objects.all(), "seals")), [document])
+
+        # Same file: nothing to do
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_extraction(document)
+        self.assertEqual(wake.call_count, 1)
+        self.assertEqual(process_pending(), 0)
+
+    def test_result_for_a_replaced_file_is_discarded(self):
+        document = self._document("FI-1", "a.txt", b"old text")
+        enqueue_extraction(document)
+        (row,) = _claim(10)
+
+        document.doc_path.name = default_storage.save("Docs/b.txt", io.BytesIO(b"new text"))
+        document.save()
+        enqueue_extraction(document)
+        self.assertFalse(_finish(row, status=DocumentText.STATUS_DONE, content="old text"))
+
+        process_pending()
+        self.assertEqual(DocumentText.objects.get(document=document).content, "new text")
+
+    def test_unsupported_and_failed_files(self):
+        image = self._document("FI-1", "plan.png", b"\x89PNG")
+        broken = self._document("FI-2", "broken.docx", b"not a zip")
+        enqueue_extraction(image)
+        enqueue_extraction(broken)
+
+        process_pending(max_attempts=2)
+        self.assertEqual(DocumentText.objects.get(document=image).status, DocumentText.STATUS_UNSUPPORTED)
+        failed = DocumentText.objects.get(document=broken)
+        self.assertEqual((failed.status, failed.attempts), (DocumentText.STATUS_FAILED, 1))
+
+        process_pending(max_attempts=2)
+        process_pending(max_attempts=2)
+        self.assertEqual(DocumentText.objects.get(document=broken).attempts, 2)
+
+    def test_backfill_command(self):
+        document = self._document("FI-1", "notes.csv", b"boiler,pressure\n")
+        call_command("extract_document_text", batch_size=1, stdout=io.StringIO())
+        self.assertEqual(DocumentText.objects.get(document=document).content, "boiler pressure")
@@ -0,0 +1,142 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .archiving import next_archive_expiry
+from .models import Document, DocumentNature, Folder
+
+
+class FolderTreePathTest(TestCase):
+    def setUp(self):
+        self.root_a = Folder.objects.create(fol_name="A", fol_index="PR", fol_order=1)
+        self.root_b = Folder.objects.create(fol_name="B", fol_index="GD")
+        self.child = Folder.objects.create(fol_name="A1", fol_index="PR", fol_order=2, parent_folder=self.root_a)
+        self.grandchild = Folder.objects.create(fol_name="A1x", parent_folder=self.child)
+
+    def test_tree_path_on_create(self):
+        self.grandchild.refresh_from_db()
+        self.assertEqual(
+            self.grandchild.tree_path,
+            f"/{self.root_a.pk}/{self.child.pk}/{self.grandchild.pk}/",
+        )
+        self.assertEqual(self.grandchild.depth, 2)
+
+    def test_move_rewrites_subtree(self):
+        child = Folder.objects.get(pk=self.child.pk)
+        child.parent_folder = self.root_b
+        child.save()
+
+        self.grandchild.refresh_from_db()
+        self.assertEqual(
+            self.grandchild.tree_path,
+            f"/{self.root_b.pk}/{self.child.pk}/{self.grandchild.pk}/",
+        )
+        self.assertEqual(
+            set(self.root_a.get_descendants().values_list("id", flat=True)),
+            {self.root_a.pk},
+        )
+
+    def test_descendants_without_tree_path_never_match_everything(self):
+        Folder.objects.filter(pk=self.child.pk).update(tree_path="")
+        child = Folder.objects.get(pk=self.child.pk)
+        self.assertEqual(list(child.get_descendants().values_list("id", flat=True)), [self.child.pk])
+        self.assertFalse(child.get_descendants(include_self=False).exists())
+        self.assertFalse(Folder(fol_name="unsaved").get_descendants().exists())
+
+
+class PathIndexTest(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name="tester", role_color="blue")
+        self.dep = Departement.objects.create(dep_name="eng", dep_color="#000")
+        self.owner = User.objects.create_user(username="idx", password="pass", role=role, departement=self.dep)
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+
+        self.root = Folder.objects.create(fol_name="Root", fol_index="PR", fol_order=1)
+        self.other_root = Folder.objects.create(fol_name="Other", fol_index="GD")
+        self.sub = Folder.objects.create(fol_name="Sub", fol_index="IT", parent_folder=self.root)
+        self.doc = Document.objects.create(
+            doc_title="Doc",
+            doc_path="Root/Sub/doc.pdf",
+            doc_type="PDF",
+            doc_format="pdf",
+            doc_owner=self.owner,
+            doc_departement=self.dep,
+            doc_code="FI-2",
+            doc_nature=self.nature,
+            doc_nature_order=2,
+            parent_folder=self.sub,
+        )
+
+    def _index(self, obj):
+        obj.refresh_from_db()
+        return obj.path_index
+
+    def test_computed_on_create(self):
+        self.assertEqual(self._index(self.sub), "PR-01-IT")
+        self.assertEqual(self._index(self.doc), "PR-01-IT-FI-02")
+
+    def test_reorder_cascades_to_subtree(self):
+        root = Folder.objects.get(pk=self.root.pk)
+        root.fol_order = 4
+        root.save(update_fields=["fol_order"])
+
+        self.assertEqual(self._index(self.sub), "PR-04-IT")
+        self.assertEqual(self._index(self.doc), "PR-04-IT-FI-02")
+
+    def test_move_cascades_to_subtree(self):
+        sub = Folder.objects.get(pk=self.sub.pk)
+        sub.parent_folder = self.other_root
+        sub.save()
+
+        self.assertEqual(self._index(self.doc), "GD-IT-FI-02")
+
+    def test_document_order_change(self):
+        doc = Document.objects.get(pk=self.doc.pk)
+        doc.doc_nature_order = 11
+        doc.save()
+
+        self.assertEqual(self._index(self.doc), "PR-01-IT-FI-11")
+
+
+class FolderTreeEndpointTest(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name="tester", role_color="blue")
+        dep = Departement.objects.create(dep_name="eng", dep_color="#000")
+        self.user = User.objects.create_user(username="tree", password="pass", role=role, departement=dep)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # Warm the archive-expiry guard so it does not skew query counts
+        cache.clear()
+        next_archive_expiry()
+
+    def _get_tree(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/folders/tree/")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json(), len(ctx.captured_queries)
+
+    def test_shape_and_path_index(self):
+        root = Folder.objects.create(fol_name="Root", fol_index="PR", fol_order=3)
+        Folder.objects.create(fol_name="Sub", fol_index="IT", parent_folder=root)
+
+        tree, _ = self._get_tree()
+
+        self.assertEqual(len(tree), 1)
+        self.assertEqual(tree[0]["path_index"], "PR-03")
+        self.assertEqual(tree[0]["subfolders"][0]["path_index"], "PR-03-IT")
+        self.assertEqual(tree[0]["subfolders"][0]["subfolders"], [])
+
+    def test_query_count_does_not_grow_with_folders(self):
+        root = Folder.objects.create(fol_name="Root")
+        _, small = self._get_tree()
+
+        parent = root
+        for i in range(10):
+            parent = Folder.objects.create(fol_name=f"L{i}", parent_folder=parent)
+        _, large = self._get_tree()
+
+        self.assertEqual(small, large)
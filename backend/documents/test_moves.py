@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.test import TestCase
+
+from users.models import Departement, Role, User
+
+from .models import Document, DocumentNature, Folder
+from .moves import move_folder_subtree
+
+
+class MoveFolderSubtreeTest(TestCase):
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        for key in ("A/.keep", "A/B/.keep", "A/B/one.pdf", "A/B/two.pdf"):
+            self.storage.save(key, ContentFile(b"x"))
+
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        owner = User.objects.create_user(
+            username="mover", password="pass", role=Role.objects.create(role_name="move", role_color="blue"),
+            departement=dep,
+        )
+        self.root = Folder.objects.create(fol_name="A", fol_path="A")
+        self.child = Folder.objects.create(fol_name="B", fol_path="A/B", parent_folder=self.root)
+        self.docs = [
+            Document.objects.create(
+                doc_title=name,
+                doc_path=f"A/B/{name}",
+                doc_type="PDF",
+                doc_format="pdf",
+                doc_owner=owner,
+                doc_departement=dep,
+                doc_code=f"FI-{order}",
+                doc_nature=nature,
+                doc_nature_order=order,
+                parent_folder=self.child,
+            )
+            for order, name in enumerate(("one.pdf", "two.pdf"), start=1)
+        ]
+
+    def _rename_root(self):
+        self.root.fol_name = "Z"
+        self.root.fol_path = "Z"
+        self.root.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            return move_folder_subtree(self.root, "A", "Z", storage=self.storage)
+
+    def test_moves_objects_and_rewrites_paths(self):
+        result = self._rename_root()
+
+        self.assertEqual(result["objects_copied"], 4)
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.fol_path, "Z/B")
+        self.assertEqual(
+            sorted(Document.objects.values_list("doc_path", flat=True)), ["Z/B/one.pdf", "Z/B/two.pdf"]
+        )
+        self.assertTrue(self.storage.exists("Z/B/one.pdf"))
+        self.assertTrue(self.storage.exists("Z/.keep"))
+        self.assertFalse(self.storage.exists("A/B/one.pdf"))
+
+    def test_failed_copy_keeps_old_path(self):
+        from . import object_store
+
+        real_copy = object_store.copy_object
+
+        def flaky_copy(src, dst, storage=None):
+            if src.endswith("two.pdf"):
+                raise OSError("boom")
+            real_copy(src, dst, storage=storage)
+
+        with mock.patch.object(object_store, "copy_object", side_effect=flaky_copy):
+            result = self._rename_root()
+
+        self.assertEqual(result["objects_failed"], 1)
+        self.docs[1].refresh_from_db()
+        self.assertEqual(self.docs[1].doc_path.name, "A/B/two.pdf")
+        self.assertTrue(self.storage.exists("A/B/two.pdf"))
@@ -0,0 +1,111 @@
+import io
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .models import Document, DocumentNature, Folder, OnlyOfficeSaveJob
+from .object_store import iter_keys
+from .onlyoffice import STAGING_PREFIX, run_save_job
+from .testing import IN_MEMORY_STORAGES
+
+
+def _download(content, status_code=200):
+    response = mock.MagicMock(status_code=status_code, raw=io.BytesIO(content))
+    response.__enter__.return_value = response
+    return response
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class OnlyOfficeSaveTest(TestCase):
+    def setUp(self):
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        owner = User.objects.create_user(
+            username="editor", password="pass", role=Role.objects.create(role_name="ed", role_color="blue"),
+            departement=dep,
+        )
+        folder = Folder.objects.create(fol_name="Office", fol_path="Office")
+        self.document = Document.objects.create(
+            doc_title="Report",
+            doc_path="Office/report.docx",
+            doc_type="DOCX",
+            doc_format="docx",
+            doc_owner=owner,
+            doc_departement=dep,
+            doc_code="FI-1",
+            doc_nature=nature,
+            doc_nature_order=1,
+            parent_folder=folder,
+        )
+        default_storage.save("Office/report.docx", io.BytesIO(b"original"))
+        self.url = f"/api/documents/{self.document.id}/onlyoffice-callback/"
+        self.payload = {"status": 2, "url": "http://office.local/cache/report.docx", "key": "1-100"}
+
+    @mock.patch("documents.onlyoffice._submit")
+    def test_callback_acknowledges_and_deduplicates(self, submit):
+        client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                resp = client.post(self.url, self.payload, format="json")
+                self.assertEqual(resp.json(), {"error": 0})
+
+        job = OnlyOfficeSaveJob.objects.get()
+        self.assertEqual(job.status, OnlyOfficeSaveJob.STATUS_PENDING)
+        submit.assert_called_once_with(job.pk)
+
+    @mock.patch("documents.onlyoffice.requests.get")
+    def test_job_streams_download_into_new_version(self, get):
+        get.return_value = _download(b"edited")
+        job = OnlyOfficeSaveJob.objects.create(document=self.document, doc_key="1-100", download_url=self.payload["url"])
+
+        run_save_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OnlyOfficeSaveJob.STATUS_DONE)
+        self.assertEqual(
+            list(self.document.versions.order_by("version_number").values_list("version_comment", flat=True)),
+            ["Initial version", "ONLYOFFICE edit"],
+        )
+        self.document.refresh_from_db()
+        with default_storage.open(self.document.doc_path.name) as f:
+            self.assertEqual(f.read(), b"edited")
+        with default_storage.open(job.version.version_path.name) as f:
+            self.assertEqual(f.read(), b"edited")
+
+    @mock.patch("documents.onlyoffice.requests.get")
+    def test_failed_download_is_retryable(self, get):
+        get.return_value = _download(b"", status_code=404)
+        job = OnlyOfficeSaveJob.objects.create(document=self.document, doc_key="1-100", download_url=self.payload["url"])
+
+        run_save_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OnlyOfficeSaveJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertFalse(self.document.versions.exists())
+
+    @mock.patch("documents.onlyoffice._submit")
+    def test_callback_for_unknown_document(self, submit):
+        resp = APIClient().post("/api/documents/999999/onlyoffice-callback/", self.payload, format="json")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["error"], 1)
+        self.assertFalse(OnlyOfficeSaveJob.objects.exists())
+        submit.assert_not_called()
+
+    @mock.patch("documents.onlyoffice._save_version", side_effect=RuntimeError("db down"))
+    @mock.patch("documents.onlyoffice.requests.get")
+    def test_failed_save_removes_staged_object(self, get, save_version):
+        get.return_value = _download(b"edited")
+        job = OnlyOfficeSaveJob.objects.create(document=self.document, doc_key="1-100", download_url=self.payload["url"])
+
+        run_save_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OnlyOfficeSaveJob.STATUS_FAILED)
+        save_version.assert_called_once()
+        self.assertEqual(list(iter_keys(STAGING_PREFIX)), [])
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.test import TestCase
+
+from users.models import Departement, Role, User
+
+from .models import Document, DocumentNature, Folder, StorageSyncCheckpoint
+from .reconcile import reconcile_storage
+
+
+class ReconcileStorageTest(TestCase):
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        self.storage.save("Live/.keep", ContentFile(b""))
+        self.storage.save("Live/doc.pdf", ContentFile(b"x"))
+
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        self.dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        self.owner = User.objects.create_user(
+            username="syncer", password="pass", role=Role.objects.create(role_name="sync", role_color="blue"),
+            departement=self.dep,
+        )
+        self.live_folder = Folder.objects.create(fol_name="Live", fol_path="Live")
+        self.ghost_folder = Folder.objects.create(fol_name="Gone", fol_path="Gone")
+        self.live_doc = self._document("Live/doc.pdf", 1)
+        self.ghost_doc = self._document("Live/missing.pdf", 2)
+
+    def _document(self, path, order):
+        return Document.objects.create(
+            doc_title=path,
+            doc_path=path,
+            doc_type="PDF",
+            doc_format="pdf",
+            doc_owner=self.owner,
+            doc_departement=self.dep,
+            doc_code=f"FI-{order}",
+            doc_nature=self.nature,
+            doc_nature_order=order,
+            parent_folder=self.live_folder,
+        )
+
+    def test_dry_run_reports_without_deleting(self):
+        result = reconcile_storage(dry_run=True, storage=self.storage)
+
+        self.assertEqual(result["ghost_folders"], [self.ghost_folder.id])
+        self.assertEqual(result["ghost_documents"], [self.ghost_doc.id])
+        self.assertEqual(Folder.objects.count(), 2)
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_deletes_ghosts_in_chunks(self):
+        result = reconcile_storage(chunk_size=1, storage=self.storage)
+
+        self.assertEqual(result["deleted_folders"], 1)
+        self.assertEqual(result["deleted_documents"], 1)
+        self.assertEqual(list(Folder.objects.values_list("id", flat=True)), [self.live_folder.id])
+        self.assertEqual(list(Document.objects.values_list("id", flat=True)), [self.live_doc.id])
+        self.assertFalse(StorageSyncCheckpoint.objects.exists())
+
+    def test_resume_skips_processed_rows(self):
+        # Left by an interrupted run in another process
+        StorageSyncCheckpoint.objects.create(phase=StorageSyncCheckpoint.PHASE_DOCUMENTS, last_id=self.ghost_doc.id)
+        result = reconcile_storage(resume=True, storage=self.storage)
+
+        self.assertEqual(result["deleted_folders"], 0)
+        self.assertTrue(Document.objects.filter(id=self.ghost_doc.id).exists())
+
+    def test_empty_listing_aborts(self):
+        result = reconcile_storage(storage=InMemoryStorage())
+
+        self.assertEqual(result["status"], "aborted_empty_listing")
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_resume_continues_from_the_stored_checkpoint(self):
+        # Interrupted by a storage error in the first document chunk
+        checks = [[], [self.ghost_folder.id], RuntimeError("listing lost")]
+        with mock.patch("documents.reconcile._still_missing", side_effect=checks):
+            with self.assertRaises(RuntimeError):
+                reconcile_storage(chunk_size=1, storage=self.storage)
+
+        checkpoint = StorageSyncCheckpoint.objects.get()
+        self.assertEqual((checkpoint.phase, checkpoint.last_id), (StorageSyncCheckpoint.PHASE_DOCUMENTS, 0))
+        self.assertEqual(checkpoint.deleted_folders, 1)
+
+        result = reconcile_storage(resume=True, chunk_size=1, storage=self.storage)
+        self.assertEqual((result["deleted_folders"], result["deleted_documents"]), (1, 1))
+        self.assertFalse(StorageSyncCheckpoint.objects.exists())
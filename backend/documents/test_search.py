@@ -0,0 +1,116 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .models import Document, DocumentNature, DocumentType, Folder
+from .search import MARK_START, MARK_STOP, _marked, rebuild_search_index
+
+
+class SearchFixtureMixin:
+    def _fixtures(self):
+        self.dep = Departement.objects.create(dep_name="Maintenance", dep_color="#000")
+        role = Role.objects.create(role_name="reader", role_color="blue")
+        self.owner = User.objects.create_user(username="owner", password="pass", role=role, departement=self.dep)
+        self.reader = User.objects.create_user(username="reader", password="pass", role=role, departement=self.dep)
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        self.folder = Folder.objects.create(fol_name="QA", fol_path="QA")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.reader)
+
+    def _document(self, code, title, description="", status="PUBLIC", **extra):
+        return Document.objects.create(
+            doc_title=title, doc_description=description, doc_type="PDF", doc_format="pdf",
+            doc_owner=self.owner, doc_departement=self.dep, doc_code=code, doc_nature=self.nature,
+            doc_status_type=status, parent_folder=self.folder, **extra,
+        )
+
+    def _search(self, q, **params):
+        resp = self.client.get("/api/documents/search/", {"q": q, **params})
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()
+
+
+class DocumentSearchViewTest(SearchFixtureMixin, TestCase):
+    def setUp(self):
+        self._fixtures()
+
+    def test_visibility_matches_listing(self):
+        self._document("FI-1", "Boiler inspection")
+        self._document("FI-2", "Boiler drafts", status="DRAFT")
+        self._document("FI-3", "Boiler archive", is_archived=True)
+
+        codes = [row["doc_code"] for row in self._search("boiler")["results"]]
+        self.assertEqual(codes, ["FI-1"])
+
+        self.client.force_authenticate(user=self.owner)
+        codes = {row["doc_code"] for row in self._search("boiler")["results"]}
+        self.assertEqual(codes, {"FI-1", "FI-2"})
+
+    def test_paging_and_sparse_fields(self):
+        for i in range(3):
+            self._document(f"FI-{i}", f"Pump {i}")
+
+        first = self._search("pump", limit=2, fields="doc_code")
+        self.assertEqual(first["next_offset"], 2)
+        self.assertEqual(set(first["results"][0]), {"id", "doc_code", "rank", "highlight"})
+        last = self._search("pump", limit=2, offset=2)
+        self.assertIsNone(last["next_offset"])
+        self.assertEqual(len(last["results"]), 1)
+
+    def test_requires_text(self):
+        self.assertEqual(self.client.get("/api/documents/search/").status_code, 400)
+
+
+class HighlightMarkupTest(SimpleTestCase):
+    def test_text_is_escaped_before_marks_are_added(self):
+        headline = f"<b>&</b> {MARK_START}valve{MARK_STOP} seals"
+        self.assertEqual(_marked(headline), "&lt;b&gt;&amp;&lt;/b&gt; <mark>valve</mark> seals")
+        self.assertIsNone(_marked(None))
+
+
+@skipUnless(connection.vendor == "postgresql", "full-text search requires PostgreSQL")
+class FullTextSearchTest(SearchFixtureMixin, TestCase):
+    def setUp(self):
+        self._fixtures()
+
+    def test_ranked_and_highlighted(self):
+        self._document("FI-1", "Valve maintenance", "Replace the valve seals", archive_note="valve")
+        self._document("FI-2", "Safety rules", "Check the valve monthly")
+        self._document("FI-3", "Unrelated")
+
+        results = self._search("valve")["results"]
+        self.assertEqual([row["doc_code"] for row in results], ["FI-1", "FI-2"])
+        self.assertGreater(results[0]["rank"], results[1]["rank"])
+        self.assertIn("<mark>Valve</mark>", results[0]["highlight"]["doc_title"])
+        self.assertIn("<mark>valve</mark>", results[1]["highlight"]["doc_description"])
+
+    def test_highlight_escapes_document_text(self):
+        self._document("FI-1", '<img src=x onerror="alert(1)"> valve')
+        title = self._search("valve")["results"][0]["highlight"]["doc_title"]
+        self.assertNotIn("<img", title)
+        self.assertIn("&lt;img", title)
+        self.assertIn("<mark>valve</mark>", title)
+
+    def test_vectors_follow_related_renames(self):
+        doc_type = DocumentType.objects.create(name="Procedure", code="PROC")
+        self._document("FI-1", "Boiler", document_type=doc_type)
+        self.assertEqual(len(self._search("procedure")["results"]), 1)
+
+        doc_type.name = "Manual"
+        doc_type.save()
+        self.dep.dep_name = "Operations"
+        self.dep.save()
+        self.assertEqual(self._search("procedure")["results"], [])
+        self.assertEqual(len(self._search("manual operations")["results"]), 1)
+
+    def test_rebuild_after_bulk_update(self):
+        document = self._document("FI-1", "Boiler")
+        Document.objects.filter(pk=document.pk).update(doc_title="Chiller")
+        self.assertEqual(self._search("chiller")["results"], [])
+
+        self.assertEqual(rebuild_search_index(batch_size=1), 1)
+        self.assertEqual(len(self._search("chiller")["results"]), 1)
@@ -0,0 +1,130 @@
+import threading
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .models import Document, DocumentNature, DocumentSequence, Folder
+from .sequences import allocate, code_key, nature_key, parent_key, peek, sync_sequences
+from .testing import IN_MEMORY_STORAGES
+from .utils import generate_document_code
+
+
+class SequenceFixtureMixin:
+    def _fixtures(self):
+        self.dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        self.user = User.objects.create_user(
+            username="numberer", password="pass", role=Role.objects.create(role_name="num", role_color="blue"),
+            departement=self.dep,
+        )
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        self.folder = Folder.objects.create(fol_name="Scans", fol_path="Scans")
+
+    def _document(self, code, order=None):
+        return Document.objects.create(
+            doc_title=code, doc_type="PDF", doc_format="pdf", doc_owner=self.user, doc_departement=self.dep,
+            doc_code=code, doc_nature=self.nature, doc_nature_order=order, parent_folder=self.folder,
+        )
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class DocumentSequenceTest(SequenceFixtureMixin, TestCase):
+    def setUp(self):
+        self._fixtures()
+
+    def test_scopes_are_seeded_from_existing_documents(self):
+        self._document("FI-5", order=5)
+        self._document("GD-PR-07")
+        self._document("GD-PR-07-03")
+
+        self.assertEqual(peek(nature_key(self.nature)), 6)
+        self.assertEqual(allocate(nature_key(self.nature)), 6)
+        self.assertEqual(allocate(nature_key(self.nature)), 7)
+        self.assertEqual(generate_document_code("GD", "PR"), "GD-PR-08")
+        self.assertEqual(generate_document_code("GD", "IT", parent_code="GD-PR-07"), "GD-PR-07-04")
+
+        # Seeded once: later allocations do not look at the documents table
+        with self.assertNumQueries(2):
+            allocate(code_key("GD", "PR"))
+
+    def test_codes_taken_explicitly_are_skipped(self):
+        self._document("GD-PR-04")
+        self.assertEqual(generate_document_code("GD", "PR"), "GD-PR-05")
+        # Imported with an explicit number the sequence has not reached yet
+        self._document("GD-PR-06")
+        self._document("GD-PR-07")
+        self.assertEqual(generate_document_code("GD", "PR"), "GD-PR-08")
+        self.assertEqual(DocumentSequence.objects.get(key=code_key("GD", "PR")).last_value, 8)
+
+    def test_exhausted_scope_is_not_consumed(self):
+        DocumentSequence.objects.create(key=parent_key("GD-PR-01"), last_value=99)
+        with self.assertRaises(ValueError):
+            generate_document_code("GD", "IT", parent_code="GD-PR-01")
+        self.assertEqual(DocumentSequence.objects.get(key=parent_key("GD-PR-01")).last_value, 99)
+
+    def test_upload_allocates_nature_order(self):
+        self._document("FI-2", order=2)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        codes = []
+        for name in ("a.pdf", "b.pdf"):
+            resp = client.post(
+                "/api/documents/",
+                {"file": SimpleUploadedFile(name, b"%PDF"), "parent_folder": self.folder.id,
+                 "doc_nature": self.nature.id, "doc_title": name},
+            )
+            self.assertEqual(resp.status_code, 201, resp.content)
+            codes.append(resp.json()["document"]["doc_code"])
+        self.assertEqual(codes, ["FI-3", "FI-4"])
+
+    def test_sync_command_backfills_and_never_moves_back(self):
+        self._document("FI-4", order=4)
+        self._document("GD-PR-02")
+        DocumentSequence.objects.create(key=code_key("GD", "PR"), last_value=9)
+
+        out = StringIO()
+        call_command("sync_document_sequences", stdout=out)
+        self.assertIn("Synchronized", out.getvalue())
+        values = dict(DocumentSequence.objects.values_list("key", "last_value"))
+        self.assertEqual(values[nature_key(self.nature)], 4)
+        self.assertEqual(values[code_key("GD", "PR")], 9)
+        self.assertEqual(sync_sequences()[code_key("GD", "PR")], 9)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentAllocationTest(SequenceFixtureMixin, TransactionTestCase):
+    workers = 8
+    per_worker = 10
+
+    def test_concurrent_allocations_are_unique(self):
+        self._fixtures()
+        self._document("FI-1", order=1)
+        allocated, errors = [], []
+        start = threading.Barrier(self.workers)
+
+        def worker():
+            try:
+                start.wait()
+                for _ in range(self.per_worker):
+                    allocated.append(allocate(nature_key(self.nature)))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.workers * self.per_worker
+        self.assertEqual(sorted(allocated), list(range(2, total + 2)))
+        self.assertEqual(DocumentSequence.objects.get(key=nature_key(self.nature)).last_value, total + 1)
@@ -0,0 +1,71 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from .models import Document, DocumentNature, Folder
+
+
+class TypeaheadTest(TestCase):
+    def setUp(self):
+        dep = Departement.objects.create(dep_name="Maintenance", dep_color="#000")
+        role = Role.objects.create(role_name="reader", role_color="blue")
+        self.owner = User.objects.create_user(
+            username="jdupont", first_name="Jean", last_name="Dupont", password="pass", role=role, departement=dep
+        )
+        self.reader = User.objects.create_user(
+            username="mmartin", first_name="Marie", last_name="Martin", password="pass", role=role, departement=dep
+        )
+        User.objects.create_user(
+            username="jformer", first_name="Jeanne", last_name="Former", password="pass", role=role,
+            departement=dep, is_active=False,
+        )
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        folder = Folder.objects.create(fol_name="QA", fol_path="QA")
+        for code, title, status in (
+            ("FI-10", "Boiler inspection", "PUBLIC"),
+            ("FI-11", "Main boiler drawings", "PUBLIC"),
+            ("BO-12", "Pump manual", "PUBLIC"),
+            ("FI-13", "Boiler draft", "DRAFT"),
+        ):
+            Document.objects.create(
+                doc_title=title, doc_code=code, doc_status_type=status, doc_owner=self.owner,
+                doc_departement=dep, doc_nature=nature, parent_folder=folder,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.reader)
+
+    def _get(self, url, **params):
+        resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()["results"]
+
+    def test_documents_prefix_matches_first_and_visibility(self):
+        results = self._get("/api/documents/typeahead/", q="bo")
+        # Title or code prefixes first; the other owner's draft is not visible
+        self.assertEqual([row["doc_code"] for row in results][:2], ["FI-10", "BO-12"])
+        self.assertNotIn("FI-13", [row["doc_code"] for row in results])
+        self.assertEqual(set(results[0]), {"id", "doc_title", "doc_code", "doc_status_type", "score"})
+
+        self.assertEqual(len(self._get("/api/documents/typeahead/", q="b", limit=1)), 1)
+        self.assertEqual(self._get("/api/documents/typeahead/", q=" "), [])
+
+    def test_users_by_username_or_full_name(self):
+        self.assertEqual([row["username"] for row in self._get("/api/users/typeahead/", q="jean d")], ["jdupont"])
+        self.assertEqual([row["username"] for row in self._get("/api/users/typeahead/", q="MMAR")], ["mmartin"])
+        # Inactive users are never offered
+        self.assertEqual(self._get("/api/users/typeahead/", q="jeanne"), [])
+
+    def test_invalid_limit(self):
+        self.assertEqual(self.client.get("/api/documents/typeahead/", {"q": "bo", "limit": "x"}).status_code, 400)
+
+    @skipUnless(connection.vendor == "postgresql", "fuzzy matching requires pg_trgm")
+    def test_fuzzy_matches_ranked_after_prefixes(self):
+        results = self._get("/api/documents/typeahead/", q="boilr")
+        self.assertEqual({row["doc_code"] for row in results}, {"FI-10", "FI-11"})
+        self.assertTrue(all(row["score"] > 0 for row in results))
+
+        self.assertEqual([row["username"] for row in self._get("/api/users/typeahead/", q="dupond")], ["jdupont"])
@@ -0,0 +1,201 @@
+import hashlib
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.storage import InMemoryStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import Departement, Role, User
+
+from . import object_store
+from .models import Document, DocumentNature, Folder, UploadSession
+from .testing import IN_MEMORY_STORAGES
+from .uploads import (
+    UploadError, UploadOffsetMismatch, _MinioParts, _StorageParts, complete_upload, expire_stale_uploads, receive_chunk,
+    start_upload,
+)
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+@mock.patch("documents.uploads.MIN_CHUNK_SIZE", 1)
+class ChunkedUploadTest(TestCase):
+    payload = b"0123456789"
+
+    def setUp(self):
+        dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        self.user = User.objects.create_user(
+            username="uploader", password="pass", role=Role.objects.create(role_name="up", role_color="blue"),
+            departement=dep,
+        )
+        self.nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        self.folder = Folder.objects.create(fol_name="Scans", fol_path="Scans")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _put(self, upload_id, offset, data):
+        return self.client.generic(
+            "PUT",
+            f"/api/documents/uploads/{upload_id}/",
+            data,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def _upload(self):
+        resp = self.client.post(
+            "/api/documents/uploads/", {"filename": "scan.pdf", "size": len(self.payload), "chunk_size": 4}, format="json"
+        )
+        self.assertEqual(resp.status_code, 201)
+        upload_id = resp.json()["upload_id"]
+
+        self.assertEqual(self._put(upload_id, 0, self.payload[:4]).status_code, 200)
+        # A dropped connection: the client resumes from the offset the server reports
+        resp = self._put(upload_id, 8, self.payload[8:])
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()["offset"], 4)
+        self.assertEqual(self.client.get(f"/api/documents/uploads/{upload_id}/").json()["offset"], 4)
+
+        self._put(upload_id, 4, self.payload[4:8])
+        self._put(upload_id, 8, self.payload[8:])
+        resp = self.client.post(f"/api/documents/uploads/{upload_id}/complete/")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_chunks_resume_and_hash(self):
+        data = self._upload()
+
+        self.assertEqual(data["status"], UploadSession.STATUS_COMPLETE)
+        self.assertEqual(data["sha256"], hashlib.sha256(self.payload).hexdigest())
+        session = UploadSession.objects.get(id=data["upload_id"])
+        with default_storage.open(session.key) as f:
+            self.assertEqual(f.read(), self.payload)
+
+    def test_create_document_from_upload(self):
+        data = self._upload()
+        key = UploadSession.objects.get(id=data["upload_id"]).key
+
+        resp = self.client.post(
+            "/api/documents/",
+            {"upload_id": data["upload_id"], "parent_folder": self.folder.id, "doc_nature": self.nature.id,
+             "doc_title": "Scan"},
+        )
+        self.assertEqual(resp.status_code, 201, resp.content)
+
+        document = Document.objects.get(id=resp.json()["document"]["id"])
+        self.assertEqual(document.doc_size, len(self.payload))
+        self.assertEqual(document.versions.get().version_path.name, key)
+        with default_storage.open(document.doc_path.name) as f:
+            self.assertEqual(f.read(), self.payload)
+        self.assertFalse(UploadSession.objects.filter(id=data["upload_id"]).exists())
+
+    def test_direct_file_upload_is_stored_once(self):
+        with mock.patch("documents.views.copy_object", wraps=object_store.copy_object) as copy:
+            resp = self.client.post(
+                "/api/documents/",
+                {"file": SimpleUploadedFile("memo.pdf", self.payload), "parent_folder": self.folder.id,
+                 "doc_nature": self.nature.id},
+            )
+        self.assertEqual(resp.status_code, 201, resp.content)
+
+        document = Document.objects.get(id=resp.json()["document"]["id"])
+        v1 = document.versions.get()
+        self.assertEqual(v1.version_path.name, v1.blob.key)
+        self.assertEqual(document.blob_id, v1.blob_id)
+        copy.assert_called_once_with(v1.blob.key, document.doc_path.name)
+        with default_storage.open(v1.version_path.name) as f:
+            self.assertEqual(f.read(), self.payload)
+
+    def test_part_stored_for_a_moved_offset_is_discarded(self):
+        session = start_upload(self.user, "scan.pdf", len(self.payload), chunk_size=4)
+        real_put = default_storage.save
+
+        def racing_save(name, content, **kwargs):
+            # Another request records the same offset while this part is being stored
+            UploadSession.objects.filter(pk=session.pk).update(bytes_received=4)
+            return real_put(name, content, **kwargs)
+
+        with mock.patch.object(default_storage, "save", side_effect=racing_save):
+            with self.assertRaises(UploadOffsetMismatch):
+                receive_chunk(session.id, self.user, 0, self.payload[:4])
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).parts, [])
+        self.assertFalse(default_storage.exists(f"{session.key}.part00001"))
+
+    def test_complete_drops_its_object_when_aborted_meanwhile(self):
+        session = start_upload(self.user, "scan.pdf", len(self.payload), chunk_size=4)
+        for offset in (0, 4, 8):
+            receive_chunk(session.id, self.user, offset, self.payload[offset:offset + 4])
+        real_complete = _StorageParts.complete
+        assembled = []
+
+        def aborted_meanwhile(backend, session):
+            assembled.append(real_complete(backend, session))
+            UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.STATUS_ABORTED)
+            return assembled[0]
+
+        # Digest lost (chunks received by another worker): recomputed from the object
+        with mock.patch("documents.uploads._pop_digest", return_value=None), \
+                mock.patch("documents.uploads.sha256_of", return_value="x" * 64) as sha256_of, \
+                mock.patch.object(_StorageParts, "complete", aborted_meanwhile):
+            with self.assertRaisesMessage(UploadError, "Upload is aborted."):
+                complete_upload(session.id, self.user)
+        sha256_of.assert_called_once_with(assembled[0], None)
+        self.assertFalse(default_storage.exists(assembled[0]))
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).sha256, "")
+
+    def test_stale_sessions_expire(self):
+        stale = start_upload(self.user, "old.pdf", len(self.payload), chunk_size=4)
+        receive_chunk(stale.id, self.user, 0, self.payload[:4])
+        fresh = start_upload(self.user, "new.pdf", len(self.payload), chunk_size=4)
+        UploadSession.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=2))
+
+        call_command("expire_upload_sessions", stdout=mock.MagicMock())
+
+        self.assertEqual(UploadSession.objects.get(pk=stale.pk).status, UploadSession.STATUS_ABORTED)
+        self.assertEqual(UploadSession.objects.get(pk=fresh.pk).status, UploadSession.STATUS_ACTIVE)
+        self.assertFalse(default_storage.exists(f"{stale.key}.part00001"))
+        self.assertEqual(expire_stale_uploads()["expired"], 0)
+
+
+class MinioPartsTest(TestCase):
+    def setUp(self):
+        dep = Departement.objects.create(dep_name="ops", dep_color="#000")
+        self.user = User.objects.create_user(
+            username="uploader", password="pass", role=Role.objects.create(role_name="up", role_color="blue"),
+            departement=dep,
+        )
+        # Parts go through the storage; only composition uses the (mocked) client
+        self.client = mock.MagicMock()
+        self.storage = InMemoryStorage()
+        self.storage.client, self.storage.bucket_name = self.client, "media"
+
+    def test_parts_are_composed_server_side(self):
+        size = 6 * 1024 * 1024
+        session = start_upload(self.user, "big.pdf", size, chunk_size=5 * 1024 * 1024, storage=self.storage)
+        self.assertEqual(session.storage_upload_id, "")
+
+        first, last = b"a" * session.chunk_size, b"b" * (size - session.chunk_size)
+        receive_chunk(session.id, self.user, 0, first, storage=self.storage)
+        session = receive_chunk(session.id, self.user, len(first), last, storage=self.storage)
+        part_keys = [p["etag"] for p in session.parts]
+        self.assertEqual(part_keys, [f"{session.key}.part00001", f"{session.key}.part00002"])
+
+        self.assertEqual(_MinioParts(self.storage, self.client, "media").complete(session), session.key)
+        bucket, key, sources = self.client.compose_object.call_args.args
+        self.assertEqual((bucket, key), ("media", session.key))
+        self.assertEqual([(source.bucket_name, source.object_name) for source in sources], [("media", k) for k in part_keys])
+        self.assertFalse(any(self.storage.exists(k) for k in part_keys))
+        # Only minio's public API is used
+        self.assertFalse([call for call in self.client.method_calls if call[0].startswith("_")])
+
+    def test_expiry_removes_part_objects(self):
+        session = start_upload(self.user, "big.pdf", 10, storage=self.storage)
+        session = receive_chunk(session.id, self.user, 0, b"x" * 10, storage=self.storage)
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(expire_stale_uploads(storage=self.storage)["expired"], 1)
+        self.assertFalse(self.storage.exists(session.parts[0]["etag"]))
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).status, UploadSession.STATUS_ABORTED)
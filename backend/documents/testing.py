@@ -0,0 +1,7 @@
+"""
+Helpers shared by the documents test modules.
+"""
+from django.conf import settings
+
+# Keep test objects out of the configured (MinIO) bucket
+IN_MEMORY_STORAGES = {**settings.STORAGES, "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"}}
@@ -0,0 +1,330 @@
+"""
+Resumable chunked uploads.
+
+    POST   documents/uploads/                 {"filename", "size"} -> session (+ chunk_size)
+    PUT    documents/uploads/<id>/            raw chunk body, "Upload-Offset" header
+    GET    documents/uploads/<id>/            current offset (resume point)
+    POST   documents/uploads/<id>/complete/   assemble; returns sha256
+    DELETE documents/uploads/<id>/            abort
+
+Each chunk is stored as its own part object, so the server only ever holds
+one chunk in memory. On MinIO the parts are assembled server-side with
+compose_object; other storages concatenate them through a temporary file. The SHA-256 of the whole file is computed as
+chunks arrive; if a chunk lands on a different worker process the digest is
+recomputed from the stored object at completion.
+
+Sessions left ACTIVE for DOCUMENT_UPLOAD_EXPIRY_HOURS (default 24) are aborted,
+with their multipart upload or part objects, by
+`manage.py expire_upload_sessions`.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession
+from .object_store import READ_BLOCK_SIZE, minio_client, sha256_of
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PREFIX = "documents/versions/uploads"
+MIN_CHUNK_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+DEFAULT_CHUNK_SIZE = getattr(settings, "DOCUMENT_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+DEFAULT_EXPIRY_HOURS = 24
+DEFAULT_EXPIRY_BATCH_SIZE = 100
+
+
+class UploadError(Exception):
+    status_code = 400
+
+    def __init__(self, message, **extra):
+        super().__init__(message)
+        self.extra = extra
+
+
+class UploadOffsetMismatch(UploadError):
+    status_code = 409
+
+
+# ------------------------ Running digests ------------------------
+# session id -> (offset the digest covers, hashlib object). Process-local.
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _update_digest(session_id, offset, data):
+    with _digests_lock:
+        if offset == 0:
+            entry = (0, hashlib.sha256())
+        else:
+            entry = _digests.get(session_id)
+            if entry is None or entry[0] != offset:
+                _digests.pop(session_id, None)
+                return
+        hasher = entry[1]
+        hasher.update(data)
+        _digests[session_id] = (offset + len(data), hasher)
+
+
+def _pop_digest(session_id, size):
+    with _digests_lock:
+        entry = _digests.pop(session_id, None)
+    if entry is not None and entry[0] == size:
+        return entry[1].hexdigest()
+    return None
+
+
+# ------------------------ Part stores ------------------------
+
+class _StorageParts:
+    """
+    Each part is its own object, concatenated through a temporary file on
+    completion (storages without server-side composition).
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def start(self, key):
+        return ""
+
+    def _part_key(self, session, part_number):
+        return f"{session.key}.part{part_number:05d}"
+
+    def put(self, session, part_number, data):
+        key = self._part_key(session, part_number)
+        if self.storage.exists(key):
+            self.storage.delete(key)
+        # The stored part key plays the role of the S3 ETag
+        return self.storage.save(key, ContentFile(data))
+
+    def discard(self, session, etag):
+        # A part that was stored but not recorded (the offset moved meanwhile)
+        if all(part["etag"] != etag for part in session.parts):
+            self.storage.delete(etag)
+
+    def complete(self, session):
+        with tempfile.TemporaryFile() as tmp:
+            for part in session.parts:
+                with self.storage.open(part["etag"]) as f:
+                    for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+                        tmp.write(block)
+            tmp.seek(0)
+            key = self.storage.save(session.key, File(tmp, name=os.path.basename(session.key)))
+        self.abort(session)
+        return key
+
+    def abort(self, session):
+        for part in session.parts:
+            self.storage.delete(part["etag"])
+
+
+class _MinioParts(_StorageParts):
+    """
+    Part objects assembled server-side with compose_object (public minio API),
+    so completing never streams the file through this process. Every part but
+    the last is at least MIN_CHUNK_SIZE, as S3 requires for composition.
+    """
+    def __init__(self, storage, client, bucket):
+        super().__init__(storage)
+        self.client = client
+        self.bucket = bucket
+
+    def complete(self, session):
+        from minio.commonconfig import ComposeSource
+
+        sources = [ComposeSource(self.bucket, part["etag"]) for part in session.parts]
+        self.client.compose_object(self.bucket, session.key, sources)
+        self.abort(session)
+        return session.key
+
+
+def _parts_backend(storage=None):
+    storage = storage or default_storage
+    client, bucket = minio_client(storage)
+    if client is not None:
+        return _MinioParts(storage, client, bucket)
+    return _StorageParts(storage)
+
+
+# ------------------------ Session lifecycle ------------------------
+
+def start_upload(user, filename, total_size, chunk_size=None, storage=None):
+    safe_name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if not safe_name:
+        raise UploadError("Missing field: filename")
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise UploadError("Missing or invalid field: size")
+    if total_size <= 0:
+        raise UploadError("Missing or invalid field: size")
+
+    chunk_size = max(MIN_CHUNK_SIZE, int(chunk_size or DEFAULT_CHUNK_SIZE))
+    session = UploadSession(user=user, filename=safe_name, total_size=total_size, chunk_size=chunk_size)
+    session.key = f"{UPLOAD_PREFIX}/{session.id}/{safe_name}"
+    session.storage_upload_id = _parts_backend(storage).start(session.key)
+    session.save()
+    return session
+
+
+def _check_chunk(session, offset, size):
+    if session.status != UploadSession.STATUS_ACTIVE:
+        raise UploadError(f"Upload is {session.status.lower()}.")
+    if offset != session.bytes_received:
+        raise UploadOffsetMismatch("Unexpected offset.", offset=session.bytes_received)
+
+    remaining = session.total_size - offset
+    expected = min(session.chunk_size, remaining)
+    if size != expected:
+        raise UploadError(f"Chunk must be {expected} bytes.", offset=session.bytes_received)
+
+
+def receive_chunk(session_id, user, offset, data, storage=None):
+    """
+    Append one chunk at `offset`. Chunks must arrive in order and be exactly
+    `chunk_size` long, except the last one.
+
+    The part is stored without holding the session's row lock; the offset is
+    checked again under the lock when the part is recorded, so of two requests
+    racing for the same offset only one is recorded (the other gets a 409).
+    """
+    session = UploadSession.objects.get(id=session_id, user=user)
+    _check_chunk(session, offset, len(data))
+
+    backend = _parts_backend(storage)
+    part_number = offset // session.chunk_size + 1
+    etag = backend.put(session, part_number, data)
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session_id, user=user)
+        try:
+            _check_chunk(session, offset, len(data))
+        except UploadError:
+            backend.discard(session, etag)
+            raise
+        _update_digest(session.id, offset, data)
+
+        session.parts.append({"part_number": part_number, "etag": etag, "size": len(data)})
+        session.bytes_received = offset + len(data)
+        session.save(update_fields=["parts", "bytes_received", "updated_at"])
+    return session
+
+
+def _check_complete(session):
+    if session.status != UploadSession.STATUS_ACTIVE:
+        raise UploadError(f"Upload is {session.status.lower()}.")
+    if session.bytes_received != session.total_size:
+        raise UploadError("Upload is incomplete.", offset=session.bytes_received)
+
+
+def complete_upload(session_id, user, storage=None):
+    """
+    Assemble the parts and record the SHA-256 of the result.
+
+    Assembling and, when this process did not receive every chunk, hashing
+    (a full re-read of the object) run without the session's row lock; the
+    status is then compare-and-set under the lock. If the session was
+    completed or aborted meanwhile, the object assembled here is deleted
+    unless it is the one recorded.
+    """
+    session = UploadSession.objects.get(id=session_id, user=user)
+    if session.status == UploadSession.STATUS_COMPLETE:
+        return session
+    _check_complete(session)
+
+    try:
+        key = _parts_backend(storage).complete(session)
+    except Exception:
+        # Parts already consumed by a concurrent completion
+        current = UploadSession.objects.get(id=session_id, user=user)
+        if current.status == UploadSession.STATUS_COMPLETE:
+            return current
+        raise
+    sha256 = _pop_digest(session.id, session.total_size) or sha256_of(key, storage)
+
+    with transaction.atomic():
+        current = UploadSession.objects.select_for_update().get(id=session_id, user=user)
+        won = current.status == UploadSession.STATUS_ACTIVE and current.parts == session.parts
+        if won:
+            current.key, current.sha256, current.status = key, sha256, UploadSession.STATUS_COMPLETE
+            current.save(update_fields=["key", "sha256", "status", "updated_at"])
+    if won:
+        return current
+
+    if current.status != UploadSession.STATUS_COMPLETE or current.key != key:
+        (storage or default_storage).delete(key)
+    if current.status == UploadSession.STATUS_COMPLETE:
+        return current
+    _check_complete(current)
+    raise UploadError("Upload changed while completing.", offset=current.bytes_received)
+
+
+def abort_upload(session_id, user, storage=None):
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session_id, user=user)
+        if session.status == UploadSession.STATUS_ACTIVE:
+            try:
+                _parts_backend(storage).abort(session)
+            except Exception:
+                logger.exception("Could not abort upload %s", session.id)
+            session.status = UploadSession.STATUS_ABORTED
+            session.save(update_fields=["status", "updated_at"])
+    _pop_digest(session.id, -1)
+    return session
+
+
+def expiry_hours():
+    return getattr(settings, "DOCUMENT_UPLOAD_EXPIRY_HOURS", DEFAULT_EXPIRY_HOURS)
+
+
+def expire_stale_uploads(older_than=None, batch_size=DEFAULT_EXPIRY_BATCH_SIZE, storage=None):
+    """
+    Abort ACTIVE sessions untouched for `older_than` (default: the configured
+    expiry): the multipart upload (or part objects) is discarded and the session
+    marked ABORTED. Sessions locked by an in-flight request are skipped.
+    Returns {"expired": n, "duration_seconds": s}.
+    """
+    started = time.monotonic()
+    cutoff = timezone.now() - (older_than if older_than is not None else timedelta(hours=expiry_hours()))
+    backend = _parts_backend(storage)
+    stale = UploadSession.objects.filter(status=UploadSession.STATUS_ACTIVE, updated_at__lt=cutoff)
+    expired = 0
+    while True:
+        with transaction.atomic():
+            sessions = list(stale.select_for_update(skip_locked=True).order_by("updated_at")[:batch_size])
+            if not sessions:
+                break
+            for session in sessions:
+                try:
+                    backend.abort(session)
+                except Exception:
+                    logger.exception("Could not abort expired upload %s", session.id)
+            UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).update(
+                status=UploadSession.STATUS_ABORTED, updated_at=timezone.now()
+            )
+        for session in sessions:
+            _pop_digest(session.id, -1)
+        expired += len(sessions)
+    return {"expired": expired, "duration_seconds": time.monotonic() - started}
+
+
+def get_completed_upload(session_id, user):
+    """
+    A finished upload owned by `user`, ready to be attached to a document.
+    The caller deletes the session once the object is referenced.
+    """
+    try:
+        return UploadSession.objects.get(id=session_id, user=user, status=UploadSession.STATUS_COMPLETE)
+    except (UploadSession.DoesNotExist, DjangoValidationError):
+        raise UploadError("Invalid or incomplete upload_id")
@@ -6,12 +6,17 @@ from .views import (
     # APIViews
     DocumentCodeViewSet,
     DocumentListCreateView,
+    DocumentSearchView,
+    DocumentTypeaheadView,
     DocumentDetailView,
     FolderDocumentsView,
     DocumentByFolderView,
     DocumentVersionsByDocumentView,
     ArchiveNavigationView,
     SyncFoldersView,  # ✅ NEW IMPORT
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadSessionCompleteView,
 
     # ViewSets
     DocumentViewSet,
@@ -77,7 +82,18 @@ urlpatterns = [
     # ------------------------------------------------------------------
     # ✅ 3. Standard Document CRUD
     # ------------------------------------------------------------------
+    # Chunked/resumable uploads (MUST come BEFORE generic documents/<int:pk>/)
+    path("documents/uploads/", UploadSessionCreateView.as_view(), name="upload-session-create"),
+    path("documents/uploads/<uuid:upload_id>/", UploadSessionDetailView.as_view(), name="upload-session-detail"),
+    path(
+        "documents/uploads/<uuid:upload_id>/complete/",
+        UploadSessionCompleteView.as_view(),
+        name="upload-session-complete",
+    ),
+
     path("documents/", DocumentListCreateView.as_view(), name="document-list-create"),
+    path("documents/search/", DocumentSearchView.as_view(), name="document-search"),
+    path("documents/typeahead/", DocumentTypeaheadView.as_view(), name="document-typeahead"),
     path("documents/<int:pk>/", DocumentDetailView.as_view(), name="document-detail"),
 
     # ------------------------------------------------------------------
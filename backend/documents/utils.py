@@ -1,6 +1,7 @@
 from django.db import transaction
 from django.db.models import Max
 from .models import Document, DocumentCategory, DocumentNature
+from .sequences import allocate, code_key, parent_key, peek
 
 def generate_document_code(category_code, nature_code, parent_code=None):
     """
@@ -20,7 +21,6 @@ def generate_document_code(category_code, nature_code, parent_code=None):
     Raises:
         ValueError: If invalid parameters or generation fails
     """
-    from .models import Document
 
     # Validate inputs
     if not (category_code and len(category_code) == 2):
@@ -34,52 +34,27 @@ def generate_document_code(category_code, nature_code, parent_code=None):
     if not is_child and parent_code:
         raise ValueError("Parent code should not be provided for PR/PS")
 
+    if is_child:
+        # Parent code is required, sequential number is for child
+        prefix = f"{parent_code}"
+        key = parent_key(parent_code)
+        exhausted = "Maximum sequential number reached for this parent"
+    else:
+        # PR/PS: XX-YY-ZZ
+        prefix = f"{category_code}-{nature_code}"
+        key = code_key(category_code, nature_code)
+        exhausted = "Maximum sequential number reached for this category/nature"
+
     with transaction.atomic():
-        if is_child:
-            # Parent code is required, sequential number is for child
-            prefix = f"{parent_code}"
-            # Find next sequential number for this parent
-            children = Document.objects.filter(doc_code__startswith=prefix + "-")
-            max_seq = 0
-            for doc in children:
-                parts = doc.doc_code.split("-")
-                if len(parts) >= 5:
-                    try:
-                        seq = int(parts[4])
-                        if seq > max_seq:
-                            max_seq = seq
-                    except Exception:
-                        continue
-            next_seq = max_seq + 1
-            if next_seq > 99:
-                raise ValueError("Maximum sequential number reached for this parent")
-            seq_str = f"{next_seq:02d}"
-            code = f"{prefix}-{seq_str}"
-        else:
-            # PR/PS: XX-YY-ZZ
-            # Find next sequential number for this category/nature
-            prefix = f"{category_code}-{nature_code}"
-            docs = Document.objects.filter(doc_code__startswith=prefix)
-            max_seq = 0
-            for doc in docs:
-                parts = doc.doc_code.split("-")
-                if len(parts) >= 3:
-                    try:
-                        seq = int(parts[2])
-                        if seq > max_seq:
-                            max_seq = seq
-                    except Exception:
-                        continue
-            next_seq = max_seq + 1
+        while True:
+            next_seq = allocate(key)
             if next_seq > 99:
-                raise ValueError("Maximum sequential number reached for this category/nature")
-            seq_str = f"{next_seq:02d}"
-            code = f"{prefix}-{seq_str}"
-
-        # Check uniqueness
-        if Document.objects.filter(doc_code=code).exists():
-            raise ValueError("Generated code already exists")
-        return code
+                raise ValueError(exhausted)
+            code = f"{prefix}-{next_seq:02d}"
+            # Skip numbers already taken by codes created with explicit numbers
+            # (imports, manual codes); the sequence moves past them for good
+            if not Document.objects.filter(doc_code=code).exists():
+                return code
 
 def validate_document_code(code):
     """
@@ -98,34 +73,8 @@ def get_next_sequential_number(category, nature, parent=None):
     """
     Get next available sequential number for a category/nature combination.
     """
-    from .models import Document
     if nature.code in ("IT", "EQ", "FI"):
         if not parent:
             raise ValueError("Parent required for IT/EQ/FI")
-        prefix = f"{parent.doc_code}"
-        children = Document.objects.filter(doc_code__startswith=prefix + "-")
-        max_seq = 0
-        for doc in children:
-            parts = doc.doc_code.split("-")
-            if len(parts) >= 4:
-                try:
-                    seq = int(parts[3])
-                    if seq > max_seq:
-                        max_seq = seq
-                except Exception:
-                    continue
-        return max_seq + 1
-    else:
-        prefix = f"{category.code}-{nature.code}"
-        docs = Document.objects.filter(doc_code__startswith=prefix)
-        max_seq = 0
-        for doc in docs:
-            parts = doc.doc_code.split("-")
-            if len(parts) >= 3:
-                try:
-                    seq = int(parts[2])
-                    if seq > max_seq:
-                        max_seq = seq
-                except Exception:
-                    continue
-        return max_seq + 1
\ No newline at end of file
+        return peek(parent_key(parent.doc_code))
+    return peek(code_key(category.code, nature.code))
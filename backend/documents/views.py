@@ -8,7 +8,6 @@ import requests
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.db import transaction
@@ -29,8 +28,11 @@ from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from common.typeahead import DEFAULT_LIMIT, typeahead
+
 # Users and Organization models
-from users.models import Departement, UserActionLog, Site
+from users import audit
+from users.models import Departement, Site
 
 # Document models
 from .models import (
@@ -38,10 +40,12 @@ from .models import (
     DocumentArchive,
     DocumentCategory,
     DocumentCode,
+    DOCUMENT_MATCH_FIELDS,
     DocumentNature,
     DocumentVersion,
     Folder,
     DocumentType,
+    UploadSession,
 )
 
 # Serializers
@@ -49,6 +53,7 @@ from .serializers import (
     DocumentArchiveSerializer,
     DocumentCategorySerializer,
     DocumentCodeSerializer,
+    DocumentListSerializer,
     DocumentNatureSerializer,
     DocumentSerializer,
     DocumentVersionSerializer,
@@ -56,6 +61,25 @@ from .serializers import (
     DocumentTypeSerializer,
 )
 from users.serializers import SiteSerializer 
+from .archiving import archived_q, invalidate_next_archive_expiry, live_q
+from .blobs import acquire, attach_to_version, set_live_blob, store_file, store_object
+from .extraction import enqueue_extraction
+from .facets import apply_facet_filters, facet_counts, parse_facet_filters, requested_facets
+from .moves import move_folder_subtree
+from .object_store import copy_object
+from .onlyoffice import enqueue_save
+from .pagination import UpdatedAtCursorPagination
+from .reconcile import reconcile_storage
+from .search import highlights, search_documents
+from .sequences import allocate, nature_key, type_key
+from .uploads import (
+    UploadError,
+    abort_upload,
+    complete_upload,
+    get_completed_upload,
+    receive_chunk,
+    start_upload,
+)
 
 # ------------------------ Helpers ------------------------
 
@@ -81,138 +105,213 @@ def _parse_iso_datetime(value):
 
 
 def _folder_is_archived_anywhere(folder: Folder) -> bool:
-    cur = folder
-    while cur:
-        if getattr(cur, "is_archived", False):
-            return True
-        cur = getattr(cur, "parent_folder", None)
-    return False
+    # Archives past their retention date count as live (see archived_q)
+    if folder.tree_path:
+        ids = [int(pk) for pk in folder.tree_path.strip("/").split("/")]
+    else:
+        ids, cur = [], folder
+        while cur:
+            ids.append(cur.pk)
+            cur = cur.parent_folder
+    return Folder.objects.filter(archived_q(), pk__in=ids).exists()
 
 
 def _deny_if_archived_for_non_admin(request, document: Document):
-    if getattr(document, "is_archived", False) and not (request.user and request.user.is_staff):
+    if request.user and request.user.is_staff:
+        return None
+    if document.is_archived and Document.objects.filter(archived_q(), pk=document.pk).exists():
         return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
     return None
 
 
-def _restore_expired_entities():
+def _visible_documents(request):
     """
-    Checks for Folders and Documents whose 'archived_until' has passed.
-    Restores them to active status.
+    Live documents the user may list: everything for staff, otherwise
+    PUBLIC/ORIGINAL documents and the user's own.
     """
-    now = timezone.now()
+    base_qs = Document.objects.filter(live_q())
+    if request.user.is_superuser or request.user.is_staff:
+        return base_qs
+    return base_qs.filter(
+        Q(doc_status_type__in=['PUBLIC', 'ORIGINAL']) | Q(doc_owner=request.user)
+    )
 
-    # 1. Find Expired Folders
-    expired_folders = Folder.objects.filter(is_archived=True, archived_until__lte=now)
-    
-    if expired_folders.exists():
-        with transaction.atomic():
-            folder_ids = list(expired_folders.values_list("id", flat=True))
-            
-            # Restore folders
-            Folder.objects.filter(id__in=folder_ids).update(
-                is_archived=False,
-                archived_at=None,
-                archived_until=None,
-                archived_by=None,
-                archived_note=""
-            )
-            
-            # Restore documents inside these folders (cascade restore)
-            docs_in_folders = Document.objects.filter(parent_folder__id__in=folder_ids, is_archived=True)
-            doc_ids_in_folders = list(docs_in_folders.values_list("id", flat=True))
-            
-            docs_in_folders.update(
-                is_archived=False,
-                archived_at=None,
-                archived_until=None,
-                archived_by=None,
-                archive_note=""
-            )
 
-            if doc_ids_in_folders:
-                DocumentArchive.objects.filter(
-                    document_id__in=doc_ids_in_folders, 
-                    status=DocumentArchive.STATUS_ACTIVE
-                ).update(
-                    status=DocumentArchive.STATUS_RESTORED,
-                    restored_at=now
-                )
+def _faceted_documents(request):
+    """
+    (base queryset, facet filters) for the listing; see documents/facets.py.
+    Staff may facet on is_archived: their base then includes archived
+    documents, and without an is_archived filter they get the live ones.
+    """
+    filters = parse_facet_filters(request.query_params)
+    if request.user.is_superuser or request.user.is_staff:
+        filters.setdefault("is_archived", live_q())
+        return Document.objects.all(), filters
+    return _visible_documents(request), filters
 
-    # 2. Find Expired Documents
-    expired_docs = Document.objects.filter(is_archived=True, archived_until__lte=now)
-    if expired_docs.exists():
-        with transaction.atomic():
-            doc_ids = list(expired_docs.values_list("id", flat=True))
-            
-            expired_docs.update(
-                is_archived=False,
-                archived_at=None,
-                archived_until=None,
-                archived_by=None,
-                archive_note=""
-            )
 
-            DocumentArchive.objects.filter(
-                document_id__in=doc_ids, 
-                status=DocumentArchive.STATUS_ACTIVE
-            ).update(
-                status=DocumentArchive.STATUS_RESTORED,
-                restored_at=now
-            )
+def _apply_path_index_params(request, qs):
+    """
+    Support ?path_index=<prefix> (indexed prefix search) and ?ordering=[-]path_index.
+    The cursor pagination pages on (updated_at, id) only, so ordering cannot be
+    combined with cursor/page_size.
+    """
+    prefix = (request.query_params.get("path_index") or "").strip()
+    if prefix:
+        qs = qs.filter(path_index__startswith=prefix)
+
+    ordering = (request.query_params.get("ordering") or "").strip()
+    if ordering in ("path_index", "-path_index"):
+        if UpdatedAtCursorPagination().is_requested(request):
+            raise ValidationError({"ordering": "ordering cannot be combined with cursor or page_size."})
+        qs = qs.order_by(ordering, "id")
+    return qs
+
+
+def _serialize_document_list(queryset, include_versions=True):
+    """
+    Serialize a Document listing with a constant number of queries
+    (see DocumentListSerializer.prepare_queryset).
+    """
+    queryset = DocumentListSerializer.prepare_queryset(queryset, include_versions=include_versions)
+    return DocumentListSerializer(
+        queryset, many=True, context={"include_versions": include_versions}
+    ).data
+
+
+def _document_list_context(request):
+    """
+    Read sparse-fieldset options from the query string:
+      ?fields=id,doc_title,...   only render these fields
+      ?expand=versions           include nested version history
+
+    Requests using none of the compact options (fields/expand/cursor/page_size)
+    keep the legacy full rows, versions included.
+    """
+    params = request.query_params
+    fields = {f.strip() for f in (params.get("fields") or "").split(",") if f.strip()}
+    expand = {e.strip() for e in (params.get("expand") or "").split(",") if e.strip()}
+
+    compact = bool(fields) or "expand" in params or UpdatedAtCursorPagination().is_requested(request)
+    include_versions = "versions" in expand or not compact
+    if fields and include_versions:
+        fields.add("versions")
+    return {"include_versions": include_versions, "fields": fields}
+
+
+def _document_list_response(request, queryset, envelope=None):
+    """
+    Paginated (when requested) + sparse Document listing.
+    With an `envelope` dict the rows go under "documents", otherwise under
+    "results" (paginated) or as a bare list (legacy).
+    """
+    context = _document_list_context(request)
+    queryset = DocumentListSerializer.prepare_queryset(queryset, include_versions=context["include_versions"])
+
+    paginator = UpdatedAtCursorPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    rows = queryset if page is None else page
+    data = DocumentListSerializer(rows, many=True, context=context).data
+
+    if envelope is not None:
+        info = paginator.get_pagination_info() if page is not None else {}
+        return Response({**envelope, **info, "documents": data}, status=status.HTTP_200_OK)
+    if page is not None:
+        return paginator.get_paginated_response(data)
+    return Response(data)
+
+
+def _build_folder_tree(folders):
+    """
+    Assemble the nested /folders/tree/ payload from a flat, ordered list of folders.
+    Uses the stored path_index; rows without one derive it from the parent's.
+    Folders whose parent is not in `folders` (e.g. archived parent) are dropped.
+    """
+    children_by_parent = {}
+    for folder in folders:
+        children_by_parent.setdefault(folder.parent_folder_id, []).append(folder)
+
+    def build_node(folder, parent_path_index=None):
+        path_index = folder.path_index
+        if not path_index:
+            current_part = folder.get_path_index_part()
+            path_index = f"{parent_path_index}-{current_part}" if parent_path_index else current_part
+
+        return {
+            "id": folder.id,
+            "fol_name": folder.fol_name,
+            "fol_path": folder.fol_path,
+            "fol_index": folder.fol_index,
+            "fol_order": folder.fol_order,
+            "path_index": path_index,
+            "is_archived": getattr(folder, "is_archived", False),
+            "archived_at": getattr(folder, "archived_at", None),
+            "archived_until": getattr(folder, "archived_until", None),
+            "archived_by": getattr(folder, "archived_by_id", None),
+            "created_by": folder.created_by_id,
+            "created_at": folder.created_at,
+            "updated_at": folder.updated_at,
+            "subfolders": [
+                build_node(child, path_index) for child in children_by_parent.get(folder.id, [])
+            ],
+        }
+
+    return [build_node(root) for root in children_by_parent.get(None, [])]
 
 
 # ✅ NEW: S3 Move Helper
 def _move_file_in_storage(old_path, new_path):
     """
-    Moves a file in S3/MinIO by copying to new path and deleting old path.
+    Moves a file in S3/MinIO with a server-side copy, then deletes the old path.
     """
     if not old_path or not new_path or old_path == new_path:
         return
     
     try:
         if default_storage.exists(old_path):
-            # Open the old file
-            f = default_storage.open(old_path)
-            # Save to new path
-            default_storage.save(new_path, f)
-            f.close()
-            # Delete old file
+            copy_object(old_path, new_path)
             default_storage.delete(old_path)
     except Exception as e:
         print(f"Error moving file from {old_path} to {new_path}: {e}")
 
 
+def _copy_to_live_key(src_key, live_key):
+    """
+    Server-side copy of a version object to the document's live key.
+    """
+    live_key = _normalize_path(live_key)
+    copy_object(src_key, live_key)
+    return live_key
+
+
 # ------------------------ NEW: Archive Browser ------------------------
 class ArchiveNavigationView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
-        _restore_expired_entities()
-
         folder_id = request.query_params.get("folder_id")
 
         if folder_id:
             parent = get_object_or_404(Folder, id=folder_id)
-            folders = Folder.objects.filter(parent_folder=parent, is_archived=True)
-            documents = Document.objects.filter(parent_folder=parent, is_archived=True)
+            folders = Folder.objects.filter(archived_q(), parent_folder=parent)
+            documents = Document.objects.filter(archived_q(), parent_folder=parent)
             
             return Response({
                 "current_folder": FolderSerializer(parent).data,
                 "folders": FolderSerializer(folders, many=True).data,
-                "documents": DocumentSerializer(documents, many=True).data
+                "documents": _serialize_document_list(documents)
             })
         else:
-            f_cond = Q(is_archived=True) & (Q(parent_folder__isnull=True) | Q(parent_folder__is_archived=False))
+            f_cond = archived_q() & (Q(parent_folder__isnull=True) | Q(parent_folder__is_archived=False))
             folders = Folder.objects.filter(f_cond)
 
-            d_cond = Q(is_archived=True) & Q(parent_folder__is_archived=False)
+            d_cond = archived_q() & Q(parent_folder__is_archived=False)
             documents = Document.objects.filter(d_cond)
 
             return Response({
                 "current_folder": None,
                 "folders": FolderSerializer(folders, many=True).data,
-                "documents": DocumentSerializer(documents, many=True).data
+                "documents": _serialize_document_list(documents)
             })
 
 
@@ -221,68 +320,22 @@ class SyncFoldersView(APIView):
     """
     Checks DB folders and documents against S3. 
     If a folder or document is missing in S3, remove it from DB.
+
+    Body (optional): {"dry_run": true} to preview, {"resume": true} to continue
+    an interrupted run. See documents.reconcile for the engine.
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        # 1. Sync Folders
-        folders = Folder.objects.all()
-        ids_to_delete_fol = []
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true", "yes")
+        resume = str(request.data.get("resume", "")).lower() in ("1", "true", "yes")
 
-        for folder in folders:
-            path = folder.fol_path
-            if not path: continue 
-            
-            # Check S3 existence (look for .keep or any content)
-            exists = False
-            try:
-                keep_path = f"{path}/.keep"
-                if default_storage.exists(keep_path):
-                    exists = True
-                else:
-                    dirs, files = default_storage.listdir(path)
-                    if dirs or files:
-                        exists = True
-            except Exception:
-                # If S3 errors, safe to assume exists to prevent accidental deletion
-                exists = True 
-            
-            if not exists:
-                ids_to_delete_fol.append(folder.id)
-
-        # 2. Sync Documents (✅ NEW LOGIC)
-        documents = Document.objects.all()
-        ids_to_delete_doc = []
-
-        for doc in documents:
-            # If doc has no path, it's invalid
-            if not doc.doc_path or not doc.doc_path.name:
-                ids_to_delete_doc.append(doc.id)
-                continue
-            
-            # Check if file exists in S3
-            try:
-                if not default_storage.exists(doc.doc_path.name):
-                    ids_to_delete_doc.append(doc.id)
-            except Exception:
-                # On error, skip
-                pass
-
-        # Execute Deletions
-        del_fol_count = 0
-        if ids_to_delete_fol:
-            del_fol_count = len(ids_to_delete_fol)
-            Folder.objects.filter(id__in=ids_to_delete_fol).delete()
-
-        del_doc_count = 0
-        if ids_to_delete_doc:
-            del_doc_count = len(ids_to_delete_doc)
-            Document.objects.filter(id__in=ids_to_delete_doc).delete()
+        result = reconcile_storage(dry_run=dry_run, resume=resume)
 
         return Response({
-            "status": "synced", 
-            "deleted_ghost_folders": del_fol_count,
-            "deleted_ghost_documents": del_doc_count
+            **result,
+            "deleted_ghost_folders": result["deleted_folders"],
+            "deleted_ghost_documents": result["deleted_documents"],
         })
 
 
@@ -298,12 +351,12 @@ class FolderViewSet(viewsets.ModelViewSet):
 
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["fol_index", "parent_folder", "is_archived"]
-    search_fields = ["fol_name", "fol_path"]
-    ordering_fields = ["fol_name", "fol_index", "created_at", "updated_at"]
+    search_fields = ["fol_name", "fol_path", "path_index"]
+    ordering_fields = ["fol_name", "fol_index", "path_index", "created_at", "updated_at"]
     ordering = ["fol_index", "fol_name"]
 
     def get_queryset(self):
-        return super().get_queryset().filter(is_archived=False)
+        return super().get_queryset().filter(live_q())
 
     def perform_create(self, serializer):
         folder_data = serializer.validated_data
@@ -339,9 +392,9 @@ class FolderViewSet(viewsets.ModelViewSet):
         self._update_folder_path(folder)
         new_path = folder.fol_path
 
-        # If path changed, we must move contents recursively
+        # If path changed, move the whole subtree (server-side copy + bulk path rewrite)
         if old_path and new_path and old_path != new_path:
-            self._recursive_move(old_path, new_path, folder)
+            move_folder_subtree(folder, old_path, new_path)
 
     def _update_folder_path(self, folder):
         parent_path = ""
@@ -355,90 +408,20 @@ class FolderViewSet(viewsets.ModelViewSet):
             folder.fol_path = full_path
             folder.save(update_fields=["fol_path"])
 
-    def _recursive_move(self, old_prefix, new_prefix, folder):
-        # 1. Update Documents in this folder (S3 Move + DB Update)
-        documents = Document.objects.filter(parent_folder=folder)
-        for doc in documents:
-            old_doc_path = str(doc.doc_path)
-            # Replace prefix
-            if old_doc_path.startswith(old_prefix):
-                # Construct new path preserving filename
-                suffix = old_doc_path[len(old_prefix):].lstrip('/')
-                new_doc_path = f"{new_prefix}/{suffix}"
-                
-                # Move in S3
-                _move_file_in_storage(old_doc_path, new_doc_path)
-                
-                # Update DB
-                doc.doc_path.name = new_doc_path
-                doc.save(update_fields=["doc_path"])
-
-        # 2. Update Subfolders
-        subfolders = Folder.objects.filter(parent_folder=folder)
-        for sub in subfolders:
-            old_sub_path = sub.fol_path
-            
-            # Recalculate subfolder path based on new parent path
-            sub_name = _normalize_path(sub.fol_name)
-            new_sub_path = f"{new_prefix}/{sub_name}"
-            
-            sub.fol_path = new_sub_path
-            sub.save(update_fields=["fol_path"])
-            
-            # Recurse
-            self._recursive_move(old_sub_path, new_sub_path, sub)
-
     @action(detail=False, methods=["get"], url_path="roots")
     def roots(self, request):
-        _restore_expired_entities()
         roots = self.get_queryset().filter(parent_folder=None)
         serializer = self.get_serializer(roots, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"], url_path="tree")
     def tree(self, request):
-        _restore_expired_entities()
-
-        def build_tree(parent, parent_path_index=None):
-            children = parent.subfolders.filter(is_archived=False)
-
-            if parent.fol_order is not None:
-                formatted_order = f"0{parent.fol_order}" if parent.fol_order < 10 else str(parent.fol_order)
-                current_part = f"{parent.fol_index}-{formatted_order}"
-            else:
-                current_part = parent.fol_index
-
-            path_index = f"{parent_path_index}-{current_part}" if parent_path_index else current_part
-
-            return {
-                "id": parent.id,
-                "fol_name": parent.fol_name,
-                "fol_path": parent.fol_path,
-                "fol_index": parent.fol_index,
-                "fol_order": parent.fol_order,
-                "path_index": path_index,
-                "is_archived": getattr(parent, "is_archived", False),
-                "archived_at": getattr(parent, "archived_at", None),
-                "archived_until": getattr(parent, "archived_until", None),
-                "archived_by": getattr(parent, "archived_by_id", None),
-                "created_by": parent.created_by_id,
-                "created_at": parent.created_at,
-                "updated_at": parent.updated_at,
-                "subfolders": [build_tree(child, path_index) for child in children],
-            }
-
-        roots = self.get_queryset().filter(parent_folder=None)
-        tree = [build_tree(folder) for folder in roots]
-        return Response(tree)
+        # One query for every live folder; the tree is assembled in memory.
+        folders = list(Folder.objects.filter(live_q()))
+        return Response(_build_folder_tree(folders))
 
     def _descendant_folder_ids(self, root: Folder):
-        ids = []
-        stack = [root]
-        while stack:
-            node = stack.pop()
-            ids.append(node.id)
-            stack.extend(list(node.subfolders.all()))
-        return ids
+        return list(root.get_descendants().values_list("id", flat=True))
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsAdminUser], url_path="archive")
     def archive(self, request, pk=None):
@@ -488,13 +471,14 @@ class FolderViewSet(viewsets.ModelViewSet):
                 archive_note=note
             )
 
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action="archive_folder",
-                content_type=ContentType.objects.get_for_model(Folder),
+                model=Folder,
                 object_id=folder.id,
                 extra_info={"folders_count": len(folder_ids), "docs_count": len(docs_ids)}
             )
+        invalidate_next_archive_expiry()
 
         return Response(
             {
@@ -542,10 +526,10 @@ class FolderViewSet(viewsets.ModelViewSet):
                     restored_at=now,
                 )
             
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action="restore_folder",
-                content_type=ContentType.objects.get_for_model(Folder),
+                model=Folder,
                 object_id=folder.id,
                 extra_info={"folders_count": len(folder_ids)}
             )
@@ -638,7 +622,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         # Base query: non-archived docs
-        qs = Document.objects.filter(is_archived=False)
+        qs = Document.objects.filter(live_q())
 
         # Admin sees all non-archived
         if user.is_superuser or user.is_staff:
@@ -704,13 +688,14 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 note=note,
             )
 
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action="archive",
-                content_type=ContentType.objects.get_for_model(Document),
+                model=Document,
                 object_id=document.id,
                 extra_info={"mode": mode, "retention_until": str(retention_until) if retention_until else None},
             )
+        invalidate_next_archive_expiry()
 
         return Response(
             {"message": "Document archived successfully", "archive": DocumentArchiveSerializer(record).data},
@@ -745,10 +730,10 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 active.restored_at = timezone.now()
                 active.save(update_fields=["status", "restored_at"])
 
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action="restore",
-                content_type=ContentType.objects.get_for_model(Document),
+                model=Document,
                 object_id=document.id,
                 extra_info={},
             )
@@ -762,10 +747,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
         url_path="archived",
     )
     def archived(self, request):
-        _restore_expired_entities()
         qs = (
             DocumentArchive.objects.select_related("document", "archived_by")
-            .filter(status=DocumentArchive.STATUS_ACTIVE)
+            .filter(status=DocumentArchive.STATUS_ACTIVE, document__in=Document.objects.filter(archived_q()))
             .order_by("-archived_at")
         )
         return Response(DocumentArchiveSerializer(qs, many=True).data, status=status.HTTP_200_OK)
@@ -788,6 +772,7 @@ class DocumentListCreateView(APIView):
 
     def post(self, request):
         file = request.FILES.get("file")
+        upload = None
         custom_path = (request.data.get("doc_path") or "").strip()
 
         format_and_types = {
@@ -801,7 +786,14 @@ class DocumentListCreateView(APIView):
             "jpeg": "JPEG Image",
         }
 
-        if not file:
+        # ✅ Large files arrive through a chunked upload session instead of "file"
+        if not file and request.data.get("upload_id"):
+            try:
+                upload = get_completed_upload(request.data.get("upload_id"), request.user)
+            except UploadError as e:
+                return Response({"error": str(e)}, status=400)
+
+        if not file and not upload:
             return Response({"error": "Missing field: file"}, status=400)
 
         parent_folder_id = request.data.get("parent_folder")
@@ -900,25 +892,22 @@ class DocumentListCreateView(APIView):
                 if not doc_type_obj:
                     return Response({"error": "Invalid nature ID and no type provided."}, status=400)
 
-        next_order = 1
         doc_code = ""
         used_nature_order = None
         used_type_order = None
 
         # Logic: If Type is present, use it for Code generation.
         # Otherwise fall back to Nature.
+        # Numbers come from the sequence allocator in their own short transaction,
+        # so the row lock is not held while the file is stored (a failed upload leaves a gap).
         if doc_type_obj:
-            last_doc = Document.objects.filter(document_type=doc_type_obj).order_by("-document_type_order").first()
-            if last_doc and last_doc.document_type_order is not None:
-                next_order = last_doc.document_type_order + 1
+            next_order = allocate(type_key(doc_type_obj))
             
             used_type_order = next_order
             doc_code = f"{doc_type_obj.code}-{next_order}"
         
         elif nature_obj:
-            last_doc = Document.objects.filter(doc_nature=nature_obj).order_by("-doc_nature_order").first()
-            if last_doc and last_doc.doc_nature_order is not None:
-                next_order = last_doc.doc_nature_order + 1
+            next_order = allocate(nature_key(nature_obj))
             
             used_nature_order = next_order
             doc_code = f"{nature_obj.code}-{next_order}"
@@ -932,15 +921,16 @@ class DocumentListCreateView(APIView):
             except:
                 return Response({"error": "No DocumentNature found in system to use as default."}, status=500)
 
-        doc_size = file.size
-        doc_format = file.name.split(".")[-1] if "." in file.name else ""
+        file_name = file.name if file else upload.filename
+        doc_size = file.size if file else upload.total_size
+        doc_format = file_name.split(".")[-1] if "." in file_name else ""
         doc_title = request.data.get("doc_title", "")
         
         # Force DRAFT status
         doc_status_type = "DRAFT"
         
         doc_description_val = request.data.get("doc_description", "")
-        safe_name = os.path.basename(file.name)
+        safe_name = os.path.basename(file_name)
 
         # Construct LIVE path
         if custom_path:
@@ -975,31 +965,34 @@ class DocumentListCreateView(APIView):
             parent_folder=folder,
         )
 
-        # Save the LIVE file (at "Folder/Filename.ext")
-        document.doc_path.save(upload_path, file, save=False)
-        document.save()
+        # Bytes are stored once per content (blob); the LIVE file is a server-side copy.
+        with transaction.atomic():
+            if upload:
+                blob = store_object(upload.key, sha256=upload.sha256, size=upload.total_size, adopt=True)
+                upload.delete()
+            else:
+                blob = store_file(file)
 
-        # Create a SAFE COPY for V1 in history
-        try:
-            file.seek(0)
-        except Exception:
-            pass
+            # LIVE file at "Folder/Filename.ext"
+            document.doc_path.name = _copy_to_live_key(
+                blob.key, default_storage.get_available_name(upload_path, max_length=2048)
+            )
+            document.save()
+            set_live_blob(document, blob)
+            enqueue_extraction(document)
 
-        v1 = DocumentVersion.objects.create(
-            document=document,
-            version_number=1,
-            change_type="AUDITABLE",
-            version_comment="Initial version",
-        )
-        
-        # Save version in "documents/versions/" explicitly
-        v1_name = f"{document.id}/v1_{safe_name}".replace("\\", "/")
-        v1.version_path.save(v1_name, file)
+            v1 = DocumentVersion.objects.create(
+                document=document,
+                version_number=1,
+                change_type="AUDITABLE",
+                version_comment="Initial version",
+            )
+            attach_to_version(v1, blob)
 
-        UserActionLog.objects.create(
+        audit.log_action(
             user=owner,
             action="create",
-            content_type=ContentType.objects.get_for_model(document),
+            model=document,
             object_id=document.id,
             extra_info={"doc_title": doc_title},
         )
@@ -1011,36 +1004,88 @@ class DocumentListCreateView(APIView):
         )
     
     def get(self, request):
-        _restore_expired_entities()
+        """
+        Listing with optional facet filters (?doc_departement=1,2&doc_format=pdf...)
+        and, with ?facets=all or ?facets=site,..., facet counts computed in one
+        query; rows then go under "documents" next to "facets".
+        """
+        # Filter based on user role
+        base, filters = _faceted_documents(request)
+        facets = requested_facets(request.query_params)
 
         folder = (request.query_params.get("folder") or "").strip()
         if folder:
             folder = _normalize_path(folder)
             prefix = f"{folder}/" if not folder.endswith("/") else folder
-            
-            # Filter query based on user role
-            base_qs = Document.objects.filter(doc_path__startswith=prefix, is_archived=False)
-            
-            if request.user.is_superuser or request.user.is_staff:
-                docs = base_qs
-            else:
-                docs = base_qs.filter(
-                    Q(doc_status_type__in=['PUBLIC', 'ORIGINAL']) | Q(doc_owner=request.user)
-                )
+            base = base.filter(doc_path__startswith=prefix)
+
+        # ?path_index narrows the base, so facet counts describe the same rows
+        base = _apply_path_index_params(request, base)
+        documents = apply_facet_filters(base, filters)
+        if not facets:
+            return _document_list_response(request, documents)
+        return _document_list_response(
+            request, documents, envelope={"facets": facet_counts(base, filters, facets)}
+        )
 
-            return Response(DocumentSerializer(docs, many=True).data)
 
-        # Filter all documents based on user role
-        base_qs = Document.objects.filter(is_archived=False)
-        if request.user.is_superuser or request.user.is_staff:
-            documents = base_qs
-        else:
-            documents = base_qs.filter(
-                 Q(doc_status_type__in=['PUBLIC', 'ORIGINAL']) | Q(doc_owner=request.user)
-            )
+class DocumentSearchView(APIView):
+    """
+    GET /api/documents/search/?q=<text>[&limit=20&offset=0]
 
-        serializer = DocumentSerializer(documents, many=True)
-        return Response(serializer.data)
+    Full-text search over document metadata (see documents/search.py), with the
+    listing's visibility rules. Results are ranked; each row carries `rank` and
+    a `highlight` of the title and description. Supports ?fields= like the listing.
+    """
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        text = (request.query_params.get("q") or "").strip()
+        if not text:
+            return Response({"error": "Missing search text (q)."}, status=400)
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", self.default_limit)), self.max_limit))
+            offset = max(0, int(request.query_params.get("offset", 0)))
+        except (TypeError, ValueError):
+            return Response({"error": "limit and offset must be integers."}, status=400)
+
+        context = _document_list_context(request)
+        queryset = DocumentListSerializer.prepare_queryset(
+            search_documents(_visible_documents(request), text), include_versions=context["include_versions"]
+        )
+        # One extra row tells whether another page exists
+        rows = list(queryset[offset:offset + limit + 1])
+        next_offset = offset + limit if len(rows) > limit else None
+        rows = rows[:limit]
+
+        marks = highlights([row.id for row in rows], text)
+        data = DocumentListSerializer(rows, many=True, context=context).data
+        for row, item in zip(rows, data):
+            item["rank"] = row.rank
+            item["highlight"] = marks.get(row.id)
+        return Response({"query": text, "next_offset": next_offset, "results": data})
+
+
+class DocumentTypeaheadView(APIView):
+    """
+    GET /api/documents/typeahead/?q=<text>[&limit=10]
+
+    Best matching documents by title or code (prefix first, then fuzzy; see
+    common/typeahead.py), with the listing's visibility rules. For pickers.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return Response({"error": "limit must be an integer."}, status=400)
+        rows = typeahead(
+            _visible_documents(request), DOCUMENT_MATCH_FIELDS, request.query_params.get("q"), limit
+        ).values("id", "doc_title", "doc_code", "doc_status_type", "score")
+        return Response({"results": list(rows)})
 
 
 class DocumentDetailView(APIView):
@@ -1097,6 +1142,12 @@ class DocumentDetailView(APIView):
 
         # Continue with standard update logic (versions, metadata)
         uploaded = request.FILES.get("file")
+        upload = None
+        if not uploaded and request.data.get("upload_id"):
+            try:
+                upload = get_completed_upload(request.data.get("upload_id"), request.user)
+            except UploadError as e:
+                return Response({"error": str(e)}, status=400)
         update_type = (request.data.get("update_type") or "AUDITABLE").upper().strip()
         if update_type not in ("MINOR", "AUDITABLE", "SILENT"):
             update_type = "AUDITABLE"
@@ -1104,7 +1155,7 @@ class DocumentDetailView(APIView):
 
         with transaction.atomic():
             # Handle File Update (Versioning)
-            if uploaded or update_type != "SILENT":
+            if uploaded or upload or update_type != "SILENT":
                 last_v = document.versions.order_by("-version_number").first()
                 if last_v is None: # Create initial v1 if missing
                     v1 = DocumentVersion.objects.create(
@@ -1112,25 +1163,30 @@ class DocumentDetailView(APIView):
                     )
                     # Try to save content if file exists
                     try: 
-                        if default_storage.exists(document.doc_path.name):
-                            f = default_storage.open(document.doc_path.name)
-                            v1.version_path.save(f"v1_{os.path.basename(document.doc_path.name)}", f)
+                        if document.blob_id:
+                            acquire(document.blob)
+                            attach_to_version(v1, document.blob)
+                        elif default_storage.exists(document.doc_path.name):
+                            attach_to_version(v1, store_object(document.doc_path.name))
+                            set_live_blob(document, v1.blob)
                     except: pass
                     last_v = v1
 
                 next_ver = (last_v.version_number + 1) if last_v else 1
 
-                if update_type == "MINOR" and uploaded:
+                if update_type == "MINOR" and (uploaded or upload):
                     # New version logic
-                    safe_name = os.path.basename(uploaded.name)
+                    safe_name = os.path.basename(uploaded.name if uploaded else upload.filename)
                     v = DocumentVersion.objects.create(
                         document=document, version_number=next_ver, change_type="MINOR", version_comment=version_comment
                     )
-                    # Save version to version folder
-                    v.version_path.save(f"{document.id}/v{next_ver}_{safe_name}", uploaded)
-                    
-                    # Reset stream for main save
-                    uploaded.seek(0)
+                    # Store the bytes once (deduplicated by content)
+                    if uploaded:
+                        blob = store_file(uploaded)
+                    else:
+                        blob = store_object(upload.key, sha256=upload.sha256, size=upload.total_size, adopt=True)
+                        upload.delete()
+                    attach_to_version(v, blob)
                     
                     # ✅ FIX: Update live file at the correct folder path
                     folder_path = _normalize_path(document.parent_folder.fol_path)
@@ -1140,20 +1196,27 @@ class DocumentDetailView(APIView):
                     if document.doc_path.name != live_key:
                          default_storage.delete(document.doc_path.name)
 
-                    document.doc_path.save(live_key, uploaded)
-                    document.doc_size = uploaded.size
+                    # Server-side copy instead of re-uploading the same stream
+                    document.doc_path.name = _copy_to_live_key(blob.key, live_key)
+                    document.doc_size = blob.size
                     
                     ext = os.path.splitext(safe_name)[1].lstrip(".").lower()
                     if ext: 
                         document.doc_format = ext
                         document.doc_type = ext.upper()
+                    document.save()
+                    set_live_blob(document, blob)
+                    enqueue_extraction(document)
 
                 elif update_type == "AUDITABLE":
                     # Metadata only update -> Link to old file
                     v = DocumentVersion.objects.create(
                         document=document, version_number=next_ver, change_type="AUDITABLE", version_comment=version_comment
                     )
-                    if last_v and last_v.version_path:
+                    if last_v and last_v.blob_id:
+                        acquire(last_v.blob)
+                        attach_to_version(v, last_v.blob)
+                    elif last_v and last_v.version_path:
                         v.version_path.name = last_v.version_path.name
                         v.save(update_fields=["version_path"])
 
@@ -1164,6 +1227,7 @@ class DocumentDetailView(APIView):
             data.pop("doc_path", None) 
             data.pop("update_type", None)
             data.pop("version_comment", None)
+            data.pop("upload_id", None)
 
             # Force status to DRAFT on any update
             data['docstatustype'] = "DRAFT" # <--- FIXED CASING
@@ -1173,10 +1237,10 @@ class DocumentDetailView(APIView):
                 serializer.save()
                 
                 # Log action
-                UserActionLog.objects.create(
+                audit.log_action(
                     user=document.doc_owner,
                     action="update",
-                    content_type=ContentType.objects.get_for_model(document),
+                    model=document,
                     object_id=document.id,
                     extra_info={"updated_fields": list(data.keys())}
                 )
@@ -1193,16 +1257,102 @@ class DocumentDetailView(APIView):
         doc_id = document.id
         document.delete()
 
-        UserActionLog.objects.create(
+        audit.log_action(
             user=owner,
             action="delete",
-            content_type=ContentType.objects.get_for_model(Document),
+            model=Document,
             object_id=doc_id,
             extra_info={"doc_title": getattr(document, "doc_title", None)},
         )
         return Response({"status": "Document deleted successfully"}, status=200)
 
 
+# ------------------------ Chunked uploads ------------------------
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _upload_session_payload(session):
+    return {
+        "upload_id": str(session.id),
+        "filename": session.filename,
+        "size": session.total_size,
+        "chunk_size": session.chunk_size,
+        "offset": session.bytes_received,
+        "status": session.status,
+        "sha256": session.sha256 or None,
+    }
+
+
+def _upload_error_response(error):
+    return Response({"error": str(error), **error.extra}, status=error.status_code)
+
+
+class UploadSessionCreateView(APIView):
+    """
+    Starts a resumable upload. Send the file as raw chunks to the detail
+    endpoint, then POST .../complete/ and pass "upload_id" instead of "file"
+    when creating or updating a document.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            session = start_upload(
+                request.user,
+                request.data.get("filename"),
+                request.data.get("size"),
+                chunk_size=request.data.get("chunk_size"),
+            )
+        except UploadError as e:
+            return _upload_error_response(e)
+        return Response(_upload_session_payload(session), status=201)
+
+
+class UploadSessionDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+        return Response(_upload_session_payload(session))
+
+    def put(self, request, upload_id):
+        get_object_or_404(UploadSession, id=upload_id, user=request.user)
+
+        offset = request.META.get("HTTP_UPLOAD_OFFSET", request.query_params.get("offset"))
+        try:
+            offset = int(offset)
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (TypeError, ValueError):
+            return Response({"error": "Missing Upload-Offset header"}, status=400)
+        if length > MAX_CHUNK_BYTES:
+            return Response({"error": "Chunk too large"}, status=413)
+
+        # Raw body: at most one chunk is held in memory
+        data = request.stream.read(length) if length and request.stream else b""
+        try:
+            session = receive_chunk(upload_id, request.user, offset, data)
+        except UploadError as e:
+            return _upload_error_response(e)
+        return Response(_upload_session_payload(session))
+
+    def delete(self, request, upload_id):
+        get_object_or_404(UploadSession, id=upload_id, user=request.user)
+        session = abort_upload(upload_id, request.user)
+        return Response(_upload_session_payload(session))
+
+
+class UploadSessionCompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        get_object_or_404(UploadSession, id=upload_id, user=request.user)
+        try:
+            session = complete_upload(upload_id, request.user)
+        except UploadError as e:
+            return _upload_error_response(e)
+        return Response(_upload_session_payload(session))
+
+
 class DocumentVersionViewSet(viewsets.ModelViewSet):
     queryset = DocumentVersion.objects.all()
     serializer_class = DocumentVersionSerializer
@@ -1240,7 +1390,7 @@ class FolderDocumentsView(APIView):
         prefix = f"{folder}/" if not folder.endswith("/") else folder
 
         # Filter by role
-        base_qs = Document.objects.filter(doc_path__startswith=prefix, is_archived=False)
+        base_qs = Document.objects.filter(live_q(), doc_path__startswith=prefix)
         if request.user.is_superuser or request.user.is_staff:
              documents = base_qs
         else:
@@ -1248,8 +1398,8 @@ class FolderDocumentsView(APIView):
                  Q(doc_status_type__in=['PUBLIC', 'ORIGINAL']) | Q(doc_owner=request.user)
              )
 
-        serializer = DocumentSerializer(documents, many=True)
-        return Response({"folder": folder, "documents": serializer.data}, status=status.HTTP_200_OK)
+        documents = _apply_path_index_params(request, documents)
+        return _document_list_response(request, documents, envelope={"folder": folder})
 
 
 class DocumentByFolderView(APIView):
@@ -1259,7 +1409,7 @@ class DocumentByFolderView(APIView):
         folder = get_object_or_404(Folder, id=folder_id)
         
         # Filter by role
-        base_qs = Document.objects.filter(parent_folder=folder, is_archived=False)
+        base_qs = Document.objects.filter(live_q(), parent_folder=folder)
         if request.user.is_superuser or request.user.is_staff:
              documents = base_qs
         else:
@@ -1267,8 +1417,8 @@ class DocumentByFolderView(APIView):
                  Q(doc_status_type__in=['PUBLIC', 'ORIGINAL']) | Q(doc_owner=request.user)
              )
 
-        serializer = DocumentSerializer(documents, many=True)
-        return Response({"folder": folder.fol_name, "documents": serializer.data}, status=status.HTTP_200_OK)
+        documents = _apply_path_index_params(request, documents)
+        return _document_list_response(request, documents, envelope={"folder": folder.fol_name})
 
 
 # ---------------- OnlyOffice ----------------
@@ -1422,72 +1572,14 @@ def onlyoffice_callback(request, pk):
             logger.error("OnlyOffice callback: no download url provided in payload")
             return Response({"error": 1, "message": "no download url"})
 
-        try:
-            head = requests.head(download_url, allow_redirects=True, timeout=10)
-            logger.info("OnlyOffice callback HEAD %s -> %s", download_url, head.status_code)
-        except Exception:
-            logger.exception("HEAD to download URL failed; will attempt GET")
-
-        try:
-            r = requests.get(download_url, stream=True, timeout=30)
-            logger.info(
-                "OnlyOffice callback GET %s -> %s (len=%s)",
-                download_url,
-                r.status_code,
-                r.headers.get("Content-Length"),
-            )
-            if r.status_code != 200:
-                logger.error("OnlyOffice callback: download GET returned %s", r.status_code)
-                return Response({"error": 1, "message": f"download status {r.status_code}"})
-
-            with transaction.atomic():
-                document = get_object_or_404(Document, pk=pk)
+        if not Document.objects.filter(pk=pk).exists():
+            logger.error("OnlyOffice callback: document %s not found", pk)
+            return Response({"error": 1, "message": "No Document matches the given query."})
 
-                # If archived, ignore callback to avoid modifying archived documents
-                if document.is_archived:
-                    logger.warning("OnlyOffice callback: document %s is archived; ignoring save.", pk)
-                    return Response({"error": 0})
-
-                last_v = document.versions.order_by("-version_number").first()
-                if last_v is None and getattr(document.doc_path, "name", ""):
-                    try:
-                        f_content = document.doc_path.read()
-                    except Exception:
-                        f_content = b""
-
-                    initial = DocumentVersion.objects.create(
-                        document=document,
-                        version_number=1,
-                        change_type="AUDITABLE",
-                        version_comment="Initial version",
-                    )
-                    v1_name = f"{document.id}/v1_initial.bin"
-                    initial.version_path.save(v1_name, ContentFile(f_content))
-                    last_v = initial
-
-                next_version = (last_v.version_number + 1) if last_v else 1
-
-                # Save history version (Safe Copy)
-                current_name = os.path.basename(getattr(document.doc_path, "name", "") or f"document_{document.id}.bin")
-                v = DocumentVersion.objects.create(
-                    document=document,
-                    version_number=next_version,
-                    change_type="AUDITABLE",
-                    version_comment="ONLYOFFICE edit",
-                )
-                version_name = f"{document.id}/v{next_version}_{current_name}".replace("\\", "/")
-                v.version_path.save(version_name, ContentFile(r.content), save=True)
-
-                # Overwrite current file in folder path
-                fol_path = _normalize_path(getattr(document.parent_folder, "fol_path", "") or "")
-                current_key = f"{fol_path}/{current_name}" if fol_path else current_name
-                document.doc_path.save(current_key, ContentFile(r.content), save=True)
-
-            logger.info("OnlyOffice callback: saved new version for document %s", pk)
-            return Response({"error": 0})
-
-        except Exception as exc:
-            logger.exception("OnlyOffice callback: error downloading/saving file: %s", exc)
-            return Response({"error": 1, "message": str(exc)})
+        # Acknowledge right away; the file is downloaded and saved in the background
+        job, created = enqueue_save(pk, data.get("key"), download_url)
+        if not created:
+            logger.info("OnlyOffice callback: save for document %s key %s already queued", pk, job.doc_key)
+        return Response({"error": 0})
 
     return Response({"error": 0})
\ No newline at end of file
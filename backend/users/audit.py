@@ -0,0 +1,233 @@
+# backend/users/audit.py
+# Purpose: buffered, batched writer for UserActionLog and PermissionAudit rows.
+# Instead of one INSERT per audited action, entries are collected and written with
+# bulk_create (one INSERT per model) when the scope they belong to ends:
+#   - inside a request (see PermissionMiddleware): flushed with the response
+#   - otherwise: written immediately
+# Entries recorded inside an atomic block only reach that scope once the block
+# commits (transaction.on_commit, so a rolled-back transaction or savepoint drops
+# them), so a request costs one insert per audit model. With AUDIT_ASYNC_FLUSH enabled, flushed batches are
+# handed to a background writer through a bounded queue (AUDIT_QUEUE_MAXSIZE); when the
+# queue is full the batch is written inline.
+# Content types are resolved at flush time, in one get_for_models() call per batch
+# (served from ContentTypeManager's process cache after the first lookup).
+from __future__ import annotations
+
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .models import PermissionAudit, UserActionLog
+
+logger = logging.getLogger("permissions")
+
+# (model class, field values, target model class or None)
+Entry = Tuple[type, Dict[str, Any], Optional[type]]
+
+_request_buffer: ContextVar[Optional[List[Entry]]] = ContextVar("audit_request_buffer", default=None)
+
+_queue: Optional["queue.Queue[List[Entry]]"] = None
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+# -----------------------
+# Public API
+# -----------------------
+def log_action(user, action: str, model=None, object_id: Optional[int] = None, extra_info: Optional[dict] = None) -> None:
+    """
+    Buffer a UserActionLog row. `model` is the target model class or instance;
+    `object_id` defaults to the instance pk.
+    """
+    if object_id is None and model is not None and not isinstance(model, type):
+        object_id = getattr(model, "pk", None)
+    _add(
+        UserActionLog,
+        {
+            "user": user if getattr(user, "is_authenticated", False) else None,
+            "action": action,
+            "object_id": object_id or 0,
+            "extra_info": extra_info,
+        },
+        model,
+    )
+
+
+def log_permission_audit(actor, action: str, target=None, details: Optional[dict] = None) -> None:
+    """
+    Buffer a PermissionAudit row. If PermissionAudit cannot be written, the batch
+    falls back to UserActionLog.
+    """
+    object_id = None
+    if target is not None and not isinstance(target, type):
+        object_id = getattr(target, "pk", None) or getattr(target, "id", None)
+    _add(
+        PermissionAudit,
+        {
+            "actor": actor if getattr(actor, "is_authenticated", False) else None,
+            "target_object_id": object_id,
+            "action": action,
+            "details": details or {},
+        },
+        target,
+    )
+
+
+def begin_request():
+    """
+    Start buffering entries for the current request. Returns a token for end_request().
+    """
+    return _request_buffer.set([])
+
+
+def end_request(token) -> None:
+    """
+    Stop buffering for the current request and flush what was collected.
+    """
+    entries = _request_buffer.get()
+    try:
+        _request_buffer.reset(token)
+    except ValueError:
+        # Ended from another context; the buffer is still flushed below
+        pass
+    if entries:
+        _flush(entries)
+
+
+def drain(timeout: Optional[float] = None) -> None:
+    """
+    Wait until the background writer has written every queued batch.
+    """
+    if _queue is None or _writer is None or not _writer.is_alive():
+        return
+    if timeout is None:
+        _queue.join()
+    else:
+        _join_with_timeout(timeout)
+
+
+# -----------------------
+# Buffering
+# -----------------------
+def _add(model_cls: type, values: Dict[str, Any], target) -> None:
+    try:
+        conn = transaction.get_connection()
+        if getattr(conn, "needs_rollback", False):
+            logger.warning("Database connection in aborted transaction; skipping audit write for action=%s", values.get("action"))
+            return
+        target_model = None
+        if target is not None:
+            target_model = target if isinstance(target, type) else type(target)
+        entry = (model_cls, values, target_model)
+
+        # Runs right away outside an atomic block
+        transaction.on_commit(partial(_buffer, entry))
+    except Exception:
+        logger.exception("Failed to buffer audit entry action=%s", values.get("action"))
+
+
+def _buffer(entry: Entry) -> None:
+    request_entries = _request_buffer.get()
+    if request_entries is not None:
+        request_entries.append(entry)
+    else:
+        _flush([entry])
+
+
+# -----------------------
+# Writing
+# -----------------------
+def _flush(entries: List[Entry]) -> None:
+    if not entries:
+        return
+    if getattr(settings, "AUDIT_ASYNC_FLUSH", False):
+        try:
+            _get_queue().put_nowait(list(entries))
+            return
+        except queue.Full:
+            logger.warning("Audit queue full; writing %d entries inline", len(entries))
+    write_entries(entries)
+
+
+def write_entries(entries: List[Entry]) -> None:
+    """
+    Write buffered entries with one bulk_create per audit model. Never raises.
+    """
+    try:
+        target_models = {target for _, _, target in entries if target is not None}
+        content_types = ContentType.objects.get_for_models(*target_models) if target_models else {}
+    except Exception:
+        logger.exception("Failed to resolve content types for audit entries")
+        content_types = {}
+
+    action_logs: List[UserActionLog] = []
+    audits: List[PermissionAudit] = []
+    for model_cls, values, target in entries:
+        ct = content_types.get(target) if target is not None else None
+        if model_cls is PermissionAudit:
+            audits.append(PermissionAudit(target_content_type=ct, **values))
+        else:
+            action_logs.append(UserActionLog(content_type=ct, **values))
+
+    if audits:
+        try:
+            with transaction.atomic():
+                PermissionAudit.objects.bulk_create(audits)
+        except Exception as e:
+            logger.debug("PermissionAudit write failed (%s); attempting fallback to UserActionLog", e)
+            action_logs.extend(
+                UserActionLog(
+                    user=a.actor,
+                    action=a.action,
+                    content_type=a.target_content_type,
+                    object_id=a.target_object_id or 0,
+                    extra_info=a.details or {},
+                )
+                for a in audits
+            )
+    if action_logs:
+        try:
+            with transaction.atomic():
+                UserActionLog.objects.bulk_create(action_logs)
+        except Exception:
+            logger.exception("Failed to write %d UserActionLog entries", len(action_logs))
+
+
+def _get_queue() -> "queue.Queue[List[Entry]]":
+    global _queue, _writer
+    with _writer_lock:
+        if _queue is None:
+            _queue = queue.Queue(maxsize=getattr(settings, "AUDIT_QUEUE_MAXSIZE", 1000))
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="audit-writer", daemon=True)
+            _writer.start()
+        return _queue
+
+
+def _writer_loop() -> None:
+    while True:
+        entries = _queue.get()
+        try:
+            write_entries(entries)
+        finally:
+            _queue.task_done()
+            if _queue.empty():
+                # Do not hold a connection open while idle
+                transaction.get_connection().close()
+
+
+def _join_with_timeout(timeout: float) -> None:
+    done = threading.Event()
+    threading.Thread(target=lambda: (_queue.join(), done.set()), daemon=True).start()
+    done.wait(timeout)
+
+
+atexit.register(drain, 5.0)
@@ -0,0 +1,130 @@
+# backend/users/audit_archive.py
+# Purpose: retention for the audit tables (UserActionLog, PermissionAudit).
+# Rows older than the retention window are moved out month by month: each month is
+# streamed into a gzip-compressed JSONL object in storage (MinIO in production),
+#   audit-archive/<table>/<YYYY-MM>/<first_id>-<last_id>.jsonl.gz
+# and deleted from the database once the upload succeeded. Object names carry the id
+# range, so a rerun after an interruption never overwrites an earlier archive.
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import gzip
+import json
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PermissionAudit, UserActionLog
+
+logger = logging.getLogger("permissions")
+
+ARCHIVE_PREFIX = "audit-archive"
+DEFAULT_RETENTION_DAYS = 365
+DEFAULT_BATCH_SIZE = 5000
+# Archives are built on disk past this size instead of in memory
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# model -> exported columns (content types are exported by name so archives stay readable)
+ARCHIVED_MODELS: Dict[type, Tuple[str, ...]] = {
+    UserActionLog: (
+        "id", "timestamp", "user_id", "user__username", "action",
+        "content_type__app_label", "content_type__model", "object_id", "extra_info",
+    ),
+    PermissionAudit: (
+        "id", "timestamp", "actor_id", "actor__username", "action",
+        "target_content_type__app_label", "target_content_type__model", "target_object_id", "details",
+    ),
+}
+
+
+def retention_cutoff(retention_days: Optional[int] = None) -> datetime:
+    """
+    Start of the oldest month that is kept: only whole months are archived.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, "AUDIT_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    limit = timezone.localtime(timezone.now() - timedelta(days=retention_days))
+    return limit.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _month_starts(first: datetime, cutoff: datetime) -> Iterable[Tuple[datetime, datetime]]:
+    start = timezone.localtime(first).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while start < cutoff:
+        end = (start + timedelta(days=32)).replace(day=1)
+        yield start, end
+        start = end
+
+
+def _archive_key(model, month: datetime, first_id: int, last_id: int) -> str:
+    return f"{ARCHIVE_PREFIX}/{model._meta.db_table}/{month:%Y-%m}/{first_id}-{last_id}.jsonl.gz"
+
+
+def _delete_archived(queryset, batch_size: int) -> int:
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+def archive_month(model, start: datetime, end: datetime, dry_run: bool = False,
+                  batch_size: int = DEFAULT_BATCH_SIZE, storage=None) -> Optional[dict]:
+    """
+    Archive and delete the rows of `model` with start <= timestamp < end.
+    Returns a summary, or None if the month has no rows.
+    """
+    storage = storage or default_storage
+    month_qs = model.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    bounds = month_qs.order_by("id").values_list("id", flat=True)
+    first_id = bounds.first()
+    if first_id is None:
+        return None
+    last_id = bounds.last()
+    rows_qs = month_qs.filter(id__lte=last_id)
+
+    summary = {"table": model._meta.db_table, "month": f"{start:%Y-%m}", "rows": 0, "key": None, "deleted": 0}
+    if dry_run:
+        summary["rows"] = rows_qs.count()
+        return summary
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+            for row in rows_qs.order_by("id").values(*ARCHIVED_MODELS[model]).iterator(chunk_size=batch_size):
+                gz.write(json.dumps(row, cls=DjangoJSONEncoder).encode("utf-8") + b"\n")
+                summary["rows"] += 1
+        buffer.seek(0)
+        key = _archive_key(model, start, first_id, last_id)
+        summary["key"] = storage.save(key, File(buffer, name=key.rsplit("/", 1)[-1]))
+
+    # Only rows that went into the archive are deleted
+    summary["deleted"] = _delete_archived(rows_qs, batch_size)
+    logger.info("Archived %s rows of %s for %s to %s", summary["rows"], summary["table"], summary["month"], summary["key"])
+    return summary
+
+
+def archive_audit_logs(retention_days: Optional[int] = None, dry_run: bool = False,
+                       batch_size: int = DEFAULT_BATCH_SIZE, storage=None) -> List[dict]:
+    """
+    Move every whole month older than the retention window out of the audit tables.
+    Returns one summary per archived (table, month).
+    """
+    cutoff = retention_cutoff(retention_days)
+    results: List[dict] = []
+    for model in ARCHIVED_MODELS:
+        oldest = model.objects.filter(timestamp__lt=cutoff).order_by("timestamp").values_list("timestamp", flat=True).first()
+        if oldest is None:
+            continue
+        for start, end in _month_starts(oldest, cutoff):
+            summary = archive_month(model, start, end, dry_run=dry_run, batch_size=batch_size, storage=storage)
+            if summary:
+                results.append(summary)
+    return results
@@ -0,0 +1,35 @@
+# backend/users/management/commands/archive_audit_logs.py
+# Purpose: move audit rows older than the retention window to compressed archives in storage.
+# Usage: python manage.py archive_audit_logs [--retention-days N] [--dry-run]
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from users.audit_archive import DEFAULT_BATCH_SIZE, archive_audit_logs, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives UserActionLog and PermissionAudit rows older than the retention window "
+        "(AUDIT_RETENTION_DAYS) to gzip JSONL objects, one per table and month, then deletes them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=None, help="Override AUDIT_RETENTION_DAYS.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per read/delete batch.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options["retention_days"])
+        results = archive_audit_logs(
+            retention_days=options["retention_days"],
+            dry_run=options["dry_run"],
+            batch_size=max(1, options["batch_size"]),
+        )
+        for r in results:
+            target = "(dry run)" if options["dry_run"] else f"-> {r['key']} ({r['deleted']} deleted)"
+            self.stdout.write(f"{r['table']} {r['month']}: {r['rows']} rows {target}")
+
+        total = sum(r["rows"] for r in results)
+        verb = "would be archived" if options["dry_run"] else "archived"
+        self.stdout.write(self.style.SUCCESS(f"{total} audit rows older than {cutoff:%Y-%m-%d} {verb}."))
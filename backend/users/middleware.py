@@ -1,73 +1,89 @@
 # backend/users/middleware.py
 # Purpose: attach per-request cached permissions and basic permission-check auditing helper.
-# This middleware computes the effective permissions once per request and exposes:
-#   - request.user_permissions (set of "app_label.codename")
+# This middleware exposes:
+#   - request.user_permissions (lazy set of "app_label.codename", resolved on first access)
+#   - request.permission_lookups (per-request lookup counters, for profiling)
 #   - request.log_permission_check(actor, perm, granted, obj=None, details=None)
-# The audit function writes a PermissionAudit entry when available.
+# The audit function buffers a PermissionAudit entry; audit entries logged during the
+# request (users.audit) are written in one batch with the response.
 from __future__ import annotations
 
 from typing import Optional, Set, Callable, Any
 import logging
 
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
 from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
 
+from . import audit, permission_cache
 from .utils import get_effective_permissions
-from .models import PermissionAudit
 
 User = get_user_model()
 logger = logging.getLogger("permissions")
 
 
+def _resolve_user_permissions(request) -> Set[str]:
+    # Read request.user at access time: DRF authentication (JWT, token) runs after
+    # middleware and sets the user on the underlying request.
+    user = getattr(request, "user", None)
+    if not user or not getattr(user, "is_authenticated", False):
+        return set()
+    try:
+        # Same set object as user._effective_permissions_cache
+        return get_effective_permissions(user)
+    except Exception:
+        logger.exception("Failed to compute effective permissions for user=%s", getattr(user, "pk", None))
+        return set()
+
+
 class PermissionMiddleware(MiddlewareMixin):
     """
-    Compute and attach effective permissions for the authenticated user to the request
-    to avoid repeated DB hits during a request lifecycle.
+    Attach the effective permissions of the authenticated user to the request as a lazy
+    set: it is resolved on first access only, so requests that never check permissions
+    skip the permission queries entirely.
 
     Also provides a helper `request.log_permission_check(...)` that view code or permission
     classes can call to write lightweight audit entries.
     """
 
     def process_request(self, request):
-        request.user_permissions: Set[str] = set()
+        request.user_permissions = SimpleLazyObject(lambda: _resolve_user_permissions(request))
         request._permission_audit_logger: Callable[..., Any] = lambda *args, **kwargs: None
+        request.permission_lookups, request._permission_lookups_token = permission_cache.start_lookup_stats()
+        request._audit_token = audit.begin_request()
 
         user = getattr(request, "user", None)
         if user and getattr(user, "is_authenticated", False):
-            try:
-                request.user_permissions = get_effective_permissions(user)
-            except Exception:
-                logger.exception("Failed to compute effective permissions for user=%s", getattr(user, "pk", None))
-                request.user_permissions = set()
-
             # attach an audit helper that writes PermissionAudit rows (best-effort)
             def _log_permission_check(actor: Optional[User], perm: str, granted: bool, obj: Optional[object] = None, details: Optional[dict] = None):
-                try:
-                    content_type = None
-                    object_id = None
-                    if obj is not None:
-                        try:
-                            ct = ContentType.objects.get_for_model(obj)
-                            content_type = ct
-                            object_id = getattr(obj, "pk", None) or getattr(obj, "id", None)
-                        except Exception:
-                            # ignore content type resolution errors
-                            content_type = None
-                            object_id = None
-
-                    PermissionAudit.objects.create(
-                        actor=actor if getattr(actor, "is_authenticated", False) else None,
-                        target_content_type=content_type,
-                        target_object_id=object_id,
-                        action=("granted" if granted else "denied"),
-                        details={"perm": perm, **(details or {})},
-                    )
-                except Exception:
-                    logger.exception("Failed to write permission audit for perm=%s actor=%s", perm, getattr(actor, "pk", None))
+                # Buffered: written in one batch with the rest of the request's audit entries
+                audit.log_permission_audit(
+                    actor,
+                    "granted" if granted else "denied",
+                    target=obj,
+                    details={"perm": perm, **(details or {})},
+                )
 
             request.log_permission_check = _log_permission_check  # type: ignore[attr-defined]
         else:
-            # anonymous or no user: leave empty set and dummy logger
-            request.user_permissions = set()
-            request.log_permission_check = lambda *args, **kwargs: None  # type: ignore[assignment]
\ No newline at end of file
+            # anonymous or no user: dummy logger (user_permissions resolves to an empty set)
+            request.log_permission_check = lambda *args, **kwargs: None  # type: ignore[assignment]
+
+    def process_response(self, request, response):
+        audit_token = getattr(request, "_audit_token", None)
+        if audit_token is not None:
+            audit.end_request(audit_token)
+
+        token = getattr(request, "_permission_lookups_token", None)
+        if token is not None:
+            try:
+                permission_cache.stop_lookup_stats(token)
+            except ValueError:
+                # Response produced in another context (e.g. streamed); nothing to reset
+                pass
+            stats = request.permission_lookups
+            if stats["lookups"]:
+                logger.debug(
+                    "Permission lookups for %s %s: %s", request.method, request.path, stats
+                )
+        return response
\ No newline at end of file
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('users', '0006_site_alter_departement_dep_name_departement_site_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='permissionaudit',
+            index=models.Index(fields=['-timestamp', '-id'], name='permaudit_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='permissionaudit',
+            index=models.Index(fields=['target_content_type', 'target_object_id'], name='permaudit_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='actionlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['content_type', 'object_id', '-timestamp'], name='actionlog_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['user', '-timestamp'], name='actionlog_user_idx'),
+        ),
+    ]
@@ -11,6 +11,9 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Value
+from django.db.models.functions import Concat, Upper
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
@@ -71,6 +74,13 @@ class Role(models.Model):
         return self.role_name
 
 
+# "First Last", as matched by the user typeahead and its trigram index
+FULL_NAME = Concat("first_name", Value(" "), "last_name")
+
+# Values matched by the user typeahead (common/typeahead.py), each with a trigram index in User.Meta
+USER_MATCH_FIELDS = {"username": Upper("username"), "full_name": Upper(FULL_NAME)}
+
+
 class User(AbstractUser):
     """
     Custom user model extending Django's AbstractUser.
@@ -84,6 +94,14 @@ class User(AbstractUser):
     # cached property name used to avoid repeated DB lookups within the same process/object lifetime
     _effective_permissions_cache: Optional[Set[str]] = None
 
+    class Meta(AbstractUser.Meta):
+        swappable = "AUTH_USER_MODEL"
+        indexes = [
+            # Typeahead: prefix and fuzzy matching on upper-cased values (common/typeahead.py)
+            GinIndex(OpClass(USER_MATCH_FIELDS["username"], name="gin_trgm_ops"), name="users_username_trgm"),
+            GinIndex(OpClass(USER_MATCH_FIELDS["full_name"], name="gin_trgm_ops"), name="users_full_name_trgm"),
+        ]
+
     def save(self, *args, **kwargs) -> None:
         # If this is a new instance (no primary key yet) and the password appears not to be hashed,
         # call set_password() to hash the plain-text password.
@@ -108,48 +126,14 @@ class User(AbstractUser):
           - explicit user.user_permissions
           - permissions granted to groups the user is a member of
 
-        Caches the result on the instance to avoid repeated DB hits during a request lifecycle.
+        Caches the result on the instance to avoid repeated DB hits during a request lifecycle,
+        backed by the shared permission cache (users.permission_cache).
         For superusers, returns all permissions present in the system.
         """
-        if getattr(self, "_effective_permissions_cache", None) is not None:
-            return self._effective_permissions_cache  # type: ignore[return-value]
-
-        if not self.pk:
-            perms: Set[str] = set()
-            self._effective_permissions_cache = perms
-            return perms
-
-        if self.is_superuser:
-            # Superuser: return all permission strings (may be heavy but accurate)
-            qs = Permission.objects.select_related("content_type").all()
-        else:
-            # user permissions (direct)
-            user_perms_qs = self.user_permissions.select_related("content_type").all()
+        # Instance cache first, then the shared cache; computed from the DB on a miss
+        from .utils import get_effective_permissions
 
-            # group permissions: query Permission via groups to avoid iterating groups separately
-            group_perms_qs = Permission.objects.select_related("content_type").filter(group__user=self).distinct()
-
-            # combine querysets using union-like iteration without additional queries per permission
-            # convert to a set of "app_label.codename"
-            qs = user_perms_qs.union(group_perms_qs) if hasattr(user_perms_qs, 'union') else list(user_perms_qs) + list(group_perms_qs)
-
-        perms: Set[str] = set()
-        try:
-            # handle both queryset and list
-            for p in qs:
-                ct = getattr(p, "content_type", None)
-                if ct is None:
-                    continue
-                app = getattr(ct, "app_label", None)
-                codename = getattr(p, "codename", None)
-                if app and codename:
-                    perms.add(f"{app}.{codename}")
-        except Exception:
-            # Defensive fallback: use Django built-ins
-            perms = set(self.get_all_permissions())
-
-        self._effective_permissions_cache = perms
-        return perms
+        return get_effective_permissions(self)
 
     def has_any_permission(self, permission_list: Iterable[str]) -> bool:
         """
@@ -218,6 +202,15 @@ class UserActionLog(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     extra_info = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Log browsing (newest first, keyset pagination) and retention by month
+            models.Index(fields=["-timestamp", "-id"], name="actionlog_timestamp_idx"),
+            # Per-object history (e.g. WorkflowViewSet.history)
+            models.Index(fields=["content_type", "object_id", "-timestamp"], name="actionlog_target_idx"),
+            models.Index(fields=["user", "-timestamp"], name="actionlog_user_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.user} {self.action} {self.content_type} {self.object_id} at {self.timestamp}"
 
@@ -239,6 +232,10 @@ class PermissionAudit(models.Model):
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["-timestamp", "-id"], name="permaudit_timestamp_idx"),
+            models.Index(fields=["target_content_type", "target_object_id"], name="permaudit_target_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.action} by {self.actor} at {self.timestamp}"
@@ -0,0 +1,137 @@
+# backend/users/permission_cache.py
+# Purpose: Django cache backend store of effective-permission sets.
+# Entries are keyed by user plus two version counters:
+#   - a global version, bumped when group permissions or Permission rows change
+#   - a per-user version, bumped when the user's groups or direct permissions change
+# Bumping a counter makes every dependent entry unreachable, so there is no need to
+# find and delete individual keys. Superusers share one "all permissions" entry.
+# Lookups can be counted per request (see PermissionMiddleware) for profiling.
+#
+# Version bumps only reach the workers sharing the cache, so long-lived entries
+# need a shared backend (CACHES in settings, e.g. Redis). With a per-process
+# LocMemCache a revocation made in one worker is not seen by the others, so
+# entries there expire after LOCAL_CACHE_TIMEOUT seconds instead.
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Set
+import logging
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger("permissions")
+
+GLOBAL_VERSION_KEY = "users:perm_version"
+USER_VERSION_KEY = "users:perm_version:{user_id}"
+USER_PERMS_KEY = "users:perms:{user_id}:{global_version}:{user_version}"
+SUPERUSER_PERMS_KEY = "users:perms:superuser:{global_version}"
+
+# Entries are invalidated by version bumps; the timeout only bounds stale memory.
+CACHE_TIMEOUT = 60 * 60 * 24
+# Bound on how long a change made in another process can go unseen (per-process caches)
+LOCAL_CACHE_TIMEOUT = 5
+VERSION_TIMEOUT = None  # counters must outlive the entries they guard
+
+# Per-request lookup statistics: {"lookups", "instance", "cache", "db"}
+_lookup_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("permission_lookup_stats", default=None)
+
+
+def _fresh_version() -> int:
+    # Counters start from the clock, not 1: if a counter is evicted, the new one
+    # cannot collide with versions whose entries may still be cached.
+    return time.time_ns() // 1000
+
+
+def entry_timeout() -> int:
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return LOCAL_CACHE_TIMEOUT
+    return CACHE_TIMEOUT
+
+
+def _bump(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing counter: start a new one; a concurrent add() winning is fine too.
+        cache.add(key, _fresh_version(), VERSION_TIMEOUT)
+    except Exception:
+        logger.exception("Failed to bump permission cache version %s", key)
+
+
+def _version(versions: dict, key: str) -> int:
+    if key in versions:
+        return versions[key]
+    cache.add(key, _fresh_version(), VERSION_TIMEOUT)
+    return cache.get(key)
+
+
+def bump_global_version() -> None:
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def bump_user_version(user_id: Optional[int]) -> None:
+    if user_id:
+        _bump(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def start_lookup_stats():
+    """
+    Start counting permission lookups in the current context.
+    Returns (stats, token); pass the token to stop_lookup_stats().
+    """
+    stats = {"lookups": 0, "instance": 0, "cache": 0, "db": 0}
+    return stats, _lookup_stats.set(stats)
+
+
+def stop_lookup_stats(token) -> None:
+    _lookup_stats.reset(token)
+
+
+def record_lookup(source: str) -> None:
+    """
+    Count one permission lookup served from `source` ("instance", "cache" or "db").
+    No-op outside a counted context.
+    """
+    stats = _lookup_stats.get()
+    if stats is not None:
+        stats["lookups"] += 1
+        stats[source] = stats.get(source, 0) + 1
+
+
+def _cache_key(user) -> str:
+    user_key = USER_VERSION_KEY.format(user_id=user.pk)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    global_version = _version(versions, GLOBAL_VERSION_KEY)
+    if getattr(user, "is_superuser", False):
+        return SUPERUSER_PERMS_KEY.format(global_version=global_version)
+    return USER_PERMS_KEY.format(
+        user_id=user.pk, global_version=global_version, user_version=_version(versions, user_key)
+    )
+
+
+def get_or_compute(user, compute: Callable[[object], Set[str]]) -> Set[str]:
+    """
+    Return the cached permission set for `user`, computing and storing it on a miss.
+    Cache errors degrade to computing from the database.
+    """
+    try:
+        key = _cache_key(user)
+        perms = cache.get(key)
+    except Exception:
+        logger.exception("Permission cache unavailable; computing for user=%s", getattr(user, "pk", None))
+        record_lookup("db")
+        return compute(user)
+
+    if perms is not None:
+        record_lookup("cache")
+        return set(perms)
+
+    record_lookup("db")
+    perms = compute(user)
+    try:
+        cache.set(key, frozenset(perms), entry_timeout())
+    except Exception:
+        logger.exception("Failed to store permissions in cache for user=%s", getattr(user, "pk", None))
+    return perms
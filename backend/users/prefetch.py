@@ -0,0 +1,60 @@
+# backend/users/prefetch.py
+# Purpose: bulk resolution of GenericForeignKey targets (e.g. UserActionLog.target_object).
+# Rows are grouped by content type and each target model is loaded with one query,
+# with its forward foreign keys joined so __str__ does not trigger further lookups.
+# The targets are stored in the GFK cache, so `row.target_object` no longer queries.
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+
+logger = logging.getLogger(__name__)
+
+
+def _forward_relations(model) -> List[str]:
+    return [
+        f.name for f in model._meta.concrete_fields
+        if f.is_relation and (f.many_to_one or f.one_to_one)
+    ]
+
+
+def prefetch_generic_targets(rows: Iterable, gfk_name: str = "target_object") -> List:
+    """
+    Resolve the GenericForeignKey `gfk_name` of every row, one query per target model.
+    Missing targets (deleted objects, unknown models) are cached as None.
+    Returns the rows as a list.
+    """
+    rows = list(rows)
+    if not rows:
+        return rows
+
+    gfk = rows[0]._meta.get_field(gfk_name)
+    ct_attname = rows[0]._meta.get_field(gfk.ct_field).attname
+
+    ids_by_ct: Dict[int, Set] = defaultdict(set)
+    for row in rows:
+        ct_id = getattr(row, ct_attname)
+        if ct_id is not None:
+            ids_by_ct[ct_id].add(getattr(row, gfk.fk_field))
+
+    targets: Dict[tuple, object] = {}
+    for ct_id, ids in ids_by_ct.items():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None:
+            continue
+        try:
+            objects = model._base_manager.select_related(*_forward_relations(model)).in_bulk(ids)
+        except Exception:
+            logger.exception("Failed to prefetch %s targets", model._meta.label)
+            continue
+        for pk, obj in objects.items():
+            targets[(ct_id, str(pk))] = obj
+
+    for row in rows:
+        ct_id = getattr(row, ct_attname)
+        pk = getattr(row, gfk.fk_field)
+        gfk.set_cached_value(row, targets.get((ct_id, str(pk))))
+    return rows
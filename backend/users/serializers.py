@@ -3,6 +3,9 @@ from rest_framework import serializers
 from .models import User, UserActionLog, Role, Departement, Site
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.models import Group, Permission
+from django.db import models
+
+from .prefetch import prefetch_generic_targets
 
 User = get_user_model()
 
@@ -343,8 +346,19 @@ class UserMiniSerializer(serializers.ModelSerializer):
         fields = ['username', 'email', 'first_name', 'last_name']
 
 
+class UserActionLogListSerializer(serializers.ListSerializer):
+    """Resolves the targets of a whole page at once (one query per target model)."""
+
+    def to_representation(self, data):
+        rows = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return super().to_representation(prefetch_generic_targets(rows))
+
+
 class UserActionLogSerializer(serializers.ModelSerializer):
-    """Serializer for audit logs of user actions."""
+    """
+    Serializer for audit logs of user actions.
+    Use with prepare_queryset() so a page costs a constant number of queries.
+    """
     user_info = serializers.SerializerMethodField(read_only=True)
     target = serializers.SerializerMethodField(read_only=True)
 
@@ -354,6 +368,11 @@ class UserActionLogSerializer(serializers.ModelSerializer):
             'id', 'user', 'user_info', 'action', 'content_type', 'object_id',
             'target', 'timestamp', 'extra_info'
         ]
+        list_serializer_class = UserActionLogListSerializer
+
+    @staticmethod
+    def prepare_queryset(queryset):
+        return queryset.select_related('user__role', 'content_type')
 
     def get_user_info(self, obj):
         user = getattr(obj, 'user', None)
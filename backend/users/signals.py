@@ -7,91 +7,27 @@ import json
 import logging
 from typing import Optional
 
-from django.db.models.signals import m2m_changed, post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import Group, Permission
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import get_user_model
 from django.db import connections
 from django.db.utils import OperationalError, ProgrammingError
  
-# PermissionAudit is optional (migration may not have been applied). Import alongside UserActionLog for safe fallback.
-from .models import PermissionAudit, UserActionLog
+from . import audit, permission_cache
  
 logger = logging.getLogger("permissions")
 User = get_user_model()
  
  
 def _create_audit(actor: Optional[User], action: str, target_obj=None, details: Optional[dict] = None):
-    """Robust helper to create PermissionAudit rows; uses transaction.on_commit when possible and falls back to UserActionLog.
-    Defensive: if the DB connection is in an aborted transaction, we skip DB writes to avoid 'current transaction is aborted' errors.
+    """Record a PermissionAudit row (falls back to UserActionLog) through the buffered audit writer.
+    Inside a transaction the entry is written on commit, batched with the others (see users.audit).
     This function is best-effort and will never raise; exceptions are logged.
     """
     try:
-        # Avoid attempting DB writes if connection is in an aborted transaction
-        try:
-            from django.db import connection as _connection
-            if getattr(_connection, "needs_rollback", False):
-                logger.warning(
-                    "Database connection in aborted transaction; skipping audit write for action=%s target=%s",
-                    action,
-                    repr(target_obj),
-                )
-                return
-        except Exception:
-            # If we cannot inspect connection state, continue but guard DB writes below.
-            pass
-
-        ct = None
-        obj_id = None
-        if target_obj is not None:
-            try:
-                ct = ContentType.objects.get_for_model(target_obj)
-                obj_id = getattr(target_obj, "pk", None) or getattr(target_obj, "id", None)
-            except Exception:
-                ct = None
-                obj_id = None
-
-        from django.db import transaction
-
-        def _do_write():
-            """Attempt to write PermissionAudit, fall back to UserActionLog on failure."""
-            try:
-                # Try PermissionAudit first
-                PermissionAudit.objects.create(
-                    actor=actor if getattr(actor, "is_authenticated", False) else None,
-                    target_content_type=ct,
-                    target_object_id=obj_id,
-                    action=action,
-                    details=details or {},
-                )
-                return
-            except Exception as e:
-                logger.debug("PermissionAudit write failed (%s); attempting fallback to UserActionLog", e)
-            try:
-                UserActionLog.objects.create(
-                    user=actor if getattr(actor, "is_authenticated", False) else None,
-                    action=action,
-                    content_type=ct,
-                    object_id=obj_id or 0,
-                    extra_info=details or {},
-                )
-            except Exception:
-                logger.exception("Failed to write fallback UserActionLog for action=%s target=%s", action, repr(target_obj))
-
-        # If inside an atomic block, schedule the write after commit to avoid interfering with the current transaction.
-        try:
-            if transaction.get_connection().in_atomic_block:
-                transaction.on_commit(_do_write)
-            else:
-                # Not in transaction: perform immediately but guard with try/except inside _do_write
-                _do_write()
-        except Exception:
-            # As a safeguard, attempt immediate write (already guarded) and finally ensure no exception escapes.
-            try:
-                _do_write()
-            except Exception:
-                logger.exception("Unexpected failure while attempting audit write for action=%s target=%s", action, repr(target_obj))
+        audit.log_permission_audit(actor, action, target=target_obj, details=details)
     except Exception:
         logger.exception("Unexpected error in _create_audit for action=%s target=%s", action, repr(target_obj))
 
@@ -166,4 +102,57 @@ def permission_post_save(sender, instance, created, **kwargs):
         perm_str = f"{instance.content_type.app_label}.{instance.codename}"
     except Exception:
         perm_str = getattr(instance, "codename", None)
-    _create_audit(None, action, target_obj=instance, details={"permission": perm_str, "permission_id": instance.pk})
\ No newline at end of file
+    _create_audit(None, action, target_obj=instance, details={"permission": perm_str, "permission_id": instance.pk})
+
+
+# ---------------------------------------------------------------------------
+# Permission cache invalidation (see permission_cache.py)
+# Counters are bumped right away (so the current transaction never reads a stale
+# entry) and again on commit (so a concurrent request that cached the old rows
+# in between is discarded too).
+# ---------------------------------------------------------------------------
+def _bump_users(user_ids) -> None:
+    user_ids = [uid for uid in (user_ids or []) if uid]
+
+    def bump():
+        for uid in user_ids:
+            permission_cache.bump_user_version(uid)
+
+    if user_ids:
+        bump()
+        transaction.on_commit(bump)
+
+
+def _bump_global() -> None:
+    permission_cache.bump_global_version()
+    transaction.on_commit(permission_cache.bump_global_version)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permission_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        # The set resolved on this instance is stale too
+        instance._effective_permissions_cache = None
+        _bump_users([instance.pk])
+    elif pk_set:
+        # group.user_set.add(...) / permission.user_set.add(...)
+        _bump_users(pk_set)
+    else:
+        # Reverse clear: the affected users are no longer known
+        _bump_global()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permission_cache(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        _bump_global()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permission_cache(sender, **kwargs):
+    _bump_global()
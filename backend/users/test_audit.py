@@ -0,0 +1,60 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from . import audit
+from .middleware import PermissionMiddleware
+from .models import Departement, PermissionAudit, Role, User, UserActionLog
+
+
+class BufferedAuditTest(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name="auditor", role_color="blue")
+        dep = Departement.objects.create(dep_name="audit", dep_color="#000")
+        self.user = User.objects.create_user(username="auditor", password="pass", role=role, departement=dep)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group = Group.objects.create(name="Audited")
+        PermissionAudit.objects.all().delete()
+
+    def test_transaction_entries_join_the_request_batch_on_commit(self):
+        token = audit.begin_request()
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(5):
+                audit.log_action(self.user, "update", model=self.group, extra_info={"i": i})
+        for callback in callbacks:
+            callback()
+        self.assertFalse(UserActionLog.objects.exists())
+
+        with self.assertNumQueries(3):  # savepoint, INSERT, release
+            audit.end_request(token)
+        self.assertEqual(UserActionLog.objects.filter(object_id=self.group.pk).count(), 5)
+
+    def test_rolled_back_savepoint_drops_only_its_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            audit.log_action(self.user, "kept", model=self.group)
+            try:
+                with transaction.atomic():
+                    audit.log_action(self.user, "dropped", model=self.group)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            audit.log_action(self.user, "kept", model=self.group)
+
+        self.assertEqual(list(UserActionLog.objects.values_list("action", flat=True)), ["kept", "kept"])
+
+    def test_request_entries_are_flushed_with_the_response(self):
+        request = RequestFactory().get("/api/users/")
+        request.user = self.user
+        middleware = PermissionMiddleware(lambda r: HttpResponse())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            middleware.process_request(request)
+            request.log_permission_check(self.user, "users.view_user", True, obj=self.group)
+            audit.log_action(self.user, "view", model=self.group)
+        self.assertFalse(PermissionAudit.objects.exists())
+
+        middleware.process_response(request, HttpResponse())
+        entry = PermissionAudit.objects.get()
+        self.assertEqual((entry.action, entry.target_object_id), ("granted", self.group.pk))
+        self.assertEqual(UserActionLog.objects.get().action, "view")
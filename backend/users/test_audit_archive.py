@@ -0,0 +1,67 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import InMemoryStorage
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .audit_archive import archive_audit_logs
+from .models import Departement, Role, User, UserActionLog
+
+
+class AuditArchiveTest(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name="archivist", role_color="blue")
+        dep = Departement.objects.create(dep_name="records", dep_color="#000")
+        self.user = User.objects.create_user(username="archivist", password="pass", role=role, departement=dep)
+        self.ct = ContentType.objects.get_for_model(User)
+        self.storage = InMemoryStorage()
+
+    def _log(self, action, age_days):
+        log = UserActionLog.objects.create(user=self.user, action=action, content_type=self.ct, object_id=self.user.pk)
+        UserActionLog.objects.filter(pk=log.pk).update(timestamp=timezone.now() - timedelta(days=age_days))
+        return log
+
+    def test_old_months_are_archived_and_deleted(self):
+        old = [self._log("old", 800), self._log("old", 800)]
+        recent = self._log("recent", 1)
+
+        results = archive_audit_logs(retention_days=365, storage=self.storage)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual((results[0]["rows"], results[0]["deleted"]), (2, 2))
+        self.assertEqual(list(UserActionLog.objects.values_list("id", flat=True)), [recent.id])
+        with self.storage.open(results[0]["key"]) as f:
+            rows = [json.loads(line) for line in gzip.decompress(f.read()).splitlines()]
+        self.assertEqual([r["id"] for r in rows], [log.id for log in old])
+        self.assertEqual(rows[0]["user__username"], "archivist")
+
+    def test_dry_run_keeps_rows(self):
+        self._log("old", 800)
+        results = archive_audit_logs(retention_days=365, dry_run=True, storage=self.storage)
+        self.assertEqual(results[0]["rows"], 1)
+        self.assertEqual(UserActionLog.objects.count(), 1)
+
+
+class ActionLogPaginationTest(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name="viewer", role_color="blue")
+        dep = Departement.objects.create(dep_name="view", dep_color="#000")
+        self.user = User.objects.create_user(username="viewer", password="pass", role=role, departement=dep)
+        ct = ContentType.objects.get_for_model(User)
+        for i in range(5):
+            UserActionLog.objects.create(user=self.user, action=f"a{i}", content_type=ct, object_id=i)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_cursor_pages_cover_the_log_newest_first(self):
+        url = "/api/users/logs/?page_size=2"
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(row["action"] for row in data["results"])
+            url = data["next"]
+        self.assertEqual(seen, ["a4", "a3", "a2", "a1", "a0"])
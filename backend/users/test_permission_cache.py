@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import permission_cache
+from . import utils as perm_utils
+from .middleware import PermissionMiddleware
+from .models import Departement, Role
+
+User = get_user_model()
+
+
+class PermissionCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        role = Role.objects.create(role_name="tester", role_color="blue")
+        dep = Departement.objects.create(dep_name="eng", dep_color="#000")
+        self.user = User.objects.create_user(username="cached", password="pass", role=role, departement=dep)
+        self.group = Group.objects.create(name="Readers")
+        self.perm = Permission.objects.get(codename="view_document")
+
+    def _perms(self):
+        # Fresh instance each time: no per-instance cache involved
+        return perm_utils.get_effective_permissions(User.objects.get(pk=self.user.pk))
+
+    def test_second_lookup_hits_no_database(self):
+        perm_utils.get_effective_permissions(self.user)
+        with self.assertNumQueries(0):
+            perm_utils.get_effective_permissions(self.user)
+
+    def test_group_permission_change_invalidates(self):
+        self.user.groups.add(self.group)
+        self.assertNotIn("documents.view_document", self._perms())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(self.perm)
+        self.assertIn("documents.view_document", self._perms())
+
+    def test_membership_change_invalidates(self):
+        self.group.permissions.add(self.perm)
+        self.assertEqual(self._perms(), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.add(self.user)
+        self.assertIn("documents.view_document", self._perms())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertEqual(self._perms(), set())
+
+    def test_direct_permission_change_invalidates(self):
+        self.assertEqual(self._perms(), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(self.perm)
+        self.assertEqual(self._perms(), {"documents.view_document"})
+
+    def test_process_local_cache_keeps_entries_briefly(self):
+        self.assertEqual(permission_cache.entry_timeout(), permission_cache.LOCAL_CACHE_TIMEOUT)
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "perm_cache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(permission_cache.entry_timeout(), permission_cache.CACHE_TIMEOUT)
+
+
+class LazyRequestPermissionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        role = Role.objects.create(role_name="tester", role_color="blue")
+        dep = Departement.objects.create(dep_name="eng", dep_color="#000")
+        self.user = User.objects.create_user(username="lazy", password="pass", role=role, departement=dep)
+        self.user.user_permissions.add(Permission.objects.get(codename="view_document"))
+        self.middleware = PermissionMiddleware(lambda request: HttpResponse())
+
+    def _request(self):
+        request = RequestFactory().get("/api/dashboard/")
+        request.user = User.objects.get(pk=self.user.pk)
+        return request
+
+    def test_unused_permissions_are_never_resolved(self):
+        request = self._request()
+        with self.assertNumQueries(0):
+            self.middleware.process_request(request)
+            self.middleware.process_response(request, HttpResponse())
+        self.assertIsNone(request.user._effective_permissions_cache)
+        self.assertEqual(request.permission_lookups["lookups"], 0)
+
+    def test_resolved_once_and_shared_with_user(self):
+        request = self._request()
+        self.middleware.process_request(request)
+        self.assertIn("documents.view_document", request.user_permissions)
+        self.assertTrue(request.user.has_any_permission(["documents.view_document"]))
+        self.assertTrue(perm_utils.has_all_permissions(request.user, ["documents.view_document"]))
+        self.middleware.process_response(request, HttpResponse())
+
+        self.assertEqual(request.permission_lookups["lookups"], 3)
+        self.assertEqual(request.permission_lookups["instance"], 2)
@@ -0,0 +1,55 @@
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Departement, Role, User, UserActionLog
+
+
+class ActionLogTargetsTest(TestCase):
+    def setUp(self):
+        self.role = Role.objects.create(role_name="auditor", role_color="blue")
+        self.dep = Departement.objects.create(dep_name="audit", dep_color="#000")
+        self.viewer = User.objects.create_user(username="viewer", password="pass", role=self.role, departement=self.dep)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.viewer)
+
+    def _add_logs(self, n):
+        user_ct = ContentType.objects.get_for_model(User)
+        group_ct = ContentType.objects.get_for_model(Group)
+        for i in range(n):
+            target = User.objects.create_user(
+                username=f"target{UserActionLog.objects.count()}", password="pass", role=self.role, departement=self.dep
+            )
+            group = Group.objects.create(name=f"group{UserActionLog.objects.count()}")
+            UserActionLog.objects.create(user=self.viewer, action="update", content_type=user_ct, object_id=target.pk)
+            UserActionLog.objects.create(user=target, action="update", content_type=group_ct, object_id=group.pk)
+            # Target deleted since
+            UserActionLog.objects.create(user=self.viewer, action="delete", content_type=group_ct, object_id=10**6 + i)
+
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/users/logs/")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json(), len(ctx)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self._add_logs(1)
+        rows, small = self._list_queries()
+        self._add_logs(5)
+        rows, large = self._list_queries()
+
+        self.assertEqual(len(rows), 18)
+        self.assertEqual(small, large)
+
+    def test_targets_are_resolved(self):
+        self._add_logs(1)
+        rows, _ = self._list_queries()
+        by_action = {(r["action"], r["target"]["model"]): r for r in rows}
+
+        user_row = by_action[("update", "user")]
+        self.assertEqual(user_row["target"]["repr"], "target0 - auditor")
+        self.assertEqual(user_row["user_info"]["role"], "auditor")
+        self.assertEqual(by_action[("delete", "group")]["target"]["repr"], None)
@@ -10,6 +10,8 @@ import logging
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission, Group
 
+from . import permission_cache
+
 User = get_user_model()
 logger = logging.getLogger("permissions")
 
@@ -17,9 +19,30 @@ logger = logging.getLogger("permissions")
 def get_effective_permissions(user: User) -> Set[str]:
     """
     Return a set of permission strings in the form "app_label.codename" for the given user.
-    Aggregates direct user permissions and group permissions efficiently (avoids N+1).
+    Reuses the set already resolved on the instance (User._effective_permissions_cache,
+    also what request.user_permissions resolves to); otherwise served from the shared
+    permission cache (see permission_cache) and computed on a miss.
     Defensive: returns empty set for anonymous or unsaved users.
     """
+    if user is None or not getattr(user, "pk", None):
+        return set()
+    cached = getattr(user, "_effective_permissions_cache", None)
+    if cached is not None:
+        permission_cache.record_lookup("instance")
+        return cached
+    perms = permission_cache.get_or_compute(user, compute_effective_permissions)
+    try:
+        user._effective_permissions_cache = perms
+    except AttributeError:
+        pass
+    return perms
+
+
+def compute_effective_permissions(user: User) -> Set[str]:
+    """
+    Compute the permission set from the database (no cache).
+    Aggregates direct user permissions and group permissions efficiently (avoids N+1).
+    """
     if user is None or not getattr(user, "pk", None):
         return set()
 
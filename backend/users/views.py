@@ -9,14 +9,17 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Permission, Group
 
 from django.core.mail import send_mail
 from django.conf import settings
 
+from common.pagination import KeysetCursorPagination
+from common.typeahead import DEFAULT_LIMIT, typeahead
+
+from . import audit
 # ✅ Added Site model import
-from .models import User, Role, Departement, UserActionLog, Site 
+from .models import USER_MATCH_FIELDS, User, Role, Departement, UserActionLog, Site 
 from .serializers import (
     UserSerializer, 
     UserActionLogSerializer, 
@@ -169,10 +172,10 @@ class UserViewSet(viewsets.ModelViewSet):
         user = serializer.save()
 
         send_password_email(user.first_name, user.last_name, user.email, user.username, request.data["password"])
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="create",
-            content_type=ContentType.objects.get_for_model(user),
+            model=user,
             object_id=user.id,
             extra_info={"username": user.username},
         )
@@ -187,10 +190,10 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
 
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="update",
-            content_type=ContentType.objects.get_for_model(user),
+            model=user,
             object_id=user.id,
             extra_info={"username": user.username},
         )
@@ -201,10 +204,10 @@ class UserViewSet(viewsets.ModelViewSet):
         user_id = instance.id
         username = instance.username
         self.perform_destroy(instance)
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="delete",
-            content_type=ContentType.objects.get_for_model(User),
+            model=User,
             object_id=user_id,
             extra_info={"username": username},
         )
@@ -259,10 +262,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
         user.groups.add(grp)
         user._effective_permissions_cache = None  # clear any cached perms on user instance
-        UserActionLog.objects.create(
+        audit.log_action(
             user=request.user if request.user.is_authenticated else None,
             action="assign_group",
-            content_type=ContentType.objects.get_for_model(grp),
+            model=grp,
             object_id=grp.id,
             extra_info={"assigned_to": user.username},
         )
@@ -280,10 +283,10 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"error": "Group not found"}, status=status.HTTP_404_NOT_FOUND)
         user.groups.remove(grp)
         user._effective_permissions_cache = None
-        UserActionLog.objects.create(
+        audit.log_action(
             user=request.user if request.user.is_authenticated else None,
             action="remove_group",
-            content_type=ContentType.objects.get_for_model(grp),
+            model=grp,
             object_id=grp.id,
             extra_info={"removed_from": user.username},
         )
@@ -303,10 +306,10 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"error": "No valid groups found"}, status=status.HTTP_400_BAD_REQUEST)
         user.groups.set(groups)
         user._effective_permissions_cache = None
-        UserActionLog.objects.create(
+        audit.log_action(
             user=request.user if request.user.is_authenticated else None,
             action="bulk_assign_groups",
-            content_type=ContentType.objects.get_for_model(Group),
+            model=Group,
             object_id=0,
             extra_info={"assigned_to": user.username, "group_ids": [g.id for g in groups]},
         )
@@ -383,18 +386,40 @@ class UserViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK,
         )
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def typeahead(self, request):
+        """
+        GET /api/users/typeahead/?q=<text>[&limit=10] -> best matching active users
+        by username or full name (prefix first, then fuzzy). For user pickers.
+        """
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        rows = typeahead(
+            User.objects.filter(is_active=True), USER_MATCH_FIELDS, request.query_params.get("q"), limit
+        ).values("id", "username", "first_name", "last_name", "score")
+        return Response({"results": list(rows)}, status=status.HTTP_200_OK)
+
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["username", "email", "first_name", "last_name"]
     #  GET /users/?username=John
     #  GET /users/?email=John@exemple.com
 
+class ActionLogCursorPagination(KeysetCursorPagination):
+    """Keyset pagination on (timestamp, id); served by the actionlog_timestamp_idx index."""
+    cursor_field = "timestamp"
+
+
 class UserViewActionLogSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing UserActionLog entries.
     Read-only access to UserActionLog model.
+    Pass ?page_size= (then ?cursor=) to page through the log instead of listing it whole.
     """
-    queryset = UserActionLog.objects.all().order_by('-timestamp')
+    queryset = UserActionLogSerializer.prepare_queryset(UserActionLog.objects.all()).order_by('-timestamp', '-id')
     serializer_class = UserActionLogSerializer
+    pagination_class = ActionLogCursorPagination
 
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["user__username", "action", "content_type__model"]
@@ -410,10 +435,10 @@ class RoleViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         role = serializer.save()
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="create",
-            content_type=ContentType.objects.get_for_model(role),
+            model=role,
             object_id=role.id,
             extra_info={"role_name": role.role_name}
         )
@@ -426,10 +451,10 @@ class RoleViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         role = serializer.save()
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="update",
-            content_type=ContentType.objects.get_for_model(role),
+            model=role,
             object_id=role.id,
             extra_info={"role_name": role.role_name}
         )
@@ -440,10 +465,10 @@ class RoleViewSet(viewsets.ModelViewSet):
         role_id = instance.id
         role_name = instance.role_name
         self.perform_destroy(instance)
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="delete",
-            content_type=ContentType.objects.get_for_model(Role),
+            model=Role,
             object_id=role_id,
             extra_info={"role_name": role_name}
         )
@@ -479,10 +504,10 @@ class DepartementViewSet(viewsets.ModelViewSet):
         # Log Site Info
         site_name = dep.site.name if dep.site else "None"
         
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="create",
-            content_type=ContentType.objects.get_for_model(dep),
+            model=dep,
             object_id=dep.id,
             extra_info={"dep_name": dep.dep_name, "site": site_name}
         )
@@ -499,10 +524,10 @@ class DepartementViewSet(viewsets.ModelViewSet):
         # Log Site Info
         site_name = dep.site.name if dep.site else "None"
 
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="update",
-            content_type=ContentType.objects.get_for_model(dep),
+            model=dep,
             object_id=dep.id,
             extra_info={"dep_name": dep.dep_name, "site": site_name}
         )
@@ -516,10 +541,10 @@ class DepartementViewSet(viewsets.ModelViewSet):
         site_name = instance.site.name if instance.site else "None"
         
         self.perform_destroy(instance)
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user if self.request.user.is_authenticated else None,
             action="delete",
-            content_type=ContentType.objects.get_for_model(Departement),
+            model=Departement,
             object_id=dep_id,
             extra_info={"dep_name": dep_name, "site": site_name}
         )
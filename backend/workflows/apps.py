@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WorkflowsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "workflows"
+
+    def ready(self):
+        # Incremental statistics counters
+        from . import signals  # noqa: F401
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflows.outbox import MAX_ATTEMPTS, deliver_pending, recover_stale
+
+
+class Command(BaseCommand):
+    help = (
+        "Delivers pending workflow email notifications (including due retries) and recovers "
+        "notifications left 'sending' by a crashed worker. "
+        "Run it from cron, or with --interval as a long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f"Give up on a notification after this many attempts (default {MAX_ATTEMPTS}).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat every N seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            recovered = recover_stale()
+            sent = deliver_pending(max_attempts=options["max_attempts"], schedule_retries=False)
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} notifications ({recovered} recovered)."))
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
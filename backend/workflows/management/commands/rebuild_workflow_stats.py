@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from workflows.stats import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the incremental workflow statistics counters from the tables. "
+        "Run it when enabling WORKFLOW_STATS_COUNTERS or after bulk changes made outside the ORM."
+    )
+
+    def handle(self, *args, **options):
+        counters = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(counters)} workflow counters ({counters['total']} workflows)."
+        ))
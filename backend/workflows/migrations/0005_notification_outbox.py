@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflows', '0004_electronicsignature_workflownotification_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflownotification',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workflownotification',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workflownotification',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='workflownotification',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='workflownotification',
+            name='email_status',
+            field=models.CharField(default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='workflownotification',
+            index=models.Index(fields=['email_status', 'next_attempt_at'], name='notification_outbox_idx'),
+        ),
+    ]
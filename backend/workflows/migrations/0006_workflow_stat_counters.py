@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflows', '0005_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowStatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -143,7 +143,16 @@ class ElectronicSignature(models.Model):
         return f"{self.signed_by.username} - {self.stage} - {self.signed_at}"
 
 class WorkflowNotification(models.Model):
-    """Track email notifications sent during workflow"""
+    """
+    Track email notifications sent during workflow.
+    Also the outbox: rows are created 'pending' and delivered after commit
+    (see workflows/outbox.py).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name='notifications')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE)
     notification_type = models.CharField(max_length=50)  # 'review_ready', 'approval_ready', etc.
@@ -151,7 +160,27 @@ class WorkflowNotification(models.Model):
     message = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True)
-    email_status = models.CharField(max_length=20, default='sent')  # sent, failed, bounced
+    email_status = models.CharField(max_length=20, default=STATUS_PENDING)  # pending, sending, sent, failed, bounced
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
     
     class Meta:
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['email_status', 'next_attempt_at'], name='notification_outbox_idx'),
+        ]
+
+
+class WorkflowStatCounter(models.Model):
+    """
+    Incrementally maintained workflow statistics (see workflows/stats.py).
+    One row per counter: 'total', 'status:<status>', 'signatures',
+    'completion_count', 'completion_seconds'.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
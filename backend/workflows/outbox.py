@@ -0,0 +1,290 @@
+"""
+Transactional outbox for workflow email notifications.
+
+Workflow transitions only insert WorkflowNotification rows in the 'pending'
+state; nothing talks to the mail server while their transaction is open.
+After commit a small background pool delivers the due rows, one SMTP
+connection per batch, and failed sends are retried with exponential backoff
+until MAX_ATTEMPTS. `manage.py process_notifications` delivers whatever is
+left (e.g. after a restart) and recovers rows stuck in 'sending'.
+
+Coalescing: with NOTIFICATION_DIGEST_WINDOW (seconds) set, a notification
+waits until the end of its recipient's current window, and all of that
+recipient's notifications due together go out as one digest email. The
+per-event rows are kept (and marked sent) for the notifications API.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from common.background import DrainPool
+
+from .models import WorkflowNotification
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+STALE_AFTER = timedelta(minutes=15)
+
+DIGEST_GREETING = "Hello "
+DIGEST_SIGNATURE = "Best regards,"
+
+_pool = DrainPool(lambda: deliver_pending(), "NOTIFICATION_WORKERS", "notification-outbox")
+_timer_lock = threading.Lock()
+_timer = None
+_timer_at = None
+
+
+def wake():
+    """
+    Schedule a background drain; wake-ups arriving before it starts are coalesced.
+    """
+    _pool.wake()
+
+
+def _schedule_wake(at):
+    """
+    Wake the pool at `at`; keeps a single timer, moved earlier when needed.
+    """
+    global _timer, _timer_at
+    with _timer_lock:
+        if _timer is not None and _timer.is_alive() and _timer_at <= at:
+            return
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(max((at - timezone.now()).total_seconds(), 0), wake)
+        _timer.daemon = True
+        _timer_at = at
+        _timer.start()
+
+
+def digest_window():
+    return timedelta(seconds=getattr(settings, "NOTIFICATION_DIGEST_WINDOW", 0))
+
+
+def _send_at(recipient):
+    """
+    End of the recipient's open digest window, or of a new one starting now.
+    None when coalescing is disabled (send right after commit).
+    """
+    window = digest_window()
+    if not window:
+        return None
+    now = timezone.now()
+    open_window = WorkflowNotification.objects.filter(
+        recipient=recipient,
+        email_status=WorkflowNotification.STATUS_PENDING,
+        attempts=0,
+        next_attempt_at__gt=now,
+    ).aggregate(at=Min("next_attempt_at"))["at"]
+    return open_window or now + window
+
+
+def queue_notification(workflow, recipient, notification_type, subject, message):
+    """
+    Record a pending notification; it is emailed after the current transaction commits,
+    or at the end of the recipient's digest window when coalescing is enabled.
+    Returns the WorkflowNotification, or None when the recipient has no email.
+    """
+    if not recipient or not recipient.email:
+        logger.warning(f"Cannot send notification: recipient {recipient} has no email")
+        return None
+
+    send_at = _send_at(recipient)
+    notification = WorkflowNotification.objects.create(
+        workflow=workflow,
+        recipient=recipient,
+        notification_type=notification_type,
+        subject=subject,
+        message=message,
+        email_status=WorkflowNotification.STATUS_PENDING,
+        next_attempt_at=send_at,
+    )
+    if send_at is None:
+        transaction.on_commit(wake)
+    else:
+        transaction.on_commit(lambda: _schedule_wake(send_at))
+    return notification
+
+
+def backoff(attempts):
+    """
+    Delay before retry number `attempts` (1-based): BACKOFF_BASE doubled each time, capped.
+    """
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def _due():
+    return WorkflowNotification.objects.filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+        email_status=WorkflowNotification.STATUS_PENDING,
+    )
+
+
+def _claim(ids):
+    """
+    pending -> sending for the still-pending rows of `ids`, in one locked SELECT
+    and one UPDATE; rows another worker holds or claimed first are skipped.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            WorkflowNotification.objects.filter(pk__in=ids, email_status=WorkflowNotification.STATUS_PENDING)
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("recipient")
+            .order_by("id")
+        )
+        WorkflowNotification.objects.filter(pk__in=[n.pk for n in batch]).update(
+            email_status=WorkflowNotification.STATUS_SENDING, next_attempt_at=now
+        )
+    for notification in batch:
+        notification.email_status = WorkflowNotification.STATUS_SENDING
+        notification.next_attempt_at = now
+    return batch
+
+
+def _mark_failed(notification, error, max_attempts):
+    attempts = notification.attempts + 1
+    if attempts >= max_attempts:
+        status, next_attempt_at = WorkflowNotification.STATUS_FAILED, None
+    else:
+        status, next_attempt_at = WorkflowNotification.STATUS_PENDING, timezone.now() + backoff(attempts)
+    WorkflowNotification.objects.filter(pk=notification.pk).update(
+        email_status=status, attempts=attempts, next_attempt_at=next_attempt_at, last_error=str(error)[:2000]
+    )
+    logger.error(f"Failed to send email to {notification.recipient.email}: {error}")
+
+
+def _mark_sent(notifications):
+    for notification in notifications:
+        WorkflowNotification.objects.filter(pk=notification.pk).update(
+            email_status=WorkflowNotification.STATUS_SENT,
+            attempts=notification.attempts + 1,
+            next_attempt_at=None,
+            delivered_at=timezone.now(),
+            last_error="",
+        )
+        logger.info(f"Notification sent to {notification.recipient.email} for workflow {notification.workflow_id}")
+
+
+def _fragment(message):
+    """
+    Body of a single notification (as built by _build_email_message) without
+    its greeting and signature.
+    """
+    lines = message.strip().splitlines()
+    if lines and lines[0].startswith(DIGEST_GREETING):
+        lines = lines[1:]
+    for i, line in enumerate(lines):
+        if line.strip() == DIGEST_SIGNATURE:
+            lines = lines[:i]
+            break
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def build_digest(recipient, notifications):
+    """
+    (subject, body) of one email covering several notifications.
+    """
+    name = recipient.get_full_name() or recipient.username
+    parts = [f"{DIGEST_GREETING}{name},", "", f"You have {len(notifications)} workflow notifications:", ""]
+    for i, notification in enumerate(notifications, 1):
+        parts += [f"{i}. {notification.subject}", _fragment(notification.message), ""]
+    parts += [DIGEST_SIGNATURE, "Document Management System"]
+    return f"{len(notifications)} workflow notifications", "\n".join(parts)
+
+
+def _send_batch(notifications, max_attempts):
+    """
+    Send a claimed batch over a single SMTP connection, one email per recipient
+    (a digest when a recipient has several notifications).
+    Returns the number of notifications delivered.
+    """
+    by_recipient = {}
+    for notification in notifications:
+        by_recipient.setdefault(notification.recipient_id, []).append(notification)
+
+    sent = 0
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+    except Exception as e:
+        for notification in notifications:
+            _mark_failed(notification, e, max_attempts)
+        return sent
+
+    try:
+        for group in by_recipient.values():
+            recipient = group[0].recipient
+            if len(group) == 1:
+                subject, body = group[0].subject, group[0].message
+            else:
+                subject, body = build_digest(recipient, group)
+            message = EmailMessage(
+                subject=subject,
+                body=body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient.email],
+                connection=mail_connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                for notification in group:
+                    _mark_failed(notification, e, max_attempts)
+                continue
+            _mark_sent(group)
+            sent += len(group)
+    finally:
+        try:
+            mail_connection.close()
+        except Exception:
+            logger.exception("Failed to close mail connection")
+    return sent
+
+
+def deliver_pending(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, schedule_retries=True):
+    """
+    Deliver every due pending notification. Returns the number sent.
+    With `schedule_retries`, the pool is woken in-process when the next pending
+    notification (a retry or the end of a digest window) becomes due.
+    """
+    sent = 0
+    while True:
+        # Recipients of the first `batch_size` due rows, with all of their due
+        # rows: a recipient is never split across batches (and emails)
+        recipients = _due().order_by("recipient_id", "id").values("recipient_id")[:batch_size]
+        ids = list(_due().filter(recipient_id__in=recipients).values_list("id", flat=True))
+        if not ids:
+            break
+        batch = _claim(ids)
+        if not batch:
+            continue
+        sent += _send_batch(batch, max_attempts)
+
+    if schedule_retries:
+        next_due = WorkflowNotification.objects.filter(
+            email_status=WorkflowNotification.STATUS_PENDING, next_attempt_at__isnull=False
+        ).aggregate(at=Min("next_attempt_at"))["at"]
+        if next_due is not None:
+            _schedule_wake(next_due)
+    return sent
+
+
+def recover_stale(stale_after=STALE_AFTER):
+    """
+    Put rows left in 'sending' by a crashed worker back in the queue.
+    """
+    return WorkflowNotification.objects.filter(
+        email_status=WorkflowNotification.STATUS_SENDING,
+        next_attempt_at__lt=timezone.now() - stale_after,
+    ).update(email_status=WorkflowNotification.STATUS_PENDING)
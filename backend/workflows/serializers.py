@@ -14,6 +14,10 @@ from documents.serializers import DocumentMiniSerializer
 
 User = get_user_model()
 
+# Render document/user pickers as plain id inputs instead of <select>s listing
+# whole tables; clients look ids up via /api/documents/typeahead/ and /api/users/typeahead/
+PICKER_STYLE = {"base_template": "input.html"}
+
 
 class WorkflowStageSerializer(serializers.ModelSerializer):
     """Serializer for workflow stages (Draft, Review, Approval, Publication)"""
@@ -65,8 +69,12 @@ class WorkflowNotificationSerializer(serializers.ModelSerializer):
             'sent_at',
             'read_at',
             'email_status',
+            'attempts',
+            'delivered_at',
         ]
-        read_only_fields = ['id', 'sent_at']
+        # Rows are written by the outbox only; a writable status would let
+        # clients queue arbitrary emails for delivery
+        read_only_fields = fields
 
 
 class WorkflowSerializer(serializers.ModelSerializer):
@@ -74,27 +82,32 @@ class WorkflowSerializer(serializers.ModelSerializer):
     
     # Write operations use PKs
     document = serializers.PrimaryKeyRelatedField(
-        queryset=Document.objects.all()
+        queryset=Document.objects.all(),
+        style=PICKER_STYLE
     )
     author = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         required=False,
-        allow_null=True
+        allow_null=True,
+        style=PICKER_STYLE
     )
     reviewer = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         required=False,
-        allow_null=True
+        allow_null=True,
+        style=PICKER_STYLE
     )
     approver = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         required=False,
-        allow_null=True
+        allow_null=True,
+        style=PICKER_STYLE
     )
     publisher = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         required=False,
-        allow_null=True
+        allow_null=True,
+        style=PICKER_STYLE
     )
     current_stage = serializers.PrimaryKeyRelatedField(
         queryset=WorkflowStage.objects.all(),
@@ -311,7 +324,8 @@ class TaskSerializer(serializers.ModelSerializer):
     
     # Write operations use PKs
     task_assigned_to = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
+        queryset=User.objects.all(),
+        style=PICKER_STYLE
     )
     task_workflow = serializers.PrimaryKeyRelatedField(
         queryset=Workflow.objects.all()
@@ -319,7 +333,8 @@ class TaskSerializer(serializers.ModelSerializer):
     completed_by = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         required=False,
-        allow_null=True
+        allow_null=True,
+        style=PICKER_STYLE
     )
     
     # Read-only computed fields
@@ -0,0 +1,74 @@
+"""
+Keep WorkflowStatCounter in step with workflow transitions (see stats.py).
+Counters are only maintained when WORKFLOW_STATS_COUNTERS is enabled; they
+are updated once the change commits, so rollbacks never reach them.
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import ElectronicSignature, Workflow
+from .stats import bump_after_commit, completion_seconds, counters_enabled
+
+
+def _snapshot(workflow):
+    # __dict__ lookups: never load deferred fields from a signal
+    fields = workflow.__dict__
+    if 'status' not in fields:
+        return None
+    if not all(name in fields for name in ('published_at', 'created_at')):
+        return fields['status'], None
+    return fields['status'], completion_seconds(workflow)
+
+
+def _counters(snapshot, sign):
+    status, seconds = snapshot
+    changes = {'total': sign, f'status:{status}': sign}
+    if seconds is not None:
+        changes['completion_count'] = sign
+        changes['completion_seconds'] = sign * seconds
+    return changes
+
+
+def _merge(*changes):
+    merged = {}
+    for change in changes:
+        for name, delta in change.items():
+            merged[name] = merged.get(name, 0) + delta
+    return merged
+
+
+@receiver(post_init, sender=Workflow)
+def remember_workflow_state(sender, instance, **kwargs):
+    instance._stats_snapshot = _snapshot(instance)
+
+
+@receiver(post_save, sender=Workflow)
+def count_workflow_save(sender, instance, created, **kwargs):
+    new = _snapshot(instance)
+    old = getattr(instance, '_stats_snapshot', None)
+    instance._stats_snapshot = new
+    if not counters_enabled() or new is None:
+        return
+    if created:
+        bump_after_commit(_counters(new, 1))
+    elif old is not None and old != new:
+        bump_after_commit(_merge(_counters(old, -1), _counters(new, 1)))
+
+
+@receiver(post_delete, sender=Workflow)
+def count_workflow_delete(sender, instance, **kwargs):
+    snapshot = _snapshot(instance)
+    if counters_enabled() and snapshot is not None:
+        bump_after_commit(_counters(snapshot, -1))
+
+
+@receiver(post_save, sender=ElectronicSignature)
+def count_signature_save(sender, instance, created, **kwargs):
+    if created and counters_enabled():
+        bump_after_commit({'signatures': 1})
+
+
+@receiver(post_delete, sender=ElectronicSignature)
+def count_signature_delete(sender, instance, **kwargs):
+    if counters_enabled():
+        bump_after_commit({'signatures': -1})
@@ -0,0 +1,161 @@
+"""
+Workflow statistics for WorkflowStatisticsView.
+
+Live mode computes everything with conditional aggregates: one query over
+workflows, one over tasks and one signature count.
+
+Counter mode (WORKFLOW_STATS_COUNTERS = True) reads the status counts, totals
+and completion time from WorkflowStatCounter, which signals keep up to date on
+every workflow save/delete, so the dashboard no longer aggregates the whole
+workflow table. As with the dashboard counters, deltas are applied after the
+change commits (bump_after_commit), so workflow writers do not serialize on
+the shared counter rows; a delta lost to a crash in between is repaired by
+the rebuild. Time-window figures (recent activity, overdue tasks) and task
+counts are still live: tasks change through bulk updates that signals do not
+see. Run `manage.py rebuild_workflow_stats` when enabling counters, or after
+bulk changes made outside the ORM.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.utils import timezone
+
+from common.transactions import atomic_on_commit
+
+from .models import ElectronicSignature, Task, Workflow, WorkflowStatCounter
+
+STATUSES = [status for status, _ in Workflow.STATUS_CHOICES]
+RECENT_WINDOWS = {'last_7_days': 7, 'last_30_days': 30}
+OPEN_TASK_STATUSES = ['pending', 'in_progress']
+
+
+def counters_enabled():
+    return getattr(settings, 'WORKFLOW_STATS_COUNTERS', False)
+
+
+def _published():
+    return Q(status='published', published_at__isnull=False, created_at__isnull=False)
+
+
+def _recent_activity(now):
+    return Workflow.objects.aggregate(**{
+        name: Count('id', filter=Q(created_at__gte=now - timedelta(days=days)))
+        for name, days in RECENT_WINDOWS.items()
+    })
+
+
+def _task_stats(now):
+    return Task.objects.aggregate(
+        total_tasks=Count('id'),
+        completed_tasks=Count('id', filter=Q(task_status='completed')),
+        overdue_tasks=Count('id', filter=Q(task_date_echeance__lt=now, task_status__in=OPEN_TASK_STATUSES)),
+    )
+
+
+def _response(total, by_status, recent, avg_days, signatures, tasks):
+    return {
+        'total_workflows': total,
+        'by_status': by_status,
+        'recent_activity': recent,
+        'average_completion_time_days': round(avg_days, 2) if avg_days else None,
+        'total_signatures': signatures,
+        **tasks,
+    }
+
+
+def live_statistics():
+    now = timezone.now()
+    agg = Workflow.objects.aggregate(
+        total=Count('id'),
+        avg_completion=Avg(F('published_at') - F('created_at'), filter=_published()),
+        **{f'status_{s}': Count('id', filter=Q(status=s)) for s in STATUSES},
+        **{name: Count('id', filter=Q(created_at__gte=now - timedelta(days=days)))
+           for name, days in RECENT_WINDOWS.items()},
+    )
+    avg = agg['avg_completion']
+    return _response(
+        total=agg['total'],
+        by_status={s: agg[f'status_{s}'] for s in STATUSES},
+        recent={name: agg[name] for name in RECENT_WINDOWS},
+        avg_days=avg.total_seconds() / 86400 if avg is not None else None,
+        signatures=ElectronicSignature.objects.count(),
+        tasks=_task_stats(now),
+    )
+
+
+def counter_statistics():
+    now = timezone.now()
+    counters = dict(WorkflowStatCounter.objects.values_list('name', 'value'))
+    completed = counters.get('completion_count', 0)
+    return _response(
+        total=counters.get('total', 0),
+        by_status={s: counters.get(f'status:{s}', 0) for s in STATUSES},
+        recent=_recent_activity(now),
+        avg_days=counters.get('completion_seconds', 0) / completed / 86400 if completed else None,
+        signatures=counters.get('signatures', 0),
+        tasks=_task_stats(now),
+    )
+
+
+def workflow_statistics():
+    return counter_statistics() if counters_enabled() else live_statistics()
+
+
+# -----------------------
+# Counter maintenance
+# -----------------------
+def bump(changes):
+    """
+    Apply {counter name: delta} in the current transaction.
+    """
+    # Fixed order, so concurrent bumps lock the counter rows in the same order
+    for name, delta in sorted(changes.items()):
+        if not delta:
+            continue
+        if WorkflowStatCounter.objects.filter(name=name).update(value=F('value') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                WorkflowStatCounter.objects.create(name=name, value=delta)
+        except IntegrityError:
+            # Created concurrently
+            WorkflowStatCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def bump_after_commit(changes):
+    """
+    Apply {counter name: delta} once the current transaction commits (see atomic_on_commit).
+    """
+    changes = {name: delta for name, delta in changes.items() if delta}
+    if changes:
+        atomic_on_commit(bump, changes)
+
+
+def completion_seconds(workflow):
+    if workflow.status != 'published' or not workflow.published_at or not workflow.created_at:
+        return None
+    return int((workflow.published_at - workflow.created_at).total_seconds())
+
+
+def rebuild_counters():
+    """
+    Recompute every counter from the tables. Returns the new values.
+    """
+    agg = Workflow.objects.aggregate(
+        total=Count('id'),
+        completion_count=Count('id', filter=_published()),
+        completion=Sum(F('published_at') - F('created_at'), filter=_published()),
+        **{f'status:{s}': Count('id', filter=Q(status=s)) for s in STATUSES},
+    )
+    completion = agg.pop('completion')
+    agg['completion_seconds'] = int(completion.total_seconds()) if completion else 0
+    agg['signatures'] = ElectronicSignature.objects.count()
+
+    with transaction.atomic():
+        WorkflowStatCounter.objects.all().delete()
+        WorkflowStatCounter.objects.bulk_create(
+            WorkflowStatCounter(name=name, value=value) for name, value in agg.items()
+        )
+    return agg
@@ -0,0 +1,168 @@
+from unittest import mock
+
+from django.core import mail
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from common.background import DrainPool
+from documents.models import Document, DocumentNature, Folder
+from users.models import Departement, Role, User
+
+from .models import Workflow, WorkflowNotification
+from .outbox import _claim, deliver_pending, queue_notification
+
+
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        dep = Departement.objects.create(dep_name="qa", dep_color="#000")
+        role = Role.objects.create(role_name="reviewer", role_color="blue")
+        self.author = User.objects.create_user(
+            username="author", password="pass", email="author@example.com", role=role, departement=dep
+        )
+        self.reviewer = User.objects.create_user(
+            username="reviewer", password="pass", email="reviewer@example.com", role=role, departement=dep
+        )
+        document = Document.objects.create(
+            doc_title="Procedure", doc_type="PDF", doc_format="pdf", doc_owner=self.author,
+            doc_departement=dep, doc_code="FI-OUT-1", doc_nature=nature, doc_nature_order=1,
+            parent_folder=Folder.objects.create(fol_name="QA", fol_path="QA"),
+        )
+        self.workflow = Workflow.objects.create(nom="Review", description="", document=document, author=self.author)
+
+    def _queue(self, recipient):
+        return queue_notification(self.workflow, recipient, "review_ready", "Ready", "Please review")
+
+    def test_queue_defers_sending_until_commit(self):
+        with mock.patch("workflows.outbox.wake") as wake:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._queue(self.reviewer)
+                self._queue(self.author)
+                self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(wake.call_count, 2)
+        self.assertEqual(
+            set(WorkflowNotification.objects.values_list("email_status", flat=True)),
+            {WorkflowNotification.STATUS_PENDING},
+        )
+
+    def test_batch_is_sent_over_one_connection(self):
+        self._queue(self.reviewer)
+        self._queue(self.author)
+
+        with mock.patch("workflows.outbox.get_connection", wraps=mail.get_connection) as get_connection:
+            self.assertEqual(deliver_pending(schedule_retries=False), 2)
+
+        get_connection.assert_called_once()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["author@example.com", "reviewer@example.com"])
+        self.assertFalse(WorkflowNotification.objects.exclude(email_status=WorkflowNotification.STATUS_SENT).exists())
+        self.assertFalse(WorkflowNotification.objects.filter(delivered_at__isnull=True).exists())
+
+    def test_claim_is_one_select_and_one_update(self):
+        ids = [self._queue(self.reviewer).pk for _ in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            batch = _claim(ids)
+        statements = [q["sql"].split()[0] for q in queries.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(statements, ["SELECT", "UPDATE"])
+        self.assertEqual([n.pk for n in batch], ids)
+        self.assertEqual(batch[0].recipient, self.reviewer)
+        self.assertEqual(
+            WorkflowNotification.objects.filter(email_status=WorkflowNotification.STATUS_SENDING).count(), 5
+        )
+        # Already claimed rows are not claimed twice
+        self.assertEqual(_claim(ids), [])
+
+    def test_failed_send_is_retried_with_backoff(self):
+        notification = self._queue(self.reviewer)
+
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("smtp down")):
+            self.assertEqual(deliver_pending(schedule_retries=False), 0)
+        notification.refresh_from_db()
+        self.assertEqual((notification.email_status, notification.attempts), (WorkflowNotification.STATUS_PENDING, 1))
+        self.assertIsNotNone(notification.next_attempt_at)
+
+        # Not due yet
+        self.assertEqual(deliver_pending(schedule_retries=False), 0)
+        WorkflowNotification.objects.filter(pk=notification.pk).update(next_attempt_at=None)
+        self.assertEqual(deliver_pending(schedule_retries=False), 1)
+        notification.refresh_from_db()
+        self.assertEqual((notification.email_status, notification.attempts), (WorkflowNotification.STATUS_SENT, 2))
+
+    def test_gives_up_after_max_attempts(self):
+        notification = self._queue(self.reviewer)
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("smtp down")):
+            deliver_pending(max_attempts=1, schedule_retries=False)
+        notification.refresh_from_db()
+        self.assertEqual(notification.email_status, WorkflowNotification.STATUS_FAILED)
+        self.assertIn("smtp down", notification.last_error)
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=60)
+    def test_notifications_in_window_go_out_as_one_digest(self):
+        body = "\nHello Reviewer,\n\nDocument: Procedure\nWorkflow: Review {}\n\nBest regards,\nDocument Management System\n"
+        for i in range(3):
+            queue_notification(self.workflow, self.reviewer, "review_ready", f"Ready {i}", body.format(i))
+        self._queue(self.author)
+
+        reviewer_windows = WorkflowNotification.objects.filter(recipient=self.reviewer).values_list("next_attempt_at", flat=True)
+        self.assertEqual(len(set(reviewer_windows)), 1)
+        self.assertEqual(deliver_pending(schedule_retries=False), 0)
+
+        WorkflowNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_pending(schedule_retries=False), 4)
+
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(m for m in mail.outbox if m.to == ["reviewer@example.com"])
+        self.assertEqual(digest.subject, "3 workflow notifications")
+        self.assertEqual(digest.body.count("Hello "), 1)
+        self.assertEqual(digest.body.count("Best regards,"), 1)
+        for i in range(3):
+            self.assertIn(f"{i + 1}. Ready {i}\nDocument: Procedure\nWorkflow: Review {i}", digest.body)
+        # Per-event rows are kept for the notifications API
+        self.assertEqual(
+            WorkflowNotification.objects.filter(recipient=self.reviewer, email_status=WorkflowNotification.STATUS_SENT).count(), 3
+        )
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=60)
+    def test_recipient_is_not_split_across_batches(self):
+        for _ in range(3):
+            self._queue(self.reviewer)
+        self._queue(self.author)
+        WorkflowNotification.objects.update(next_attempt_at=timezone.now())
+
+        self.assertEqual(deliver_pending(batch_size=2, schedule_retries=False), 4)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["author@example.com", "reviewer@example.com"])
+
+    def test_api_cannot_requeue_or_rewrite_notifications(self):
+        notification = self._queue(self.reviewer)
+        deliver_pending(schedule_retries=False)
+        client = APIClient()
+        client.force_authenticate(user=self.reviewer)
+
+        spoof = {"email_status": "pending", "subject": "SPOOF", "message": "click"}
+        self.assertEqual(client.patch(f"/api/notifications/{notification.pk}/", spoof, format="json").status_code, 405)
+        self.assertEqual(client.post("/api/notifications/", {**spoof, "workflow": self.workflow.pk}, format="json").status_code, 405)
+        resp = client.patch(f"/api/notifications/{notification.pk}/mark-read/")
+        self.assertEqual(resp.status_code, 200, resp.content)
+
+        notification.refresh_from_db()
+        self.assertEqual((notification.email_status, notification.subject), (WorkflowNotification.STATUS_SENT, "Ready"))
+        self.assertIsNotNone(notification.read_at)
+        self.assertEqual(deliver_pending(schedule_retries=False), 0)
+
+
+class DrainPoolTest(SimpleTestCase):
+    def test_wake_ups_before_the_drain_starts_are_coalesced(self):
+        drain = mock.MagicMock()
+        pool = DrainPool(drain, "NOTIFICATION_WORKERS", "test-drain")
+        with mock.patch.object(pool, "submit") as submit:
+            pool.wake()
+            pool.wake()
+            self.assertEqual(submit.call_count, 1)
+
+            # Once the drain has started, a wake-up schedules another one
+            submit.call_args.args[0]()
+            drain.assert_called_once_with()
+            pool.wake()
+            self.assertEqual(submit.call_count, 2)
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from documents.models import Document, DocumentNature, Folder
+from users.models import Departement, Role, User
+
+from .models import ElectronicSignature, Workflow
+from .stats import counter_statistics, live_statistics, rebuild_counters
+
+
+class WorkflowStatisticsTest(TestCase):
+    def setUp(self):
+        nature, _ = DocumentNature.objects.get_or_create(code="FI", defaults={"name": "Fiche"})
+        dep = Departement.objects.create(dep_name="qa", dep_color="#000")
+        role = Role.objects.create(role_name="admin", role_color="blue")
+        self.admin = User.objects.create_superuser(
+            username="admin", password="pass", email="admin@example.com", role=role, departement=dep
+        )
+        self.document = Document.objects.create(
+            doc_title="Procedure", doc_type="PDF", doc_format="pdf", doc_owner=self.admin,
+            doc_departement=dep, doc_code="FI-STAT-1", doc_nature=nature, doc_nature_order=1,
+            parent_folder=Folder.objects.create(fol_name="QA", fol_path="QA"),
+        )
+
+    def _workflow(self, status="draft", days_to_publish=None):
+        workflow = Workflow.objects.create(nom="W", description="", document=self.document, author=self.admin)
+        workflow.status = status
+        if days_to_publish is not None:
+            workflow.published_at = workflow.created_at + timedelta(days=days_to_publish)
+        workflow.save()
+        return workflow
+
+    def _populate(self):
+        self._workflow("draft")
+        self._workflow("in_review")
+        self._workflow("published", days_to_publish=2)
+        self._workflow("published", days_to_publish=4)
+        ElectronicSignature.objects.create(
+            workflow=Workflow.objects.first(), signed_by=self.admin, stage="approval", signature_hash="x" * 64
+        )
+
+    def test_live_statistics(self):
+        self._populate()
+        with self.assertNumQueries(3):
+            stats = live_statistics()
+
+        self.assertEqual(stats["total_workflows"], 4)
+        self.assertEqual(stats["by_status"]["published"], 2)
+        self.assertEqual(stats["by_status"]["rejected"], 0)
+        self.assertEqual(stats["recent_activity"], {"last_7_days": 4, "last_30_days": 4})
+        self.assertEqual(stats["average_completion_time_days"], 3.0)
+        self.assertEqual(stats["total_signatures"], 1)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/statistics/").json(), stats)
+
+    @override_settings(WORKFLOW_STATS_COUNTERS=True)
+    def test_counters_follow_transitions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._populate()
+        self.assertEqual(counter_statistics(), live_statistics())
+
+        workflow = Workflow.objects.get(status="in_review")
+        workflow.status = "published"
+        workflow.published_at = timezone.now() + timedelta(days=6)
+        with self.captureOnCommitCallbacks(execute=True):
+            workflow.save(update_fields=["status", "published_at"])
+            Workflow.objects.filter(status="draft").first().delete()
+            # Nothing touches the counter rows inside the writer's transaction
+            self.assertEqual(counter_statistics()["by_status"]["published"], 2)
+
+        stats = counter_statistics()
+        self.assertEqual(stats, live_statistics())
+        self.assertEqual(stats["by_status"]["published"], 3)
+        self.assertEqual(stats["total_workflows"], 3)
+
+    def test_rebuild_matches_live(self):
+        self._populate()
+        rebuild_counters()
+        self.assertEqual(counter_statistics(), live_statistics())
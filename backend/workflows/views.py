@@ -1,5 +1,4 @@
 # workflows/views.py
-from django.core.mail import send_mail
 from django.conf import settings
 from django.db import transaction
 from django.db.models import Q, Count, Avg, F
@@ -35,6 +34,9 @@ from .serializers import (
     WorkflowActionSerializer,
     TaskBulkUpdateSerializer,
 )
+from .outbox import queue_notification
+from .stats import workflow_statistics
+from users import audit
 from users.models import UserActionLog
 
 logger = logging.getLogger(__name__)
@@ -178,10 +180,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             logger.error(f"Failed to send creation notification for workflow {workflow.id}: {str(e)}")
         
         # 6. Log creation
-        UserActionLog.objects.create(
+        audit.log_action(
             user=self.request.user,
             action='create_workflow',
-            content_type=ContentType.objects.get_for_model(Workflow),
+            model=Workflow,
             object_id=workflow.id,
             extra_info={
                 'workflow_name': workflow.nom,
@@ -283,10 +285,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                     logger.error(f"Failed to send submission notification for workflow {workflow.id}: {str(e)}")
             
             # Log action
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action='submit_for_review',
-                content_type=ContentType.objects.get_for_model(Workflow),
+                model=Workflow,
                 object_id=workflow.id,
                 extra_info={'submitted_at': workflow.submitted_at.isoformat()}
             )
@@ -373,10 +375,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                 except Exception as e:
                     logger.error(f"Failed to send rejection notification for workflow {workflow.id}: {str(e)}")
                 
-                UserActionLog.objects.create(
+                audit.log_action(
                     user=request.user,
                     action='reject_review',
-                    content_type=ContentType.objects.get_for_model(Workflow),
+                    model=Workflow,
                     object_id=workflow.id,
                     extra_info={'reason': reason, 'notes': notes}
                 )
@@ -440,10 +442,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                except Exception as e:
                     logger.error(f"Failed to send approval ready notification for workflow {workflow.id}: {str(e)}")
             
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action='validate_review',
-                content_type=ContentType.objects.get_for_model(Workflow),
+                model=Workflow,
                 object_id=workflow.id,
                 extra_info={'reviewed_at': workflow.reviewed_at.isoformat(), 'notes': notes}
             )
@@ -545,10 +547,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                 except Exception as e:
                     logger.error(f"Failed to send publish ready notification for workflow {workflow.id}: {str(e)}")
             
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action='approve_sign',
-                content_type=ContentType.objects.get_for_model(Workflow),
+                model=Workflow,
                 object_id=workflow.id,
                 extra_info={
                     'approved_at': workflow.approved_at.isoformat(),
@@ -633,10 +635,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             except Exception as e:
                 logger.error(f"Failed to send publication notifications for workflow {workflow.id}: {str(e)}")
             
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action='publish_document',
-                content_type=ContentType.objects.get_for_model(Workflow),
+                model=Workflow,
                 object_id=workflow.id,
                 extra_info={'published_at': workflow.published_at.isoformat()}
             )
@@ -787,10 +789,10 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             workflow.save(update_fields=updated_fields)
             
             # Log action
-            UserActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 action='reassign_workflow_users',
-                content_type=ContentType.objects.get_for_model(Workflow),
+                model=Workflow,
                 object_id=workflow.id,
                 extra_info={'updated_fields': updated_fields}
             )
@@ -798,40 +800,8 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         return Response(self.get_serializer(workflow).data)
     
     def _send_notification(self, workflow, recipient, notification_type, subject, message):
-        """Send email and log notification"""
-        if not recipient or not recipient.email:
-            logger.warning(f"Cannot send notification: recipient {recipient} has no email")
-            return
-        
-        try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient.email],
-                fail_silently=False,
-            )
-            
-            WorkflowNotification.objects.create(
-                workflow=workflow,
-                recipient=recipient,
-                notification_type=notification_type,
-                subject=subject,
-                message=message,
-                email_status='sent'
-            )
-            
-            logger.info(f"Notification sent to {recipient.email} for workflow {workflow.id}")
-        except Exception as e:
-            logger.error(f"Failed to send email to {recipient.email}: {str(e)}")
-            WorkflowNotification.objects.create(
-                workflow=workflow,
-                recipient=recipient,
-                notification_type=notification_type,
-                subject=subject,
-                message=message,
-                email_status='failed'
-            )
+        """Queue the email in the notification outbox; it is sent after commit"""
+        queue_notification(workflow, recipient, notification_type, subject, message)
     
     def _build_email_message(self, workflow, action, recipient_name, reason=None):
         """Build formatted email message with safe attribute access"""
@@ -1171,8 +1141,8 @@ class ElectronicSignatureViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
-class WorkflowNotificationViewSet(viewsets.ModelViewSet):
-    """ViewSet for workflow notifications"""
+class WorkflowNotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for workflow notifications (read, plus mark-read)"""
     queryset = WorkflowNotification.objects.all()
     serializer_class = WorkflowNotificationSerializer
     permission_classes = [IsAuthenticated]
@@ -1253,51 +1223,5 @@ class WorkflowStatisticsView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     
     def get(self, request):
-        from datetime import timedelta
-        
-        total_workflows = Workflow.objects.count()
-        
-        # Calculate average completion time for published workflows
-        published = Workflow.objects.filter(
-            status='published',
-            published_at__isnull=False,
-            created_at__isnull=False
-        )
-        
-        avg_completion = None
-        if published.exists():
-            completion_times = [
-                (w.published_at - w.created_at).total_seconds() / 86400  # Convert to days
-                for w in published
-            ]
-            avg_completion = sum(completion_times) / len(completion_times)
-        
-        stats = {
-            'total_workflows': total_workflows,
-            'by_status': {
-                'draft': Workflow.objects.filter(status='draft').count(),
-                'in_review': Workflow.objects.filter(status='in_review').count(),
-                'pending_approval': Workflow.objects.filter(status='pending_approval').count(),
-                'approved': Workflow.objects.filter(status='approved').count(),
-                'published': Workflow.objects.filter(status='published').count(),
-                'rejected': Workflow.objects.filter(status='rejected').count(),
-            },
-            'recent_activity': {
-                'last_7_days': Workflow.objects.filter(
-                    created_at__gte=timezone.now() - timedelta(days=7)
-                ).count(),
-                'last_30_days': Workflow.objects.filter(
-                    created_at__gte=timezone.now() - timedelta(days=30)
-                ).count(),
-            },
-            'average_completion_time_days': round(avg_completion, 2) if avg_completion else None,
-            'total_signatures': ElectronicSignature.objects.count(),
-            'total_tasks': Task.objects.count(),
-            'completed_tasks': Task.objects.filter(task_status='completed').count(),
-            'overdue_tasks': Task.objects.filter(
-                task_date_echeance__lt=timezone.now(),
-                task_status__in=['pending', 'in_progress']
-            ).count(),
-        }
-        
-        return Response(stats)
\ No newline at end of file
+        # Conditional aggregates, or the incremental counters (see workflows/stats.py)
+        return Response(workflow_statistics())
\ No newline at end of file